@@ -1,14 +1,19 @@
 from starlette.middleware.sessions import SessionMiddleware
 from starlette.requests import Request
 from fastapi import FastAPI
-from sqlalchemy import select
+from sqlalchemy import Column, select, inspect
+from sqlalchemy.ext.asyncio import async_object_session
+from sqlalchemy.orm import selectinload
 from sqladmin import Admin, ModelView
 from sqladmin.authentication import AuthenticationBackend
 from wtforms import PasswordField
 
 from app.database import engine, async_session
-from app.models import User, Team, Task, TaskComment, Meeting, Evaluation
-from app.auth import verify_password, hash_password
+from app.models import (User, Team, Task, TaskComment, Meeting, Evaluation,
+                        users_teams, users_tasks, users_meetings)
+from app.auth import verify_password_async, hash_password_async, invalidate_principal
+from app.scope import invalidate_scope
+from app.versions import feed_versions, table_versions
 
 
 class AdminAuth(AuthenticationBackend):
@@ -29,12 +34,17 @@ class AdminAuth(AuthenticationBackend):
             if not user:
                 return False
 
-            if not verify_password(password, user.hashed_password):
+            verified, new_hash = await verify_password_async(password, user.hashed_password)
+            if not verified:
                 return False
 
             if user.role != "admin":
                 return False
 
+            if new_hash:
+                user.hashed_password = new_hash
+                await session.commit()
+
             request.session.update({"admin_user_id": user.id})
             return True
 
@@ -53,6 +63,22 @@ class AdminAuth(AuthenticationBackend):
             return user is not None
 
 
+async def member_ids(model, user_column: Column, owner_column: Column) -> list[int]:
+    """
+    Читает ID связанных пользователей запросом к таблице связи в сессии удаляемого объекта.
+    Связи моделей объявлены с lazy="raise", а after_model_delete вызывается уже после commit,
+    поэтому участников нужно собрать в on_model_delete, пока объект не удалён.
+    Args:
+        model: Удаляемый объект
+        user_column (Column): Колонка ID пользователя в таблице связи
+        owner_column (Column): Колонка ID объекта в таблице связи
+    Returns:
+        list[int]: ID пользователей
+    """
+    session = async_object_session(model)
+    return list(await session.scalars(select(user_column).where(owner_column == model.id)))
+
+
 class BaseAdmin(ModelView):
     def is_accessible(self, request: Request) -> bool:
         return bool(request.session.get("admin_user_id"))
@@ -60,6 +86,54 @@ class BaseAdmin(ModelView):
     def is_visible(self, request: Request) -> bool:
         return bool(request.session.get("admin_user_id"))
 
+    def details_query(self, request: Request):
+        # Связи моделей объявлены с lazy="raise", поэтому всё, что показывает страница деталей, грузим явно
+        stmt = super().details_query(request)
+        for relation in self._details_relations:
+            stmt = stmt.options(selectinload(relation))
+        return stmt
+
+    def changed_feeds(self, model, request: Request, deleted: bool) -> list[int]:
+        """
+        ID пользователей, чьи календарные ленты затронуло изменение объекта.
+        Args:
+            model: Изменённый или удалённый объект
+            request (Request): Текущий HTTP-запрос
+            deleted (bool): Объект удалён
+        Returns:
+            list[int]: ID пользователей
+        """
+        return []
+
+    async def bump_versions(self, model, request: Request, deleted: bool) -> None:
+        """
+        Поднимает версии страниц и лент отдельной транзакцией сразу после commit изменения:
+        sqladmin вызывает on_model_change нового объекта до того, как тот попадёт в сессию.
+        До этой транзакции новые данные отдаются под старой версией, что безопасно:
+        под новой версией старые данные не окажутся.
+        Args:
+            model: Изменённый или удалённый объект
+            request (Request): Текущий HTTP-запрос
+            deleted (bool): Объект удалён
+        """
+        async with self.session_maker() as session:
+            if deleted:
+                # Удаление каскадно затрагивает связанные таблицы - проще сбросить версии всех страниц
+                await table_versions.bump_all(session)
+            else:
+                mapper = inspect(self.model)
+                await table_versions.bump(session, *(table.name for table in mapper.tables),
+                                          *(rel.secondary.name for rel in mapper.relationships
+                                            if rel.secondary is not None))
+            await feed_versions.bump(session, *self.changed_feeds(model, request, deleted))
+            await session.commit()
+
+    async def after_model_change(self, data, model, is_created, request):
+        await self.bump_versions(model, request, deleted=False)
+
+    async def after_model_delete(self, model, request):
+        await self.bump_versions(model, request, deleted=True)
+
 
 class UserAdmin(BaseAdmin, model=User):
     column_list = [User.id, User.name, User.email, User.role]
@@ -74,19 +148,62 @@ class UserAdmin(BaseAdmin, model=User):
     async def on_model_change(self, form, model, is_created, request):
         password = form.get("password")
         if password:
-            model.hashed_password = hash_password(password)
+            model.hashed_password = await hash_password_async(password)
+
+    async def after_model_change(self, data, model, is_created, request):
+        await super().after_model_change(data, model, is_created, request)
+        invalidate_principal(model.id)
+        # Пользователь мог сменить команды или роль - затронутых менеджеров не вычислить дёшево
+        invalidate_scope()
+
+    def changed_feeds(self, model, request, deleted):
+        return [model.id] if deleted else []
+
+    async def after_model_delete(self, model, request):
+        await super().after_model_delete(model, request)
+        invalidate_principal(model.id)
+        invalidate_scope()
 
 
 class TeamAdmin(BaseAdmin, model=Team):
     column_list = [Team.id, Team.title]
     form_columns = [Team.title, Team.manager, Team.users]
 
+    async def on_model_change(self, data, model, is_created, request):
+        request.state.previous_member_ids = [user.id for user in model.users]
+        request.state.previous_manager_id = model.manager_id
+
+    async def after_model_change(self, data, model, is_created, request):
+        await super().after_model_change(data, model, is_created, request)
+        invalidate_principal(*request.state.previous_member_ids, *(user.id for user in model.users))
+        invalidate_scope(request.state.previous_manager_id, model.manager_id)
+
+    async def on_model_delete(self, model, request):
+        request.state.previous_member_ids = await member_ids(model, users_teams.c.user_id, users_teams.c.team_id)
+        request.state.previous_manager_id = model.manager_id
+
+    async def after_model_delete(self, model, request):
+        await super().after_model_delete(model, request)
+        invalidate_principal(*request.state.previous_member_ids)
+        invalidate_scope(request.state.previous_manager_id)
+
 
 class TaskAdmin(BaseAdmin, model=Task):
     column_list = [Task.id, Task.title, Task.status, Task.deadline]
     column_searchable_list = [Task.title, Task.description]
     form_columns = [Task.title, Task.description, Task.status, Task.deadline, Task.users]
 
+    async def on_model_change(self, data, model, is_created, request):
+        request.state.previous_member_ids = [user.id for user in model.users]
+
+    async def on_model_delete(self, model, request):
+        request.state.previous_member_ids = await member_ids(model, users_tasks.c.user_id, users_tasks.c.task_id)
+
+    def changed_feeds(self, model, request, deleted):
+        if deleted:
+            return request.state.previous_member_ids
+        return [*request.state.previous_member_ids, *(user.id for user in model.users)]
+
 
 class TaskCommentAdmin(BaseAdmin, model=TaskComment):
     column_list = [TaskComment.id, TaskComment.content, TaskComment.created_at, TaskComment.task_id, TaskComment.user_id]
@@ -94,8 +211,20 @@ class TaskCommentAdmin(BaseAdmin, model=TaskComment):
 
 
 class MeetingAdmin(BaseAdmin, model=Meeting):
-    column_list = [Meeting.id, Meeting.title, Meeting.scheduled_at]
-    form_columns = [Meeting.title, Meeting.scheduled_at, Meeting.users]
+    column_list = [Meeting.id, Meeting.title, Meeting.scheduled_at, Meeting.ends_at]
+    form_columns = [Meeting.title, Meeting.scheduled_at, Meeting.ends_at, Meeting.users]
+
+    async def on_model_change(self, data, model, is_created, request):
+        request.state.previous_member_ids = [user.id for user in model.users]
+
+    async def on_model_delete(self, model, request):
+        request.state.previous_member_ids = await member_ids(model, users_meetings.c.user_id,
+                                                             users_meetings.c.meeting_id)
+
+    def changed_feeds(self, model, request, deleted):
+        if deleted:
+            return request.state.previous_member_ids
+        return [*request.state.previous_member_ids, *(user.id for user in model.users)]
 
 
 class EvaluationAdmin(BaseAdmin, model=Evaluation):
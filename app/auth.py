@@ -1,16 +1,106 @@
-from passlib.context import CryptContext
 import jwt
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from fastapi import Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session, attributes
 
-from app.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.config import (SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES,
+                        PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+from app.cache import TTLCache
+from app.invalidation import invalidation_bus
 from app.database import get_async_db
-from app.models import User as UserModel
+from app.models import User as UserModel, Team, users_teams
+from app.loaders import load_options
+from app.passwords import pwd_context, password_hasher
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@dataclass(frozen=True)
+class Principal:
+    """
+    Лёгкое представление авторизованного пользователя, собранное из JWT-claims.
+    Не связано с сессией базы данных и не тянет за собой связи ORM-модели User.
+    Attributes:
+        id (int): ID пользователя
+        email (str): Email пользователя
+        role (str): Роль пользователя (user, manager, admin)
+        team_ids (frozenset[int]): ID команд, в которых состоит пользователь
+    """
+    id: int
+    email: str
+    role: str
+    team_ids: frozenset[int] = frozenset()
+
+
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+
+@event.listens_for(Session, "before_flush")
+def _bump_claims_version(session: Session, flush_context, instances) -> None:
+    """
+    Увеличивает users.claims_version в той же транзакции, что меняет роль или состав команд пользователя.
+    Claims уже выданных токенов с прежней версией перестают использоваться до их перевыпуска,
+    даже если процесс перезапущен или уведомление шины инвалидации потеряно.
+    """
+    # Незагруженные связи (lazy="raise") не менялись, поэтому история читается без загрузки
+    passive = attributes.PASSIVE_NO_INITIALIZE
+    user_ids, deleted_team_ids = set(), set()
+    for obj in session.dirty | session.new:
+        if isinstance(obj, UserModel):
+            if (attributes.get_history(obj, "role", passive).deleted
+                    or attributes.get_history(obj, "teams", passive).has_changes()):
+                user_ids.add(obj.id)
+        elif isinstance(obj, Team):
+            history = attributes.get_history(obj, "users", passive)
+            user_ids.update(user.id for user in (*history.added, *history.deleted))
+    for obj in session.deleted:
+        if isinstance(obj, Team):
+            deleted_team_ids.add(obj.id)
+
+    user_ids.discard(None)
+    criteria = []
+    if user_ids:
+        criteria.append(UserModel.id.in_(user_ids))
+    if deleted_team_ids:
+        criteria.append(UserModel.id.in_(
+            select(users_teams.c.user_id).where(users_teams.c.team_id.in_(deleted_team_ids))
+        ))
+    for criterion in criteria:
+        session.execute(
+            update(UserModel).where(criterion).values(claims_version=UserModel.claims_version + 1),
+            execution_options={"synchronize_session": False},
+        )
+
+
+def invalidate_principal(*user_ids: int) -> None:
+    """
+    Сбрасывает закэшированные данные пользователей после изменения роли или состава команд.
+    Args:
+        *user_ids (int): ID пользователей
+    """
+    for user_id in user_ids:
+        if user_id is not None:
+            principal_cache.pop(user_id)
+    invalidation_bus.publish("principals", user_ids)
+
+
+def invalidate_all_principals() -> None:
+    """
+    Сбрасывает закэшированные данные всех пользователей, когда затронутые ID неизвестны.
+    """
+    principal_cache.clear()
+    invalidation_bus.publish("principals", None)
+
+
+def _apply_remote_principals(user_ids: tuple[int, ...] | None) -> None:
+    if user_ids is None:
+        invalidate_all_principals()
+    else:
+        invalidate_principal(*user_ids)
+
+
+invalidation_bus.register("principals", _apply_remote_principals)
 
 
 def hash_password(password: str) -> str:
@@ -36,6 +126,30 @@ def verify_password(password: str, hashed_password: str) -> bool:
     return pwd_context.verify(password, hashed_password)
 
 
+async def hash_password_async(password: str) -> str:
+    """
+    Хэширует пароль в пуле воркеров, не блокируя event loop.
+    Args:
+        password (str): Пароль в виде строки
+    Returns:
+        str: Хэшированный пароль
+    """
+    return await password_hasher.hash(password)
+
+
+async def verify_password_async(password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """
+    Проверяет пароль в пуле воркеров, не блокируя event loop.
+    Если хэш создан с устаревшей стоимостью bcrypt, дополнительно возвращает новый хэш.
+    Args:
+        password (str): Введённый пароль
+        hashed_password (str): Хэш пароля для проверки
+    Returns:
+        tuple[bool, str | None]: Совпадает ли пароль и новый хэш для сохранения (или None)
+    """
+    return await password_hasher.verify_and_update(password, hashed_password)
+
+
 def create_access_token(data: dict):
     """
     Создаёт JWT-токен с указанными данными и сроком действия.
@@ -45,14 +159,33 @@ def create_access_token(data: dict):
         str: Закодированный JWT-токен
     """
     to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    now = datetime.now(timezone.utc)
+    expire = now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": expire, "iat": now})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
+def token_claims(user: UserModel) -> dict:
+    """
+    Формирует claims для JWT-токена пользователя.
+    Args:
+        user (UserModel): Пользователь с загруженными командами
+    Returns:
+        dict: Claims sub, id, role, teams и ver (версия claims пользователя)
+    """
+    return {
+        "sub": user.email,
+        "id": user.id,
+        "role": user.role,
+        "teams": [team.id for team in user.teams],
+        "ver": user.claims_version,
+    }
+
+
 async def authenticate_user(db: AsyncSession, username: str, password: str):
     """
     Аутентифицирует пользователя по email и паролю.
+    Если хэш пароля создан с устаревшей стоимостью bcrypt, он прозрачно пересчитывается.
     Args:
         db (AsyncSession): Асинхронная сессия базы данных
         username (str): Email пользователя
@@ -60,12 +193,18 @@ async def authenticate_user(db: AsyncSession, username: str, password: str):
     Returns:
         UserModel | None: Объект пользователя, если аутентификация успешна, иначе None
     """
-    result = await db.execute(select(UserModel).where(UserModel.email == username))
+    result = await db.execute(
+        select(UserModel).options(*load_options("user_teams")).where(UserModel.email == username)
+    )
     user = result.scalars().first()
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    verified, new_hash = await verify_password_async(password, user.hashed_password)
+    if not verified:
         return None
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
     return user
 
 
@@ -81,20 +220,82 @@ async def get_token_from_cookie(request: Request):
     return token
 
 
-async def get_current_user(token: str = Depends(get_token_from_cookie), db: AsyncSession = Depends(get_async_db)):
+async def load_principal(db: AsyncSession, *criteria) -> Principal | None:
+    """
+    Загружает данные пользователя для Principal без загрузки связей ORM-модели.
+    Args:
+        db (AsyncSession): Асинхронная сессия базы данных
+        *criteria: Условия поиска пользователя
+    Returns:
+        Principal | None: Данные пользователя или None, если он не найден
+    """
+    result = await db.execute(select(UserModel.id, UserModel.email, UserModel.role).where(*criteria))
+    row = result.first()
+    if row is None:
+        return None
+    team_ids = await db.scalars(select(users_teams.c.team_id).where(users_teams.c.user_id == row.id))
+    return Principal(id=row.id, email=row.email, role=row.role, team_ids=frozenset(team_ids))
+
+
+async def get_current_user(token: str = Depends(get_token_from_cookie),
+                           db: AsyncSession = Depends(get_async_db)) -> Principal:
     """
     Получает текущего авторизованного пользователя по JWT-токену.
+    Principal кэшируется по ID пользователя. При промахе кэша роль читается из базы одним запросом
+    вместе с версией claims: если версия совпадает с claims токена, команды берутся из токена,
+    иначе (роль или команды менялись после выдачи токена) тоже загружаются из базы.
     Args:
         token (str): JWT-токен из cookie (зависимость get_token_from_cookie)
         db (AsyncSession): Асинхронная сессия базы данных
     Returns:
-        UserModel: Объект текущего пользователя
+        Principal: Текущий пользователь
     """
     if not token:
         raise HTTPException(status_code=401, detail="Не авторизован")
-    scheme, _, param = token.partition(" ")
-    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-    email: str = payload.get("sub")
-    result = await db.scalars(select(UserModel).where(UserModel.email == email))
-    user = result.first()
-    return user
\ No newline at end of file
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Не авторизован")
+
+    user_id = payload.get("id")
+    if user_id is None:
+        principal = await load_principal(db, UserModel.email == payload.get("sub"))
+    else:
+        principal = principal_cache.get(user_id)
+        if principal is not None:
+            return principal
+
+        result = await db.execute(
+            select(UserModel.email, UserModel.role, UserModel.claims_version).where(UserModel.id == user_id)
+        )
+        row = result.first()
+        if row is None:
+            raise HTTPException(status_code=401, detail="Не авторизован")
+        if "teams" in payload and payload.get("ver") == row.claims_version:
+            team_ids = payload["teams"]
+        else:
+            team_ids = await db.scalars(select(users_teams.c.team_id).where(users_teams.c.user_id == user_id))
+        principal = Principal(id=user_id, email=row.email, role=row.role, team_ids=frozenset(team_ids))
+
+    if principal is None:
+        raise HTTPException(status_code=401, detail="Не авторизован")
+    principal_cache.set(principal.id, principal)
+    return principal
+
+
+async def token_is_admin(token: str | None, db: AsyncSession) -> bool:
+    """
+    Проверяет, что токен принадлежит администратору.
+    Нужна middleware, которые работают до разрешения зависимостей FastAPI.
+    Роль проверяется так же, как в get_current_user: из кэша или из базы.
+    Args:
+        token (str | None): JWT-токен из cookie
+        db (AsyncSession): Асинхронная сессия базы данных
+    Returns:
+        bool: True, если токен действителен и принадлежит администратору
+    """
+    try:
+        principal = await get_current_user(token, db)
+    except HTTPException:
+        return False
+    return principal.role == "admin"
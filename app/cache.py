@@ -0,0 +1,117 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class TTLCache:
+    """
+    Простой in-process кэш с ограничением размера (LRU) и временем жизни записей (TTL).
+    Не потокобезопасен и рассчитан на использование внутри одного event loop.
+    Args:
+        maxsize (int): Максимальное количество записей
+        ttl (float): Время жизни записи в секундах
+        maxweight (int | None): Ограничение суммарного веса записей, например в байтах
+        weigher (Callable[[Any], int] | None): Вес записи, по умолчанию 1
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0,
+                 maxweight: int | None = None, weigher: Callable[[Any], int] | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxweight = maxweight
+        self.weigher = weigher
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Возвращает значение по ключу, если запись существует и не устарела.
+        Args:
+            key (Hashable): Ключ записи
+            default (Any): Значение по умолчанию
+        Returns:
+            Any: Сохранённое значение или default
+        """
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Сохраняет значение, вытесняя самые давно использованные записи при переполнении.
+        Args:
+            key (Hashable): Ключ записи
+            value (Any): Значение
+        """
+        self._remove(key)
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self.weight += self._weigh(value)
+        while len(self._data) > self.maxsize or (self.maxweight is not None and self.weight > self.maxweight):
+            self._remove(next(iter(self._data)))
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Удаляет запись по ключу.
+        Args:
+            key (Hashable): Ключ записи
+            default (Any): Значение по умолчанию
+        Returns:
+            Any: Удалённое значение или default
+        """
+        item = self._remove(key)
+        return default if item is None else item[1]
+
+    def clear(self) -> None:
+        """
+        Полностью очищает кэш.
+        """
+        self._data.clear()
+        self.weight = 0
+
+    def items(self) -> list[tuple[Hashable, Any]]:
+        """
+        Возвращает живые записи без изменения порядка вытеснения.
+        Returns:
+            list[tuple[Hashable, Any]]: Пары ключ-значение
+        """
+        now = time.monotonic()
+        return [(key, value) for key, (expires_at, value) in self._data.items() if expires_at >= now]
+
+    def stats(self) -> dict[str, int]:
+        """
+        Возвращает счётчики попаданий, промахов и вытеснений по LRU с момента запуска.
+        Returns:
+            dict[str, int]: Метрики кэша
+        """
+        return {"size": len(self._data), "weight": self.weight, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
+
+    def _weigh(self, value: Any) -> int:
+        return 1 if self.weigher is None else self.weigher(value)
+
+    def _remove(self, key: Hashable) -> tuple[float, Any] | None:
+        item = self._data.pop(key, None)
+        if item is not None:
+            self.weight -= self._weigh(item[1])
+        return item
+
+    def __contains__(self, key: Hashable) -> bool:
+        # Проверка наличия не считается попаданием или промахом и не меняет порядок вытеснения
+        item = self._data.get(key)
+        return item is not None and item[0] >= time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._data)
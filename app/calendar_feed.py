@@ -0,0 +1,138 @@
+import hashlib
+import hmac
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterator
+
+from sqlalchemy import select, literal, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import TTLCache
+from app.config import SECRET_KEY, FEED_CACHE_SIZE, FEED_CACHE_TTL
+from app.models import Task, Meeting, users_tasks, users_meetings
+
+
+@dataclass(frozen=True)
+class Feed:
+    """
+    Сгенерированная календарная лента пользователя.
+    Attributes:
+        version (str): Версия данных, из которой собрана лента
+        modified_at (datetime): Время последнего изменения данных
+        body (bytes): Содержимое .ics
+    """
+    version: str
+    modified_at: datetime
+    body: bytes
+
+
+feed_cache = TTLCache(maxsize=FEED_CACHE_SIZE, ttl=FEED_CACHE_TTL)
+
+
+def feed_token(user_id: int) -> str:
+    """
+    Подписывает ID пользователя для ссылки на ленту: календарные клиенты не умеют
+    передавать cookie, а проверка подписи не требует обращения к базе.
+    Args:
+        user_id (int): ID пользователя
+    Returns:
+        str: Токен для параметра token
+    """
+    return hmac.new(SECRET_KEY.encode(), f"feed:{user_id}".encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def check_feed_token(user_id: int, token: str) -> bool:
+    return hmac.compare_digest(feed_token(user_id), token)
+
+
+def _escape(text: str) -> str:
+    return (text or "").replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _format_utc(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _fold(line: str) -> str:
+    """
+    Переносит строку длиннее 75 октетов по RFC 5545 (продолжение начинается с пробела).
+    """
+    raw = line.encode()
+    if len(raw) <= 75:
+        return line + "\r\n"
+    parts, chunk = [], b""
+    for char in line:
+        encoded = char.encode()
+        if len(chunk) + len(encoded) > (75 if not parts else 74):
+            parts.append(chunk.decode())
+            chunk = b""
+        chunk += encoded
+    parts.append(chunk.decode())
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _event(uid: str, summary: str, starts_at: datetime, ends_at: datetime, stamp: str) -> Iterator[str]:
+    yield "BEGIN:VEVENT\r\n"
+    yield _fold(f"UID:{uid}")
+    yield f"DTSTAMP:{stamp}\r\n"
+    yield f"DTSTART:{_format_utc(starts_at)}\r\n"
+    yield f"DTEND:{_format_utc(ends_at)}\r\n"
+    yield _fold(f"SUMMARY:{_escape(summary)}")
+    yield "END:VEVENT\r\n"
+
+
+async def iter_feed(db: AsyncSession, user_id: int, modified_at: datetime) -> AsyncIterator[str]:
+    """
+    Построчно генерирует .ics с задачами (по дедлайну) и встречами пользователя.
+    События читаются одним запросом UNION ALL через серверный курсор.
+    Args:
+        db (AsyncSession): Асинхронная сессия базы данных
+        user_id (int): ID пользователя
+        modified_at (datetime): Время последнего изменения данных (DTSTAMP)
+    Yields:
+        str: Фрагменты .ics
+    """
+    tasks = (
+        select(literal("task").label("kind"), Task.id, Task.title,
+               Task.deadline.label("starts_at"), Task.deadline.label("ends_at"))
+        .join(users_tasks, users_tasks.c.task_id == Task.id)
+        .where(users_tasks.c.user_id == user_id, Task.deadline.is_not(None))
+    )
+    meetings = (
+        select(literal("meeting").label("kind"), Meeting.id, Meeting.title,
+               Meeting.scheduled_at.label("starts_at"), Meeting.ends_at.label("ends_at"))
+        .join(users_meetings, users_meetings.c.meeting_id == Meeting.id)
+        .where(users_meetings.c.user_id == user_id)
+    )
+    stamp = _format_utc(modified_at)
+
+    yield "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Business management system//RU\r\nCALSCALE:GREGORIAN\r\n"
+    result = await db.stream(union_all(tasks, meetings))
+    async for kind, event_id, title, starts_at, ends_at in result:
+        summary = f"Дедлайн: {title}" if kind == "task" else title
+        for line in _event(f"{kind}-{event_id}@bms", summary, starts_at, ends_at, stamp):
+            yield line
+    yield "END:VCALENDAR\r\n"
+
+
+async def get_feed(db: AsyncSession, user_id: int, version: str, modified_at: datetime) -> Feed:
+    """
+    Возвращает ленту из кэша, если она собрана из текущей версии данных, иначе собирает заново.
+    Args:
+        db (AsyncSession): Асинхронная сессия базы данных
+        user_id (int): ID пользователя
+        version (str): Текущая версия данных пользователя
+        modified_at (datetime): Время последнего изменения данных
+    Returns:
+        Feed: Лента пользователя
+    """
+    feed = feed_cache.get(user_id)
+    if feed is not None and feed.version == version:
+        return feed
+
+    body = "".join([chunk async for chunk in iter_feed(db, user_id, modified_at)]).encode()
+    feed = Feed(version=version, modified_at=modified_at, body=body)
+    feed_cache.set(user_id, feed)
+    return feed
@@ -4,6 +4,8 @@ from datetime import datetime
 import pytz
 from fastapi.templating import Jinja2Templates
 
+from app.metrics import TimedTemplate
+
 
 load_dotenv()
 
@@ -18,21 +20,83 @@ TEST_DB_NAME = os.getenv("TEST_DB_NAME")
 DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 TEST_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{TEST_DB_NAME}"
 
+# Реплика для чтения; без READ_DB_HOST все запросы идут в основную базу
+READ_DB_HOST = os.getenv("READ_DB_HOST")
+READ_DB_PORT = os.getenv("READ_DB_PORT", DB_PORT)
+READ_DATABASE_URL = (
+    f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{READ_DB_HOST}:{READ_DB_PORT}/{DB_NAME}" if READ_DB_HOST else None
+)
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", 5))
+
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 30000))
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+SQL_LOG_SAMPLE_RATE = float(os.getenv("SQL_LOG_SAMPLE_RATE", 0))
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+LOOP_LAG_INTERVAL_MS = float(os.getenv("LOOP_LAG_INTERVAL_MS", 100))
+LOOP_BLOCK_THRESHOLD_MS = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", 0))
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_STORE_SIZE = int(os.getenv("PROFILE_STORE_SIZE", 50))
+PROFILE_STORE_TTL = int(os.getenv("PROFILE_STORE_TTL", 3600))
+TRACEMALLOC_ENABLED = os.getenv("TRACEMALLOC_ENABLED", "false").lower() == "true"
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", 1))
+
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES=int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
 
 ADMIN_SECRET_KEY = os.getenv("ADMIN_SECRET_KEY")
 
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", 1024))
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", 300))
+
+SCOPE_CACHE_SIZE = int(os.getenv("SCOPE_CACHE_SIZE", 1024))
+SCOPE_CACHE_TTL = int(os.getenv("SCOPE_CACHE_TTL", 300))
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 4))
+PASSWORD_HASH_MAX_CONCURRENCY = int(os.getenv("PASSWORD_HASH_MAX_CONCURRENCY", 8))
+
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", 50))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 200))
+
+STREAM_YIELD_PER = int(os.getenv("STREAM_YIELD_PER", 500))
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", 16384))
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 5000))
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", 1000))
+
+FEED_CACHE_SIZE = int(os.getenv("FEED_CACHE_SIZE", 512))
+FEED_CACHE_TTL = int(os.getenv("FEED_CACHE_TTL", 3600))
+
+PAGE_CACHE_SIZE = int(os.getenv("PAGE_CACHE_SIZE", 2048))
+PAGE_CACHE_TTL = int(os.getenv("PAGE_CACHE_TTL", 300))
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", 64 * 2**20))
+PAGE_CACHE_MAX_ENTRY_BYTES = int(os.getenv("PAGE_CACHE_MAX_ENTRY_BYTES", 2**20))
+
+INVALIDATION_CHANNEL = os.getenv("INVALIDATION_CHANNEL", "bms_invalidation")
+INVALIDATION_FLUSH_MS = int(os.getenv("INVALIDATION_FLUSH_MS", 20))
+
+DISPLAY_TIMEZONE = os.getenv("DISPLAY_TIMEZONE", "Europe/Moscow")
+DISPLAY_TZ = pytz.timezone(DISPLAY_TIMEZONE)
+
 
 def moscow_now():
-    return datetime.now(pytz.timezone("Europe/Moscow"))
+    return datetime.now(DISPLAY_TZ)
 
 
 def format_moscow(dt: datetime) -> str:
-    tz = pytz.timezone("Europe/Moscow")
-    return dt.astimezone(tz).strftime("%Y-%m-%d %H:%M")
+    return dt.astimezone(DISPLAY_TZ).strftime("%Y-%m-%d %H:%M")
 
 
 templates = Jinja2Templates(directory="app/templates")
+templates.env.template_class = TimedTemplate
 templates.env.filters["moscowtime"] = format_moscow
\ No newline at end of file
@@ -1,22 +1,168 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+import time
+
+from fastapi import Request
+from sqlalchemy import exc, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import (DATABASE_URL, READ_DATABASE_URL, READ_YOUR_WRITES_SECONDS, DB_ECHO, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+                        DB_POOL_PRE_PING, DB_STATEMENT_CACHE_SIZE, DB_STATEMENT_TIMEOUT_MS)
+from app.metrics import Histogram
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, который замеряет ожидание свободного соединения и считает таймауты.
+    Время ожидания включает создание нового соединения и pre-ping.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_ms = Histogram()
+        self.timeouts = 0
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.wait_ms.observe((time.perf_counter() - started) * 1000)
 
-from app.config import DATABASE_URL
+    def stats(self) -> dict:
+        """
+        Возвращает текущее состояние пула.
+        Returns:
+            dict: Размер, занятые и свободные соединения, overflow, таймауты и гистограмма ожидания
+        """
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": self.overflow(),
+            "timeouts": self.timeouts,
+            "wait_ms": self.wait_ms.snapshot(),
+        }
 
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+def make_engine(url: str) -> AsyncEngine:
+    """
+    Создаёт движок с параметрами пула и соединений из конфигурации.
+    Args:
+        url (str): URL базы данных
+    Returns:
+        AsyncEngine: Асинхронный движок SQLAlchemy
+    """
+    return create_async_engine(
+        url,
+        echo=DB_ECHO,
+        poolclass=InstrumentedPool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args={
+            # Кэш подготовленных выражений asyncpg и SQLAlchemy; за PgBouncer в режиме транзакций - 0
+            "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            "server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)},
+        },
+    )
+
+
+engine = make_engine(DATABASE_URL)
 async_session = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+read_engine = make_engine(READ_DATABASE_URL) if READ_DATABASE_URL else engine
+async_read_session = async_sessionmaker(bind=read_engine, class_=AsyncSession, expire_on_commit=False)
 
+# Cookie с моментом, до которого пользователь читает из основной базы после своей записи
+PRIMARY_COOKIE = "read_primary_until"
 
-async def get_async_db() -> AsyncSession:
+
+async def get_async_db(request: Request) -> AsyncSession:
     """
     Асинхронная зависимость для получения сессии базы данных.
     Используется как Depends в FastAPI эндпоинтах.
+    Фиксация транзакции отмечает запрос как пишущий (см. ReadYourWritesMiddleware).
+    Args:
+        request (Request): Текущий HTTP-запрос
     Yields:
         AsyncSession: Асинхронная сессия SQLAlchemy.
     """
     async with async_session() as session:
+        @event.listens_for(session.sync_session, "after_commit")
+        def mark_write(_):
+            request.state.db_write = True
+
+        yield session
+
+
+async def get_async_read_db(request: Request) -> AsyncSession:
+    """
+    Зависимость для обработчиков, которые только читают: сессия реплики, если она настроена.
+    Пользователь, недавно записавший данные, читает из основной базы, чтобы увидеть свои изменения
+    несмотря на отставание реплики.
+    Args:
+        request (Request): Текущий HTTP-запрос
+    Yields:
+        AsyncSession: Сессия реплики или основной базы
+    """
+    try:
+        primary_until = float(request.cookies.get(PRIMARY_COOKIE, 0))
+    except ValueError:
+        primary_until = 0
+    replica = read_engine is not engine and primary_until < time.time()
+    request.state.read_replica = replica
+    async with (async_read_session if replica else async_session)() as session:
         yield session
 
 
-Base = declarative_base()
\ No newline at end of file
+def replica_may_lag(state: dict, modified_at: float) -> bool:
+    """
+    Проверяет, мог ли ответ быть собран из реплики, ещё не получившей последние изменения.
+    Такие ответы нельзя кэшировать и отдавать с валидаторами текущей версии.
+    Args:
+        state (dict): Состояние запроса (scope["state"])
+        modified_at (float): Время последнего изменения данных страницы (Unix time)
+    Returns:
+        bool: True, если данные ответа могут быть устаревшими
+    """
+    return bool(state.get("read_replica")) and time.time() - modified_at < READ_YOUR_WRITES_SECONDS
+
+
+class ReadYourWritesMiddleware:
+    """
+    После пишущего запроса ставит cookie, по которой get_async_read_db в течение
+    READ_YOUR_WRITES_SECONDS направляет пользователя в основную базу.
+    Пишущим считается запрос, зафиксировавший транзакцию, и любой успешный не-GET запрос
+    (например, формы админ-панели, работающей со своими сессиями).
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or read_engine is engine:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                wrote = scope.get("state", {}).get("db_write") or (
+                    scope["method"] not in ("GET", "HEAD", "OPTIONS") and message["status"] < 400
+                )
+                if wrote:
+                    until = time.time() + READ_YOUR_WRITES_SECONDS
+                    cookie = f"{PRIMARY_COOKIE}={until:.3f}; Max-Age={READ_YOUR_WRITES_SECONDS}; Path=/; HttpOnly; SameSite=Lax"
+                    message["headers"] = [*message.get("headers", []), (b"set-cookie", cookie.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+Base = declarative_base()
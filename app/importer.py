@@ -0,0 +1,251 @@
+"""
+Массовый импорт задач из CSV или NDJSON.
+
+Строки читаются и валидируются порциями, порции загружаются через COPY
+(asyncpg copy_records_to_table) во временную таблицу, после чего задачи,
+назначения и первые комментарии переносятся в основные таблицы
+несколькими INSERT ... SELECT в одной транзакции.
+
+Запуск из командной строки:
+    python -m app.importer tasks.csv --author-id 1
+"""
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import sys
+import uuid
+from typing import Iterator, TextIO
+
+from pydantic import ValidationError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from starlette.concurrency import run_in_threadpool
+
+from app.config import IMPORT_BATCH_SIZE, IMPORT_MAX_ERRORS, INVALIDATION_CHANNEL, moscow_now
+from app.invalidation import encode_message
+from app.schemas import TaskImportRow, ImportReport, ImportRowError
+from app.scope import Scope
+from app.versions import EPOCH_KEY, feed_versions, table_versions
+
+
+FORMATS = ("csv", "ndjson")
+
+STAGING_COLUMNS = ["line", "title", "description", "status", "deadline", "assignee_ids", "comment"]
+
+CREATE_STAGING = """
+CREATE TEMP TABLE task_import (
+    line integer PRIMARY KEY,
+    title text NOT NULL,
+    description text,
+    status text NOT NULL,
+    deadline timestamptz,
+    assignee_ids integer[] NOT NULL,
+    comment text NOT NULL,
+    task_id integer
+) ON COMMIT DROP
+"""
+
+UNKNOWN_ASSIGNEES = """
+SELECT s.line, a.user_id
+FROM task_import s
+CROSS JOIN LATERAL unnest(s.assignee_ids) AS a(user_id)
+LEFT JOIN users u ON u.id = a.user_id
+WHERE u.id IS NULL
+ORDER BY s.line
+"""
+
+MERGE_SQL = [
+    # ID задач выделяются заранее, чтобы связать строки импорта с назначениями и комментариями
+    "UPDATE task_import SET task_id = nextval(pg_get_serial_sequence('tasks', 'id'))",
+    """
+    INSERT INTO tasks (id, title, description, status, deadline)
+    SELECT task_id, title, description, status, deadline FROM task_import ORDER BY line
+    """,
+    """
+    INSERT INTO users_tasks (user_id, task_id)
+    SELECT DISTINCT a.user_id, s.task_id
+    FROM task_import s CROSS JOIN LATERAL unnest(s.assignee_ids) AS a(user_id)
+    """,
+    """
+    INSERT INTO task_comments (content, created_at, task_id, user_id)
+    SELECT comment, :created_at, task_id, :author_id FROM task_import WHERE comment <> ''
+    """,
+]
+
+# Изменения для шины инвалидации: таблицы, в которые пишет MERGE_SQL, и ленты всех пользователей
+IMPORT_CHANGES = {"tables": ["tasks", "users_tasks", "task_comments"], "feeds": None}
+
+
+def detect_format(filename: str | None, default: str = "csv") -> str:
+    """
+    Определяет формат файла по расширению.
+    Args:
+        filename (str | None): Имя файла
+        default (str): Формат, если расширение не распознано
+    Returns:
+        str: csv или ndjson
+    """
+    if filename and filename.lower().endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    if filename and filename.lower().endswith(".csv"):
+        return "csv"
+    return default
+
+
+def iter_records(source: TextIO, fmt: str) -> Iterator[tuple[int, dict | None, str | None]]:
+    """
+    Построчно читает записи из CSV (с заголовком) или NDJSON.
+    Args:
+        source (TextIO): Текстовый поток
+        fmt (str): csv или ndjson
+    Yields:
+        tuple[int, dict | None, str | None]: Номер строки, запись и ошибка разбора
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(source)
+        for record in reader:
+            yield reader.line_num, record, None
+        return
+
+    for line, raw in enumerate(source, start=1):
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError as exc:
+            yield line, None, f"Некорректный JSON: {exc}"
+            continue
+        if not isinstance(record, dict):
+            yield line, None, "Ожидается JSON-объект"
+            continue
+        yield line, record, None
+
+
+def validate_batch(records: list[tuple[int, dict | None, str | None]],
+                   scope: Scope) -> tuple[list[tuple], list[ImportRowError]]:
+    """
+    Валидирует порцию записей и готовит кортежи для COPY.
+    Args:
+        records (list): Записи из iter_records
+        scope (Scope): Область видимости импортирующего: назначать можно только видимых пользователей
+    Returns:
+        tuple[list[tuple], list[ImportRowError]]: Строки для временной таблицы и ошибки
+    """
+    rows, errors = [], []
+    for line, record, parse_error in records:
+        if parse_error:
+            errors.append(ImportRowError(line=line, error=parse_error))
+            continue
+        try:
+            row = TaskImportRow.model_validate(record)
+        except ValidationError as exc:
+            message = "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors())
+            errors.append(ImportRowError(line=line, error=message))
+            continue
+        hidden = set(row.assignee_ids) - scope.visible_user_ids(row.assignee_ids)
+        if hidden:
+            errors.append(ImportRowError(line=line, error=f"Нет доступа к пользователям: {sorted(hidden)}"))
+            continue
+        rows.append((line, row.title, row.description, row.status, row.deadline,
+                     sorted(set(row.assignee_ids)), row.comment))
+    return rows, errors
+
+
+async def import_tasks(conn: AsyncConnection, source: TextIO, fmt: str, author_id: int,
+                       scope: Scope = Scope(member_ids=None)) -> ImportReport:
+    """
+    Импортирует задачи в текущей транзакции соединения.
+    Некорректные строки пропускаются и попадают в отчёт, остальные импортируются.
+    Разбор и валидация выполняются в пуле потоков, чтобы не блокировать event loop.
+    Args:
+        conn (AsyncConnection): Соединение с PostgreSQL через asyncpg с открытой транзакцией
+        source (TextIO): Текстовый поток с данными
+        fmt (str): csv или ndjson
+        author_id (int): Автор первых комментариев
+        scope (Scope): Область видимости импортирующего
+    Returns:
+        ImportReport: Число импортированных задач и ошибки по строкам
+    """
+    report = ImportReport()
+
+    def add_errors(errors: list[ImportRowError]):
+        report.error_count += len(errors)
+        report.errors.extend(errors[:max(0, IMPORT_MAX_ERRORS - len(report.errors))])
+
+    # Большой импорт дольше statement_timeout веб-запросов; SET LOCAL действует до конца транзакции
+    await conn.execute(text("SET LOCAL statement_timeout = 0"))
+    await conn.execute(text(CREATE_STAGING))
+    raw_connection = await conn.get_raw_connection()
+    records = iter_records(source, fmt)
+
+    while True:
+        batch = await run_in_threadpool(lambda: list(itertools.islice(records, IMPORT_BATCH_SIZE)))
+        if not batch:
+            break
+        rows, errors = await run_in_threadpool(validate_batch, batch, scope)
+        add_errors(errors)
+        if rows:
+            await raw_connection.driver_connection.copy_records_to_table(
+                "task_import", records=rows, columns=STAGING_COLUMNS
+            )
+
+    result = await conn.execute(text(UNKNOWN_ASSIGNEES))
+    unknown: dict[int, list[int]] = {}
+    for line, user_id in result:
+        unknown.setdefault(line, []).append(user_id)
+    if unknown:
+        add_errors([ImportRowError(line=line, error=f"Пользователи не найдены: {user_ids}")
+                    for line, user_ids in unknown.items()])
+        await conn.execute(text("DELETE FROM task_import WHERE line = ANY(:lines)"), {"lines": list(unknown)})
+
+    params = {"created_at": moscow_now(), "author_id": author_id}
+    for statement in MERGE_SQL:
+        await conn.execute(text(statement), params)
+
+    report.imported = (await conn.execute(text("SELECT count(*) FROM task_import"))).scalar_one()
+    report.errors.sort(key=lambda error: error.line)
+    return report
+
+
+async def run(source: TextIO, fmt: str, author_id: int) -> ImportReport:
+    from app.database import engine
+
+    async with engine.begin() as conn:
+        report = await import_tasks(conn, source, fmt, author_id)
+        if report.imported:
+            # Версии страниц и всех лент поднимаются в транзакции импорта, как и в обработчиках
+            await conn.execute(table_versions.upsert(*IMPORT_CHANGES["tables"]))
+            await conn.execute(feed_versions.upsert(EPOCH_KEY))
+        if report.imported and INVALIDATION_CHANNEL:
+            # Импорт идёт в отдельном процессе: кэши страниц и ленты запущенных воркеров сбрасываются
+            # через шину инвалидации. NOTIFY доставляется только после commit этой транзакции
+            await conn.execute(text("SELECT pg_notify(:channel, :payload)"), {
+                "channel": INVALIDATION_CHANNEL,
+                "payload": encode_message(uuid.uuid4().hex, IMPORT_CHANGES),
+            })
+    await engine.dispose()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="Файл CSV или NDJSON, '-' - стандартный ввод")
+    parser.add_argument("--format", choices=FORMATS, default=None)
+    parser.add_argument("--author-id", type=int, required=True, help="Автор первых комментариев")
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path)
+    if args.path == "-":
+        report = asyncio.run(run(sys.stdin, fmt, args.author_id))
+    else:
+        with open(args.path, encoding="utf-8", newline="") as source:
+            report = asyncio.run(run(source, fmt, args.author_id))
+
+    print(report.model_dump_json(indent=2))
+    sys.exit(1 if report.error_count else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import asyncio
+import json
+import logging
+import uuid
+from typing import Callable, Hashable, Iterable
+
+import asyncpg
+from sqlalchemy.engine import make_url
+
+from app.config import DATABASE_URL, INVALIDATION_CHANNEL, INVALIDATION_FLUSH_MS
+
+
+logger = logging.getLogger(__name__)
+
+# Предел полезной нагрузки NOTIFY в PostgreSQL - 8000 байт
+MAX_PAYLOAD_BYTES = 7900
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+
+
+def encode_message(origin: str, changes: dict[str, Iterable[Hashable] | None]) -> str:
+    """
+    Кодирует сообщение шины для pg_notify.
+    Args:
+        origin (str): Отправитель: его собственные сообщения воркер пропускает
+        changes (dict): Изменённые ключи по видам изменений, None - изменено всё
+    Returns:
+        str: JSON-сообщение не длиннее MAX_PAYLOAD_BYTES
+    """
+    changes = {kind: None if keys is None else sorted(keys, key=str) for kind, keys in changes.items()}
+    payload = json.dumps({"origin": origin, "changes": changes}, separators=(",", ":"))
+    # Слишком длинный список ключей заменяется сбросом всего вида изменений
+    while len(payload.encode()) > MAX_PAYLOAD_BYTES:
+        kind = max((kind for kind in changes if changes[kind] is not None), key=lambda kind: len(changes[kind]))
+        changes[kind] = None
+        payload = json.dumps({"origin": origin, "changes": changes}, separators=(",", ":"))
+    return payload
+
+
+class InvalidationBus:
+    """
+    Шина инвалидации in-process кэшей между воркерами через PostgreSQL LISTEN/NOTIFY.
+
+    Кэши регистрируют обработчик под своим видом изменений (версии таблиц, ленты, пользователи,
+    области видимости) и публикуют ключи изменённых данных после локальной инвалидации.
+    Публикации копятся INVALIDATION_FLUSH_MS и уходят одним NOTIFY, повторяющиеся ключи схлопываются.
+    Каждый воркер слушает канал на отдельном соединении asyncpg и применяет чужие изменения локально.
+    Пока шина не запущена (один процесс, тесты), publish ничего не делает.
+    """
+
+    def __init__(self, channel: str, flush_ms: int):
+        self.channel = channel
+        self.flush_delay = flush_ms / 1000
+        self.origin = uuid.uuid4().hex
+        self.published = 0
+        self.received = 0
+        self.notifies = 0
+        self._handlers: dict[str, Callable[[tuple[Hashable, ...] | None], None]] = {}
+        self._pending: dict[str, set | None] = {}
+        self._applying = False
+        self._connection: asyncpg.Connection | None = None
+        self._supervisor: asyncio.Task | None = None
+        self._flusher: asyncio.Task | None = None
+
+    def register(self, kind: str, apply: Callable[[tuple[Hashable, ...] | None], None]) -> None:
+        """
+        Регистрирует обработчик изменений, пришедших от других воркеров.
+        Args:
+            kind (str): Вид изменений
+            apply (Callable): Инвалидация по ключам, None - сбросить всё
+        """
+        self._handlers[kind] = apply
+
+    def publish(self, kind: str, keys: Iterable[Hashable] | None) -> None:
+        """
+        Ставит изменение в очередь на отправку другим воркерам.
+        Args:
+            kind (str): Вид изменений
+            keys (Iterable[Hashable] | None): Изменённые ключи, None - изменено всё
+        """
+        if self._supervisor is None or self._applying:
+            return
+        if keys is not None:
+            keys = {key for key in keys if key is not None}
+            if not keys:
+                return
+        self.published += 1
+        self._merge(kind, keys)
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_later())
+
+    def _merge(self, kind: str, keys: set | None) -> None:
+        if keys is None:
+            self._pending[kind] = None
+        elif self._pending.get(kind, set()) is not None:
+            self._pending.setdefault(kind, set()).update(keys)
+
+    def apply(self, message: dict) -> None:
+        """
+        Применяет изменения другого воркера, не публикуя их повторно.
+        Args:
+            message (dict): Сообщение шины
+        """
+        if message.get("origin") == self.origin:
+            return
+        self.received += 1
+        self._applying = True
+        try:
+            for kind, keys in message["changes"].items():
+                handler = self._handlers.get(kind)
+                if handler is not None:
+                    handler(None if keys is None else tuple(keys))
+        finally:
+            self._applying = False
+
+    def reset_all(self) -> None:
+        """
+        Сбрасывает все зарегистрированные кэши: после переподключения часть уведомлений могла потеряться.
+        """
+        self.apply({"origin": None, "changes": dict.fromkeys(self._handlers)})
+
+    async def start(self) -> None:
+        if self.channel and self._supervisor is None:
+            self._supervisor = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._supervisor is None:
+            return
+        if self._flusher is not None and not self._flusher.done():
+            await self._flusher
+        self._supervisor.cancel()
+        await asyncio.gather(self._supervisor, return_exceptions=True)
+        self._supervisor = None
+
+    def _payload(self) -> str:
+        return encode_message(self.origin, self._pending)
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_delay)
+        if not self._pending or self._connection is None:
+            # Без соединения изменения ждут переподключения и отправляются после него
+            return
+        payload = self._payload()
+        pending, self._pending = self._pending, {}
+        try:
+            await self._connection.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+            self.notifies += 1
+        except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as exc:
+            # Изменения возвращаются в очередь и уйдут после переподключения
+            logger.warning("Шина инвалидации: не удалось отправить уведомление (%s)", exc)
+            for kind, keys in pending.items():
+                self._merge(kind, keys)
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.warning("Некорректное сообщение в канале %s", channel)
+            return
+        self.apply(message)
+
+    async def _listen(self) -> None:
+        dsn = make_url(DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        delay = RECONNECT_DELAY
+        connected_before = False
+        while True:
+            try:
+                connection = await asyncpg.connect(dsn)
+            except (OSError, asyncpg.PostgresError) as exc:
+                logger.warning("Шина инвалидации: нет соединения с базой (%s), повтор через %.0f с", exc, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+                continue
+
+            closed = asyncio.Event()
+            connection.add_termination_listener(lambda _: closed.set())
+            try:
+                await connection.add_listener(self.channel, self._on_notify)
+                self._connection = connection
+                delay = RECONNECT_DELAY
+                if connected_before:
+                    self.reset_all()
+                connected_before = True
+                if self._pending and (self._flusher is None or self._flusher.done()):
+                    self._flusher = asyncio.create_task(self._flush_later())
+                await closed.wait()
+                logger.warning("Шина инвалидации: соединение потеряно, переподключение")
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as exc:
+                logger.warning("Шина инвалидации: ошибка соединения (%s)", exc)
+            finally:
+                self._connection = None
+                if not connection.is_closed():
+                    await connection.close()
+
+    def stats(self) -> dict[str, int]:
+        return {"published": self.published, "notifies": self.notifies, "received": self.received}
+
+
+invalidation_bus = InvalidationBus(INVALIDATION_CHANNEL, INVALIDATION_FLUSH_MS)
@@ -0,0 +1,63 @@
+from sqlalchemy.orm import selectinload, joinedload, load_only
+
+from app.models import User, Team, Task, TaskComment, Meeting, Evaluation
+
+
+# Все связи моделей по умолчанию объявлены с lazy="raise", поэтому каждый обработчик
+# явно указывает, какие связи ему нужны. Профиль - это именованный набор опций загрузки
+# под конкретную страницу или операцию.
+LOADER_PROFILES: dict[str, tuple] = {
+    # Строка в списке задач: участники и комментарии с авторами
+    "task_list_row": (
+        selectinload(Task.users).load_only(User.id, User.name),
+        selectinload(Task.comments).joinedload(TaskComment.user).load_only(User.id, User.name),
+    ),
+    # Задача для формы редактирования, удаления и проверки доступа
+    "task_detail": (
+        selectinload(Task.users),
+    ),
+    # Задача в выпадающих списках форм
+    "task_option": (
+        load_only(Task.id, Task.title),
+    ),
+    # Строка в списке оценок: задача, оцениваемый и оценивающий
+    "evaluation_row": (
+        joinedload(Evaluation.task).load_only(Task.id, Task.title),
+        joinedload(Evaluation.user).load_only(User.id, User.name),
+        joinedload(Evaluation.evaluator).load_only(User.id, User.name),
+    ),
+    # Строка в списке встреч и встреча для редактирования
+    "meeting_row": (
+        selectinload(Meeting.users),
+    ),
+    # Строка в списке команд и команда для редактирования
+    "team_row": (
+        joinedload(Team.manager),
+        selectinload(Team.users),
+    ),
+    # Пользователь в выпадающих списках и чекбоксах форм
+    "user_option": (
+        load_only(User.id, User.name, User.role),
+    ),
+    # Пользователь вместе с командами (JWT-claims, проверка состава команд)
+    "user_teams": (
+        selectinload(User.teams).load_only(Team.id),
+    ),
+}
+
+
+def load_options(*profiles: str) -> tuple:
+    """
+    Возвращает опции загрузки для одного или нескольких именованных профилей.
+    Args:
+        *profiles (str): Названия профилей из LOADER_PROFILES
+    Returns:
+        tuple: Опции для select(...).options(*...) или AsyncSession.get(..., options=...)
+    """
+    options = ()
+    for name in profiles:
+        try:
+            options += LOADER_PROFILES[name]
+        except KeyError:
+            raise KeyError(f"Неизвестный профиль загрузки: {name}") from None
+    return options
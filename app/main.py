@@ -1,13 +1,52 @@
-from fastapi import FastAPI, Request
+import hmac
+import tracemalloc
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from datetime import date
 
 from app.routers import users, teams, tasks, meetings, evaluations, calendar, login
 from app.admin import init_admin
-from app.config import ADMIN_SECRET_KEY, templates
+from app.config import ADMIN_SECRET_KEY, METRICS_TOKEN, TRACEMALLOC_ENABLED, TRACEMALLOC_FRAMES, templates
+from app.passwords import password_hasher
+from app.versions import NotModified, not_modified_handler, ValidatorHeadersMiddleware
+from app.page_cache import page_cache, cached_page, PageCacheHit, page_cache_hit_handler, PageCacheMiddleware
+from app.auth import get_current_user, principal_cache, Principal
+from app.scope import manager_scopes
+from app.calendar_feed import feed_cache
+from app.invalidation import invalidation_bus
+from app.database import engine, read_engine, ReadYourWritesMiddleware
+from app.querylog import QueryAccountingMiddleware
+from app.monitoring import RequestMetricsMiddleware, render_metrics, loop_lag_monitor
+from app.profiling import ProfilingMiddleware, profile_store
+from app.memory import MemoryAccountingMiddleware, snapshot_diff
 
 
-app = FastAPI(title="Business management system")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await invalidation_bus.start()
+    await loop_lag_monitor.start()
+    if TRACEMALLOC_ENABLED:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    yield
+    if TRACEMALLOC_ENABLED:
+        tracemalloc.stop()
+    await loop_lag_monitor.stop()
+    await invalidation_bus.stop()
+    password_hasher.shutdown()
+
+
+app = FastAPI(title="Business management system", lifespan=lifespan)
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(PageCacheMiddleware)
+app.add_middleware(ValidatorHeadersMiddleware)
+app.add_middleware(MemoryAccountingMiddleware)
+app.add_middleware(RequestMetricsMiddleware)
+app.add_middleware(QueryAccountingMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_exception_handler(NotModified, not_modified_handler)
+app.add_exception_handler(PageCacheHit, page_cache_hit_handler)
 
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
@@ -22,7 +61,7 @@ app.include_router(evaluations.router)
 app.include_router(calendar.router)
 
 
-@app.get("/")
+@app.get("/", dependencies=[cached_page(per_user=False)])
 async def index(request: Request):
     """
     Отображает главную страницу.
@@ -32,4 +71,115 @@ async def index(request: Request):
         HTMLResponse: Шаблон "index.html"
     """
     today = date.today()
-    return templates.TemplateResponse("index.html", {"request": request, "today": today})
\ No newline at end of file
+    return templates.TemplateResponse("index.html", {"request": request, "today": today})
+
+
+@app.get("/cache/stats")
+async def cache_stats(current_user: Principal = Depends(get_current_user)):
+    """
+    Возвращает метрики in-process кэшей: размер, попадания, промахи и вытеснения.
+    Доступно только администратору.
+    Args:
+        current_user (Principal): Текущий пользователь
+    Returns:
+        dict: Метрики по каждому кэшу
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Недостаточно прав")
+    return {
+        "pages": page_cache.stats(),
+        "principals": principal_cache.stats(),
+        "scopes": manager_scopes.stats(),
+        "feeds": feed_cache.stats(),
+        "invalidation_bus": invalidation_bus.stats(),
+    }
+
+
+@app.get("/pool/stats")
+async def pool_stats(current_user: Principal = Depends(get_current_user)):
+    """
+    Возвращает состояние пула соединений с базой данных.
+    Доступно только администратору.
+    Args:
+        current_user (Principal): Текущий пользователь
+    Returns:
+        dict: Занятые соединения, overflow, таймауты и гистограмма ожидания соединения по основной базе и реплике
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Недостаточно прав")
+    stats = {"primary": engine.pool.stats()}
+    if read_engine is not engine:
+        stats["replica"] = read_engine.pool.stats()
+    return stats
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics(request: Request):
+    """
+    Возвращает метрики воркера в текстовом формате Prometheus: задержки, размеры ответов
+    и SQL-запросы по маршрутам, запросы в обработке, состояние пула, очередь bcrypt и время рендеринга шаблонов.
+    Если задан METRICS_TOKEN, требуется заголовок "Authorization: Bearer <METRICS_TOKEN>".
+    Args:
+        request (Request): Объект запроса FastAPI
+    Returns:
+        PlainTextResponse: Метрики в формате Prometheus
+    """
+    if METRICS_TOKEN and not hmac.compare_digest(request.headers.get("authorization", "").encode(),
+                                                 f"Bearer {METRICS_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="Неверный токен метрик")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/loop/stats")
+async def loop_stats(current_user: Principal = Depends(get_current_user)):
+    """
+    Возвращает задержку event loop воркера и стеки последних блокировок дольше LOOP_BLOCK_THRESHOLD_MS.
+    Доступно только администратору.
+    Args:
+        current_user (Principal): Текущий пользователь
+    Returns:
+        dict: Гистограмма задержки, число блокировок и их стеки
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Недостаточно прав")
+    return loop_lag_monitor.stats()
+
+
+@app.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def request_profile(profile_id: str, current_user: Principal = Depends(get_current_user)):
+    """
+    Возвращает профиль запроса, снятый ProfilingMiddleware (id из заголовка X-Profile-Id).
+    Доступно только администратору.
+    Args:
+        profile_id (str): ID профиля
+        current_user (Principal): Текущий пользователь
+    Returns:
+        PlainTextResponse: Отчёт cProfile
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Недостаточно прав")
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Профиль не найден")
+    return PlainTextResponse(profile.render())
+
+
+@app.get("/memory/diff")
+async def memory_diff(seconds: float = Query(30, ge=0, le=300), limit: int = Query(20, ge=1, le=200),
+                      current_user: Principal = Depends(get_current_user)):
+    """
+    Сравнивает снимки tracemalloc в начале и конце окна и возвращает строки кода,
+    аллокации которых выросли больше всего. Требует TRACEMALLOC_ENABLED.
+    Доступно только администратору.
+    Args:
+        seconds (float): Длина окна в секундах
+        limit (int): Сколько строк вернуть
+        current_user (Principal): Текущий пользователь
+    Returns:
+        dict: Окно и строки с наибольшим приростом памяти
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Недостаточно прав")
+    if not tracemalloc.is_tracing():
+        raise HTTPException(status_code=409, detail="tracemalloc выключен (TRACEMALLOC_ENABLED)")
+    return {"seconds": seconds, "top": await snapshot_diff(seconds, limit)}
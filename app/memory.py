@@ -0,0 +1,81 @@
+import asyncio
+import tracemalloc
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+# Аллокации самого tracemalloc и импорта модулей только зашумляют сравнение снимков
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class MemoryAccountingMiddleware:
+    """
+    Считает пиковый прирост памяти Python за время запроса по tracemalloc (если он включён).
+    Пик до начала ответа уходит в заголовок Server-Timing (mem), полный пик - в scope["state"]
+    для RequestMetricsMiddleware, поэтому эта middleware должна стоять внутри неё.
+
+    Пик у tracemalloc один на процесс: он сбрасывается, только когда других учитываемых запросов нет,
+    и при одновременных запросах значение - оценка сверху, включающая чужие аллокации.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._tracked = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not tracemalloc.is_tracing():
+            await self.app(scope, receive, send)
+            return
+
+        if self._tracked == 0:
+            tracemalloc.reset_peak()
+        self._tracked += 1
+        baseline = tracemalloc.get_traced_memory()[0]
+
+        async def send_with_memory(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                peak = max(0, tracemalloc.get_traced_memory()[1] - baseline)
+                timing = f'mem;desc="peak {peak // 1024} KiB"'
+                message["headers"] = [*message.get("headers", []), (b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_memory)
+        finally:
+            self._tracked -= 1
+            peak = max(0, tracemalloc.get_traced_memory()[1] - baseline)
+            scope.setdefault("state", {})["memory_peak_bytes"] = peak
+
+
+def _take_snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+
+async def snapshot_diff(seconds: float, limit: int) -> list[dict]:
+    """
+    Снимает два снимка tracemalloc с интервалом seconds и возвращает строки кода,
+    аллокации которых выросли больше всего за это окно.
+    Args:
+        seconds (float): Длина окна в секундах
+        limit (int): Сколько строк вернуть
+    Returns:
+        list[dict]: Место аллокации, прирост и итог в байтах и блоках
+    """
+    before = await asyncio.to_thread(_take_snapshot)
+    await asyncio.sleep(seconds)
+    after = await asyncio.to_thread(_take_snapshot)
+    return [
+        {
+            "location": str(stat.traceback),
+            "size_diff": stat.size_diff,
+            "size": stat.size,
+            "count_diff": stat.count_diff,
+            "count": stat.count,
+        }
+        for stat in after.compare_to(before, "lineno")[:limit]
+    ]
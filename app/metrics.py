@@ -0,0 +1,64 @@
+import bisect
+import time
+from collections import defaultdict
+
+from jinja2 import Template
+
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+MEMORY_BUCKETS = (65536, 262144, 1048576, 4194304, 16777216, 67108864, 268435456)
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными границами корзин (по умолчанию - длительности в миллисекундах).
+    Хранит только счётчики, поэтому годится для горячих путей.
+    Args:
+        buckets (tuple[float, ...]): Верхние границы корзин по возрастанию
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        Учитывает одно наблюдение.
+        Args:
+            value (float): Значение в единицах корзин
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> dict:
+        """
+        Возвращает накопительные счётчики по корзинам (как в Prometheus: "le" - не больше границы).
+        Returns:
+            dict: Корзины, число наблюдений и сумма в миллисекундах
+        """
+        cumulative, total = {}, 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            total += count
+            cumulative[str(bound)] = total
+        return {"buckets": cumulative, "count": self.count, "sum_ms": round(self.sum, 3)}
+
+
+# Время рендеринга по имени шаблона, заполняется TimedTemplate
+template_render_ms: defaultdict[str, Histogram] = defaultdict(Histogram)
+
+
+class TimedTemplate(Template):
+    """
+    Шаблон Jinja, который учитывает время рендеринга в template_render_ms.
+    Подключается через template_class окружения.
+    """
+
+    def render(self, *args, **kwargs) -> str:
+        started = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            template_render_ms[self.name].observe((time.perf_counter() - started) * 1000)
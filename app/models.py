@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, String, ForeignKey, DateTime, Table, Column
+from sqlalchemy import Integer, BigInteger, String, ForeignKey, DateTime, Table, Column, Index, CheckConstraint, DDL, event
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from datetime import datetime
 
@@ -10,47 +10,113 @@ users_teams = Table(
     "users_teams",
     Base.metadata,
     Column("user_id", ForeignKey("users.id"), primary_key=True),
-    Column("team_id", ForeignKey("teams.id"), primary_key=True)
+    Column("team_id", ForeignKey("teams.id"), primary_key=True),
+    Index("ix_users_teams_team_id_user_id", "team_id", "user_id"),
 )
 
 users_tasks = Table(
     "users_tasks",
     Base.metadata,
     Column("user_id", ForeignKey("users.id"), primary_key=True),
-    Column("task_id", ForeignKey("tasks.id"), primary_key=True)
+    Column("task_id", ForeignKey("tasks.id"), primary_key=True),
+    Index("ix_users_tasks_task_id_user_id", "task_id", "user_id"),
 )
 
 users_meetings = Table(
     "users_meetings",
     Base.metadata,
     Column("user_id", ForeignKey("users.id"), primary_key=True),
-    Column("meeting_id", ForeignKey("meetings.id"), primary_key=True)
+    Column("meeting_id", ForeignKey("meetings.id"), primary_key=True),
+    Index("ix_users_meetings_meeting_id_user_id", "meeting_id", "user_id"),
 )
 
+# Пересечения встреч одного участника запрещает exclusion-ограничение PostgreSQL
+# по (user_id, period) на users_meetings. Колонку period заполняют триггеры из meetings,
+# поэтому ORM о ней не знает. Те же объекты создаёт миграция b7d1c0e5a9f2.
+MEETING_OVERLAP_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    "ALTER TABLE users_meetings ADD COLUMN period tstzrange NOT NULL",
+    """
+    CREATE OR REPLACE FUNCTION users_meetings_set_period() RETURNS trigger AS $$
+    BEGIN
+        SELECT tstzrange(scheduled_at, ends_at) INTO NEW.period FROM meetings WHERE id = NEW.meeting_id;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER users_meetings_set_period BEFORE INSERT OR UPDATE OF meeting_id ON users_meetings
+    FOR EACH ROW EXECUTE FUNCTION users_meetings_set_period()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION meetings_sync_period() RETURNS trigger AS $$
+    BEGIN
+        UPDATE users_meetings SET period = tstzrange(NEW.scheduled_at, NEW.ends_at) WHERE meeting_id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER meetings_sync_period AFTER UPDATE OF scheduled_at, ends_at ON meetings
+    FOR EACH ROW EXECUTE FUNCTION meetings_sync_period()
+    """,
+    """
+    ALTER TABLE users_meetings ADD CONSTRAINT ex_users_meetings_no_overlap
+    EXCLUDE USING gist (user_id WITH =, period WITH &&)
+    """,
+]
+
+for statement in MEETING_OVERLAP_DDL:
+    event.listen(users_meetings, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+
+# Колонки, созданные только DDL выше: autogenerate alembic не должен предлагать их удалить
+DDL_ONLY_COLUMNS = {("users_meetings", "period")}
+
+# Версии данных для ETag/Last-Modified, общие для всех воркеров (см. app.versions).
+# Строка "*" - эпоха реестра: её время служит временем изменения ключей, которые ещё не менялись,
+# поэтому она создаётся вместе с таблицей. Те же строки создаёт миграция d8f1a6c3e2b9.
+data_versions = Table(
+    "data_versions",
+    Base.metadata,
+    Column("registry", String(16), primary_key=True),
+    Column("key", String(64), primary_key=True),
+    Column("version", BigInteger, nullable=False),
+    Column("modified_at", DateTime(timezone=True), nullable=False),
+)
+
+DATA_VERSIONS_SEED = """
+    INSERT INTO data_versions (registry, key, version, modified_at)
+    VALUES ('feeds', '*', 0, CURRENT_TIMESTAMP), ('tables', '*', 0, CURRENT_TIMESTAMP)
+"""
+
+event.listen(data_versions, "after_create", DDL(DATA_VERSIONS_SEED))
+
 
 class User(Base):
     __tablename__="users"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    name: Mapped[str] = mapped_column(String, nullable=False)
+    name: Mapped[str] = mapped_column(String, nullable=False, index=True)
     email: Mapped[str] = mapped_column(String, nullable=False, unique=True)
     hashed_password: Mapped[str] = mapped_column(String, nullable=False)
     role: Mapped[str] = mapped_column(String, nullable=False, default="user")
+    # Растёт при смене роли или состава команд: claims токенов с другой версией не используются
+    claims_version: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
 
     teams: Mapped[list["Team"]] = relationship(
-        "Team", secondary="users_teams", back_populates="users", lazy="selectin",
+        "Team", secondary="users_teams", back_populates="users", lazy="raise",
     )
     tasks: Mapped[list["Task"]] = relationship(
-        "Task", secondary="users_tasks", back_populates="users", lazy="selectin"
+        "Task", secondary="users_tasks", back_populates="users", lazy="raise"
     )
     meetings: Mapped[list["Meeting"]] = relationship(
-        "Meeting", secondary="users_meetings", back_populates="users", lazy="selectin"
+        "Meeting", secondary="users_meetings", back_populates="users", lazy="raise"
     )
     evaluations: Mapped[list["Evaluation"]] = relationship(
-        "Evaluation", foreign_keys="Evaluation.user_id", back_populates="user", lazy="selectin"
+        "Evaluation", foreign_keys="Evaluation.user_id", back_populates="user", lazy="raise"
     )
     evaluations_given: Mapped[list["Evaluation"]] = relationship(
-        "Evaluation", foreign_keys="Evaluation.evaluator_id", back_populates="evaluator", lazy="selectin"
+        "Evaluation", foreign_keys="Evaluation.evaluator_id", back_populates="evaluator", lazy="raise"
     )
 
     def __str__(self):
@@ -62,11 +128,11 @@ class Team(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     title: Mapped[str] = mapped_column(String, nullable=False)
-    manager_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=True)
+    manager_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=True, index=True)
 
-    manager: Mapped["User"] = relationship("User", lazy="selectin")
+    manager: Mapped["User"] = relationship("User", lazy="raise")
     users: Mapped[list["User"]] = relationship(
-        "User", secondary="users_teams", back_populates="teams", lazy="selectin"
+        "User", secondary="users_teams", back_populates="teams", lazy="raise"
     )
 
 
@@ -74,19 +140,19 @@ class Task(Base):
     __tablename__="tasks"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    title: Mapped[str] = mapped_column(String, nullable=False)
+    title: Mapped[str] = mapped_column(String, nullable=False, index=True)
     description: Mapped[str] = mapped_column(String, nullable=True)
     status: Mapped[str] = mapped_column(String, nullable=False, default="open")
-    deadline: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+    deadline: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True, index=True)
 
     users: Mapped[list["User"]] = relationship(
-        "User", secondary="users_tasks", back_populates="tasks", lazy="selectin"
+        "User", secondary="users_tasks", back_populates="tasks", lazy="raise"
     )
     evaluations: Mapped[list["Evaluation"]] = relationship(
-        "Evaluation", back_populates="task", lazy="selectin", cascade="all, delete-orphan"
+        "Evaluation", back_populates="task", lazy="raise", cascade="all, delete-orphan"
     )
     comments: Mapped[list["TaskComment"]] = relationship(
-        "TaskComment", back_populates="task", lazy="selectin", cascade="all, delete-orphan"
+        "TaskComment", back_populates="task", lazy="raise", cascade="all, delete-orphan"
     )
 
     def __str__(self):
@@ -100,13 +166,13 @@ class TaskComment(Base):
     content: Mapped[str] = mapped_column(String, nullable=False)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=moscow_now)
-    task_id: Mapped[int] = mapped_column(ForeignKey("tasks.id"))
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    task_id: Mapped[int] = mapped_column(ForeignKey("tasks.id"), index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
 
     task: Mapped["Task"] = relationship(
-        "Task", back_populates="comments", lazy="selectin"
+        "Task", back_populates="comments", lazy="raise"
     )
-    user: Mapped["User"] = relationship("User", lazy="selectin")
+    user: Mapped["User"] = relationship("User", lazy="raise")
 
 
 class Meeting(Base):
@@ -114,12 +180,21 @@ class Meeting(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     title: Mapped[str] = mapped_column(String, nullable=False)
-    scheduled_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    scheduled_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
+    ends_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
 
     users: Mapped[list["User"]] = relationship(
-        "User", secondary="users_meetings", back_populates="meetings", lazy="selectin"
+        "User", secondary="users_meetings", back_populates="meetings", lazy="raise"
+    )
+
+    __table_args__ = (
+        CheckConstraint("ends_at > scheduled_at", name="ck_meetings_ends_after_start"),
     )
 
+    @property
+    def duration_minutes(self) -> int:
+        return int((self.ends_at - self.scheduled_at).total_seconds() // 60)
+
 
 class Evaluation(Base):
     __tablename__="evaluations"
@@ -128,17 +203,17 @@ class Evaluation(Base):
     score: Mapped[int] = mapped_column(Integer, nullable=False)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=moscow_now)
-    task_id: Mapped[int] = mapped_column(ForeignKey("tasks.id"))
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
-    evaluator_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    task_id: Mapped[int] = mapped_column(ForeignKey("tasks.id"), index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    evaluator_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
 
     task: Mapped["Task"] = relationship(
-        "Task", back_populates="evaluations", lazy="selectin"
+        "Task", back_populates="evaluations", lazy="raise"
     )
     user: Mapped["User"] = relationship(
-        "User", foreign_keys=[user_id], back_populates="evaluations", lazy="selectin"
+        "User", foreign_keys=[user_id], back_populates="evaluations", lazy="raise"
     )
     evaluator: Mapped["User"] = relationship(
-        "User", foreign_keys=[evaluator_id], back_populates="evaluations_given", lazy="selectin"
+        "User", foreign_keys=[evaluator_id], back_populates="evaluations_given", lazy="raise"
     )
 
@@ -0,0 +1,308 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import LOOP_LAG_INTERVAL_MS, LOOP_BLOCK_THRESHOLD_MS
+from app.database import engine, read_engine
+from app.metrics import Histogram, SIZE_BUCKETS, MEMORY_BUCKETS, template_render_ms
+from app.passwords import password_hasher
+from app.querylog import current_sql_stats
+
+
+logger = logging.getLogger(__name__)
+BLOCKED_STACKS_KEPT = 20
+
+
+@dataclass
+class RouteMetrics:
+    """
+    Накопленные метрики одного маршрута.
+    Attributes:
+        latency_ms (Histogram): Время обработки запроса в миллисекундах
+        size_bytes (Histogram): Размер тела ответа в байтах
+        statuses (Counter): Число ответов по коду статуса
+        db_queries (int): Количество SQL-запросов
+        db_ms (float): Суммарное время SQL-запросов в миллисекундах
+        db_rows (int): Количество строк SQL-запросов
+        memory_peak_bytes (Histogram): Пиковый прирост памяти за запрос (при включённом tracemalloc)
+    """
+    latency_ms: Histogram = field(default_factory=Histogram)
+    size_bytes: Histogram = field(default_factory=lambda: Histogram(SIZE_BUCKETS))
+    statuses: Counter = field(default_factory=Counter)
+    db_queries: int = 0
+    db_ms: float = 0.0
+    db_rows: int = 0
+    memory_peak_bytes: Histogram = field(default_factory=lambda: Histogram(MEMORY_BUCKETS))
+
+
+class RequestMetrics:
+    """
+    Метрики HTTP-запросов воркера по методу и шаблону маршрута.
+    Шаблон (/tasks/{task_id}/edit), а не путь, ограничивает число рядов;
+    запросы без маршрута FastAPI (статика, админка, 404) попадают в "other".
+    """
+
+    def __init__(self):
+        self.routes: defaultdict[tuple[str, str], RouteMetrics] = defaultdict(RouteMetrics)
+        self.in_flight = 0
+
+    def record(self, scope: Scope, status: int, elapsed_ms: float, size: int) -> None:
+        route = scope.get("route")
+        metrics = self.routes[scope["method"], route.path if route is not None else "other"]
+        metrics.latency_ms.observe(elapsed_ms)
+        metrics.size_bytes.observe(size)
+        metrics.statuses[status] += 1
+        stats = current_sql_stats.get()
+        if stats is not None:
+            metrics.db_queries += stats.queries
+            metrics.db_ms += stats.time_ms
+            metrics.db_rows += stats.rows
+        memory_peak = scope.get("state", {}).get("memory_peak_bytes")
+        if memory_peak is not None:
+            metrics.memory_peak_bytes.observe(memory_peak)
+
+
+request_metrics = RequestMetrics()
+
+
+class RequestMetricsMiddleware:
+    """
+    Учитывает в request_metrics время обработки, размер ответа, статус и SQL-запросы каждого запроса.
+    Время считается до отправки последней части тела, поэтому потоковые ответы учитываются целиком.
+    Должен стоять внутри QueryAccountingMiddleware, чтобы видеть счётчики SQL,
+    и снаружи MemoryAccountingMiddleware, чтобы видеть пик памяти.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status, size = 500, 0
+        started = time.perf_counter()
+
+        async def send_and_measure(message: Message) -> None:
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        request_metrics.in_flight += 1
+        try:
+            await self.app(scope, receive, send_and_measure)
+        finally:
+            request_metrics.in_flight -= 1
+            request_metrics.record(scope, status, (time.perf_counter() - started) * 1000, size)
+
+
+class EventLoopLagMonitor:
+    """
+    Измеряет задержку event loop: фоновая задача засыпает на interval_ms
+    и учитывает, насколько позже запланированного она получила управление.
+    Задержка показывает, сколько ждут все корутины воркера, пока loop занят синхронной работой.
+
+    Если задан block_threshold_ms, отдельный поток-сторож проверяет, что задача вовремя просыпается,
+    и когда loop заблокирован дольше порога, снимает стек потока loop - это и есть блокирующий код.
+    Стек пишется в лог и сохраняется в blocked_stacks (последние BLOCKED_STACKS_KEPT).
+    Args:
+        interval_ms (float): Период измерения в миллисекундах, 0 - не измерять
+        block_threshold_ms (float): Порог блокировки для снятия стека, 0 - не снимать
+    """
+
+    def __init__(self, interval_ms: float, block_threshold_ms: float = 0):
+        self.interval = interval_ms / 1000
+        self.block_threshold = block_threshold_ms / 1000
+        self.lag_ms = Histogram()
+        self.blocks = 0
+        self.blocked_stacks: deque[dict] = deque(maxlen=BLOCKED_STACKS_KEPT)
+        self._task: asyncio.Task | None = None
+        self._heartbeat = 0.0
+        self._loop_thread_id: int | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    async def start(self) -> None:
+        if self.interval <= 0 or self._task is not None:
+            return
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.create_task(self._run())
+        if self.block_threshold > 0:
+            self._loop_thread_id = threading.get_ident()
+            self._stopped.clear()
+            self._watchdog = threading.Thread(target=self._watch, name="loop-block-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        if self._watchdog is not None:
+            self._stopped.set()
+            self._watchdog.join()
+            self._watchdog = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + self.interval
+            self._heartbeat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.lag_ms.observe(max(0.0, loop.time() - scheduled) * 1000)
+
+    def _watch(self) -> None:
+        reported = None
+        while not self._stopped.wait(self.block_threshold / 2):
+            heartbeat = self._heartbeat
+            blocked = time.monotonic() - heartbeat - self.interval
+            if blocked < self.block_threshold or heartbeat == reported:
+                continue
+            # Одна блокировка учитывается один раз, сколько бы она ни длилась
+            reported = heartbeat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            self.blocks += 1
+            self.blocked_stacks.append({
+                "at": datetime.now(timezone.utc).isoformat(),
+                "blocked_ms": round(blocked * 1000, 1),
+                "stack": stack,
+            })
+            logger.warning("Event loop заблокирован дольше %.0f мс:\n%s", blocked * 1000, stack)
+
+    def stats(self) -> dict:
+        return {"lag_ms": self.lag_ms.snapshot(), "blocks": self.blocks, "blocked_stacks": list(self.blocked_stacks)}
+
+
+loop_lag_monitor = EventLoopLagMonitor(LOOP_LAG_INTERVAL_MS, LOOP_BLOCK_THRESHOLD_MS)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(value: float) -> str:
+    return str(value) if isinstance(value, int) else repr(round(value, 6))
+
+
+class _Exposition:
+    """
+    Собирает текстовый формат Prometheus (text/plain; version=0.0.4).
+    """
+
+    def __init__(self):
+        self.lines: list[str] = []
+
+    def family(self, name: str, kind: str, help_text: str) -> None:
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name: str, labels: dict[str, str], value: float) -> None:
+        rendered = ",".join(f'{key}="{_escape(str(label))}"' for key, label in labels.items())
+        self.lines.append(f"{name}{{{rendered}}} {_format(value)}" if rendered else f"{name} {_format(value)}")
+
+    def histogram(self, name: str, labels: dict[str, str], histogram: Histogram, scale: float = 1) -> None:
+        total = 0
+        for bound, count in zip((*histogram.buckets, None), histogram.counts):
+            total += count
+            le = "+Inf" if bound is None else _format(bound * scale)
+            self.sample(f"{name}_bucket", {**labels, "le": le}, total)
+        self.sample(f"{name}_sum", labels, histogram.sum * scale)
+        self.sample(f"{name}_count", labels, histogram.count)
+
+    def render(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def render_metrics() -> str:
+    """
+    Выгружает метрики воркера в текстовом формате Prometheus.
+    Длительности переводятся в секунды, как принято в Prometheus.
+    Returns:
+        str: Текст для ответа /metrics
+    """
+    out = _Exposition()
+    routes = sorted(request_metrics.routes.items())
+
+    # Без общего хранилища каждый воркер отдаёт свои метрики; PID отличает воркеры при сборе
+    out.family("process_pid", "gauge", "PID воркера")
+    out.sample("process_pid", {}, os.getpid())
+
+    out.family("http_requests_in_flight", "gauge", "Запросы, обрабатываемые сейчас")
+    out.sample("http_requests_in_flight", {}, request_metrics.in_flight)
+
+    out.family("http_requests_total", "counter", "Ответы по маршруту и коду статуса")
+    for (method, route), metrics in routes:
+        for status, count in sorted(metrics.statuses.items()):
+            out.sample("http_requests_total", {"method": method, "route": route, "status": str(status)}, count)
+
+    out.family("http_request_duration_seconds", "histogram", "Время обработки запроса")
+    for (method, route), metrics in routes:
+        out.histogram("http_request_duration_seconds", {"method": method, "route": route}, metrics.latency_ms, 0.001)
+
+    out.family("http_response_size_bytes", "histogram", "Размер тела ответа")
+    for (method, route), metrics in routes:
+        out.histogram("http_response_size_bytes", {"method": method, "route": route}, metrics.size_bytes)
+
+    out.family("http_request_memory_peak_bytes", "histogram", "Пиковый прирост памяти Python за запрос")
+    for (method, route), metrics in routes:
+        if metrics.memory_peak_bytes.count:
+            out.histogram("http_request_memory_peak_bytes", {"method": method, "route": route},
+                          metrics.memory_peak_bytes)
+
+    out.family("db_queries_total", "counter", "SQL-запросы по маршруту")
+    for (method, route), metrics in routes:
+        out.sample("db_queries_total", {"method": method, "route": route}, metrics.db_queries)
+    out.family("db_query_duration_seconds_total", "counter", "Суммарное время SQL-запросов по маршруту")
+    for (method, route), metrics in routes:
+        out.sample("db_query_duration_seconds_total", {"method": method, "route": route}, metrics.db_ms / 1000)
+    out.family("db_rows_total", "counter", "Строки SQL-запросов по маршруту")
+    for (method, route), metrics in routes:
+        out.sample("db_rows_total", {"method": method, "route": route}, metrics.db_rows)
+
+    pools = {"primary": engine.pool}
+    if read_engine is not engine:
+        pools["replica"] = read_engine.pool
+    for name, kind, help_text, read in (
+        ("db_pool_size", "gauge", "Размер пула соединений", lambda pool: pool.size()),
+        ("db_pool_checked_out", "gauge", "Занятые соединения", lambda pool: pool.checkedout()),
+        ("db_pool_checked_in", "gauge", "Свободные соединения в пуле", lambda pool: pool.checkedin()),
+        ("db_pool_overflow", "gauge", "Соединения сверх размера пула", lambda pool: pool.overflow()),
+        ("db_pool_timeouts_total", "counter", "Таймауты ожидания соединения", lambda pool: pool.timeouts),
+    ):
+        out.family(name, kind, help_text)
+        for pool_name, pool in pools.items():
+            out.sample(name, {"pool": pool_name}, read(pool))
+    out.family("db_pool_wait_seconds", "histogram", "Ожидание свободного соединения")
+    for pool_name, pool in pools.items():
+        out.histogram("db_pool_wait_seconds", {"pool": pool_name}, pool.wait_ms, 0.001)
+
+    out.family("password_hash_queue_depth", "gauge", "Операции bcrypt, ожидающие свободного слота")
+    out.sample("password_hash_queue_depth", {}, password_hasher.queue_depth)
+    out.family("password_hash_in_flight", "gauge", "Выполняемые операции bcrypt")
+    out.sample("password_hash_in_flight", {}, password_hasher.in_flight)
+
+    out.family("event_loop_lag_seconds", "histogram", "Задержка event loop")
+    out.histogram("event_loop_lag_seconds", {}, loop_lag_monitor.lag_ms, 0.001)
+    out.family("event_loop_blocks_total", "counter", "Блокировки event loop дольше LOOP_BLOCK_THRESHOLD_MS")
+    out.sample("event_loop_blocks_total", {}, loop_lag_monitor.blocks)
+
+    out.family("template_render_duration_seconds", "histogram", "Время рендеринга шаблона")
+    for name, histogram in sorted(template_render_ms.items()):
+        out.histogram("template_render_duration_seconds", {"template": name}, histogram, 0.001)
+
+    return out.render()
@@ -0,0 +1,168 @@
+from dataclasses import dataclass
+from typing import Hashable, Iterable
+
+from fastapi import Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.auth import get_current_user, Principal
+from app.cache import TTLCache
+from app.config import PAGE_CACHE_SIZE, PAGE_CACHE_TTL, PAGE_CACHE_MAX_BYTES, PAGE_CACHE_MAX_ENTRY_BYTES
+from app.database import get_async_db, replica_may_lag
+from app.scope import Scope as VisibilityScope, resolve_scope
+from app.versions import table_versions, check_validators
+
+
+@dataclass(frozen=True)
+class CachedPage:
+    """
+    Отрендеренная страница в кэше.
+    Attributes:
+        body (bytes): Тело ответа
+        media_type (str | None): Content-Type ответа
+        tables (frozenset[str]): Таблицы, от которых зависит страница
+    """
+    body: bytes
+    media_type: str | None
+    tables: frozenset[str]
+
+
+class PageCache(TTLCache):
+    """
+    Кэш отрендеренных страниц, ограниченный числом записей и суммарным размером тел.
+    Ключ включает версии таблиц страницы, поэтому страница, отрендеренная до записи,
+    но сохранённая после неё, никогда не будет отдана. Записи, зависящие от изменённых
+    таблиц, удаляются сразу, чтобы не занимать память до вытеснения.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, maxweight: int):
+        super().__init__(maxsize=maxsize, ttl=ttl, maxweight=maxweight, weigher=lambda page: len(page.body))
+        self.invalidations = 0
+
+    def invalidate(self, tables: Iterable[str] | None) -> None:
+        """
+        Удаляет страницы, зависящие от изменённых таблиц.
+        Args:
+            tables (Iterable[str] | None): Изменённые таблицы, None - все
+        """
+        if tables is None:
+            self.invalidations += len(self)
+            self.clear()
+            return
+        changed = set(tables)
+        for key, page in self.items():
+            if page.tables & changed:
+                self.pop(key)
+                self.invalidations += 1
+
+    def stats(self) -> dict[str, int]:
+        return {**super().stats(), "invalidations": self.invalidations}
+
+
+page_cache = PageCache(maxsize=PAGE_CACHE_SIZE, ttl=PAGE_CACHE_TTL, maxweight=PAGE_CACHE_MAX_BYTES)
+table_versions.listeners.append(page_cache.invalidate)
+
+
+class PageCacheHit(Exception):
+    """
+    Прерывает обработку запроса, для которого в кэше есть готовая страница.
+    Args:
+        page (CachedPage): Страница из кэша
+    """
+
+    def __init__(self, page: CachedPage):
+        self.page = page
+
+
+async def page_cache_hit_handler(request: Request, exc: PageCacheHit) -> Response:
+    return Response(content=exc.page.body, media_type=exc.page.media_type)
+
+
+def scope_key(principal: Principal, scope: VisibilityScope) -> Hashable:
+    """
+    Ключ области видимости: администраторы видят одно и то же, менеджеры с одинаковым
+    набором команд - тоже, пользователь видит только своё.
+    Args:
+        principal (Principal): Текущий пользователь
+        scope (VisibilityScope): Область видимости пользователя
+    Returns:
+        Hashable: Ключ для кэша страниц
+    """
+    if scope.unrestricted:
+        return (principal.role,)
+    if principal.role == "manager":
+        return principal.role, scope.team_ids
+    return principal.role, principal.id
+
+
+def _lookup(request: Request, tables: tuple[str, ...], tokens: tuple[str, ...], owner: Hashable) -> None:
+    key = (request.url.path, tuple(sorted(request.query_params.multi_items())), owner, tokens)
+    page = page_cache.get(key)
+    if page is not None:
+        raise PageCacheHit(page)
+    request.state.page_cache_entry = (key, frozenset(tables))
+
+
+def cached_page(*tables: str, per_user: bool = True):
+    """
+    Зависимость для часто читаемых страниц: проверяет условный GET (как conditional_get),
+    затем ищет готовую страницу по пути, параметрам запроса, области видимости и версиям таблиц.
+    Промах помечает запрос, и PageCacheMiddleware сохраняет успешный ответ.
+    Args:
+        *tables (str): Имена таблиц, от которых зависит страница
+        per_user (bool): Зависит ли страница от области видимости пользователя
+    Returns:
+        Depends: Зависимость FastAPI
+    """
+    async def check(request: Request, db: AsyncSession = Depends(get_async_db),
+                    current_user: Principal = Depends(get_current_user)) -> None:
+        tokens = await check_validators(request, db, tables, current_user.role, current_user.id)
+        scope = await resolve_scope(db, current_user)
+        _lookup(request, tables, tokens, scope_key(current_user, scope))
+
+    async def check_anonymous(request: Request, db: AsyncSession = Depends(get_async_db)) -> None:
+        _lookup(request, tables, await check_validators(request, db, tables), None)
+
+    return Depends(check if per_user else check_anonymous)
+
+
+class PageCacheMiddleware:
+    """
+    Сохраняет в кэш успешные ответы запросов, помеченных зависимостью cached_page.
+    Тело передаётся клиенту без задержки; ответы больше PAGE_CACHE_MAX_ENTRY_BYTES не кэшируются.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        chunks: list[bytes] | None = None
+        size = 0
+        media_type = None
+
+        async def send_and_capture(message: Message) -> None:
+            nonlocal chunks, size, media_type
+            if message["type"] == "http.response.start":
+                state = scope.get("state", {})
+                if (message["status"] == 200 and "page_cache_entry" in state
+                        and not replica_may_lag(state, state["modified_at"])):
+                    chunks = []
+                    headers = dict(message.get("headers", []))
+                    media_type = headers.get(b"content-type", b"").decode("latin-1") or None
+            elif message["type"] == "http.response.body" and chunks is not None:
+                body = message.get("body", b"")
+                size += len(body)
+                if size > PAGE_CACHE_MAX_ENTRY_BYTES:
+                    chunks = None
+                else:
+                    chunks.append(body)
+                    if not message.get("more_body", False):
+                        key, tables = scope["state"]["page_cache_entry"]
+                        page_cache.set(key, CachedPage(body=b"".join(chunks), media_type=media_type, tables=tables))
+            await send(message)
+
+        await self.app(scope, receive, send_and_capture)
@@ -0,0 +1,143 @@
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Annotated, Any
+
+from fastapi import HTTPException
+from pydantic import BeforeValidator
+from sqlalchemy import Select, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+
+from app.config import PAGE_SIZE, MAX_PAGE_SIZE
+
+
+def _empty_to_none(value: Any) -> Any:
+    return value if value != "" else None
+
+
+# Типы фильтров для HTML-форм: пустое поле формы приходит как пустая строка
+OptionalInt = Annotated[int | None, BeforeValidator(_empty_to_none)]
+OptionalStr = Annotated[str | None, BeforeValidator(_empty_to_none)]
+OptionalDatetime = Annotated[datetime | None, BeforeValidator(_empty_to_none)]
+
+
+@dataclass
+class Page:
+    """
+    Страница результатов keyset-пагинации.
+    Attributes:
+        items (list): Объекты текущей страницы
+        next_cursor (str | None): Курсор следующей страницы или None, если страница последняя
+        limit (int): Размер страницы
+    """
+    items: list
+    next_cursor: str | None
+    limit: int
+
+
+def encode_cursor(sort_value: Any, last_id: int) -> str:
+    """
+    Кодирует позицию последней строки страницы в непрозрачный курсор.
+    Args:
+        sort_value (Any): Значение колонки сортировки последней строки
+        last_id (int): ID последней строки
+    Returns:
+        str: Курсор для параметра запроса cursor
+    """
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, last_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_column: InstrumentedAttribute | None) -> tuple[Any, int]:
+    """
+    Декодирует курсор, полученный из encode_cursor.
+    Args:
+        cursor (str): Курсор из параметра запроса
+        sort_column (InstrumentedAttribute | None): Колонка сортировки
+    Returns:
+        tuple[Any, int]: Значение колонки сортировки и ID последней строки
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, last_id = json.loads(raw)
+        if sort_value is not None and sort_column is not None and sort_column.type.python_type is datetime:
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, int(last_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+
+
+def keyset_after(sort_column: InstrumentedAttribute | None, id_column: InstrumentedAttribute,
+                 sort_value: Any, last_id: int):
+    """
+    Строит условие "строка идёт после (sort_value, last_id)" для порядка
+    sort_column ASC NULLS LAST, id ASC.
+    Args:
+        sort_column (InstrumentedAttribute | None): Колонка сортировки (None - только по ID)
+        id_column (InstrumentedAttribute): Колонка ID
+        sort_value (Any): Значение колонки сортировки последней строки
+        last_id (int): ID последней строки
+    Returns:
+        ColumnElement: Условие для where()
+    """
+    if sort_column is None:
+        return id_column > last_id
+    if sort_value is None:
+        return and_(sort_column.is_(None), id_column > last_id)
+    after = or_(sort_column > sort_value, and_(sort_column == sort_value, id_column > last_id))
+    if sort_column.nullable:
+        after = or_(after, sort_column.is_(None))
+    return after
+
+
+def keyset_order(stmt: Select, id_column: InstrumentedAttribute,
+                 sort_column: InstrumentedAttribute | None = None) -> Select:
+    """
+    Добавляет к запросу порядок sort_column ASC NULLS LAST, id ASC,
+    которому соответствуют курсоры keyset-пагинации.
+    Args:
+        stmt (Select): Запрос
+        id_column (InstrumentedAttribute): Колонка ID
+        sort_column (InstrumentedAttribute | None): Колонка сортировки (None - только по ID)
+    Returns:
+        Select: Упорядоченный запрос
+    """
+    if sort_column is None:
+        return stmt.order_by(id_column)
+    return stmt.order_by(sort_column.asc().nulls_last(), id_column)
+
+
+async def paginate(db: AsyncSession, stmt: Select, id_column: InstrumentedAttribute,
+                   sort_column: InstrumentedAttribute | None = None,
+                   cursor: str | None = None, limit: int = PAGE_SIZE) -> Page:
+    """
+    Выполняет запрос с keyset-пагинацией по (sort_column, id).
+    Время ответа и память зависят от размера страницы, а не от размера таблицы.
+    Args:
+        db (AsyncSession): Асинхронная сессия базы данных
+        stmt (Select): Запрос с уже применёнными фильтрами и опциями загрузки
+        id_column (InstrumentedAttribute): Колонка ID
+        sort_column (InstrumentedAttribute | None): Индексированная колонка сортировки
+        cursor (str | None): Курсор предыдущей страницы
+        limit (int): Размер страницы
+    Returns:
+        Page: Страница результатов
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if cursor:
+        stmt = stmt.where(keyset_after(sort_column, id_column, *decode_cursor(cursor, sort_column)))
+
+    result = await db.execute(keyset_order(stmt, id_column, sort_column).limit(limit + 1))
+    items = result.scalars().all()
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        sort_value = getattr(last, sort_column.key) if sort_column is not None else None
+        next_cursor = encode_cursor(sort_value, getattr(last, id_column.key))
+    return Page(items=items, next_cursor=next_cursor, limit=limit)
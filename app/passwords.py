@@ -0,0 +1,105 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from passlib.context import CryptContext
+
+from app.config import (BCRYPT_ROUNDS, PASSWORD_HASH_EXECUTOR, PASSWORD_HASH_WORKERS,
+                        PASSWORD_HASH_MAX_CONCURRENCY)
+
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str) -> tuple[bool, str | None]:
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Выполняет bcrypt-хэширование в пуле потоков или процессов, не блокируя event loop.
+    Число одновременных операций ограничено семафором, остальные ждут в очереди.
+    Args:
+        executor (str): Тип пула: "thread" или "process"
+        workers (int): Количество воркеров пула
+        max_concurrency (int): Максимальное число одновременно выполняемых операций
+    """
+
+    def __init__(self, executor: str = "thread", workers: int = 4, max_concurrency: int = 8):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Неизвестный тип пула для хэширования паролей: {executor}")
+        self.executor_type = executor
+        self.workers = workers
+        self.max_concurrency = max_concurrency
+        self._executor: Executor | None = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.waiting = 0
+        self.in_flight = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Количество операций, ожидающих свободного слота.
+        """
+        return self.waiting
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, func, *args):
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        """
+        Хэширует пароль в пуле.
+        Args:
+            password (str): Пароль в виде строки
+        Returns:
+            str: Хэшированный пароль
+        """
+        return await self._run(_hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> tuple[bool, str | None]:
+        """
+        Проверяет пароль в пуле и, если хэш создан с устаревшими параметрами
+        (например, другим BCRYPT_ROUNDS), возвращает новый хэш.
+        Args:
+            password (str): Введённый пароль
+            hashed_password (str): Сохранённый хэш
+        Returns:
+            tuple[bool, str | None]: Результат проверки и новый хэш (или None)
+        """
+        return await self._run(_verify_and_update, password, hashed_password)
+
+    def shutdown(self) -> None:
+        """
+        Останавливает пул воркеров.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    executor=PASSWORD_HASH_EXECUTOR,
+    workers=PASSWORD_HASH_WORKERS,
+    max_concurrency=PASSWORD_HASH_MAX_CONCURRENCY,
+)
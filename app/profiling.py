@@ -0,0 +1,110 @@
+import cProfile
+import io
+import pstats
+import time
+import uuid
+from dataclasses import dataclass
+
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.auth import token_is_admin
+from app.cache import TTLCache
+from app.config import PROFILING_ENABLED, PROFILE_STORE_SIZE, PROFILE_STORE_TTL
+from app.database import async_session
+
+
+PROFILE_TOP_N = 60
+
+
+@dataclass(frozen=True)
+class RequestProfile:
+    """
+    Профиль одного запроса.
+    Attributes:
+        method (str): HTTP-метод
+        path (str): Путь запроса
+        status (int): Код ответа
+        elapsed_ms (float): Время обработки в миллисекундах
+        stats (str): Отчёт pstats, отсортированный по накопленному времени
+    """
+    method: str
+    path: str
+    status: int
+    elapsed_ms: float
+    stats: str
+
+    def render(self) -> str:
+        return f"{self.method} {self.path} -> {self.status}, {self.elapsed_ms:.1f} ms\n\n{self.stats}"
+
+
+profile_store = TTLCache(maxsize=PROFILE_STORE_SIZE, ttl=PROFILE_STORE_TTL)
+
+
+def _requested(connection: HTTPConnection) -> bool:
+    return connection.headers.get("x-profile") == "1" or connection.query_params.get("_profile") == "1"
+
+
+class ProfilingMiddleware:
+    """
+    Профилирует отдельный запрос через cProfile по заголовку "X-Profile: 1" или параметру _profile=1,
+    если профилирование включено (PROFILING_ENABLED) и cookie принадлежит администратору.
+    Ответ получает заголовок X-Profile-Id, отчёт забирается по /profiles/<id>.
+
+    cProfile работает на весь поток, поэтому в отчёт попадает и работа запросов, выполнявшихся
+    одновременно с профилируемым; одновременно профилируется не больше одного запроса,
+    остальные получают "X-Profile-Id: busy" и выполняются без профилировщика.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._active = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not PROFILING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        connection = HTTPConnection(scope)
+        if not _requested(connection) or not await self._is_admin(connection):
+            await self.app(scope, receive, send)
+            return
+
+        if self._active:
+            await self.app(scope, receive, self._with_header(send, "busy", {}))
+            return
+
+        profile_id = uuid.uuid4().hex
+        response = {"status": 500}
+        profiler = cProfile.Profile()
+        self._active = True
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, self._with_header(send, profile_id, response))
+        finally:
+            profiler.disable()
+            self._active = False
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+            profile_store.set(profile_id, RequestProfile(
+                method=scope["method"], path=scope["path"], status=response["status"],
+                elapsed_ms=elapsed_ms, stats=output.getvalue(),
+            ))
+
+    @staticmethod
+    async def _is_admin(connection: HTTPConnection) -> bool:
+        token = connection.cookies.get("access_token")
+        if not token:
+            return False
+        async with async_session() as db:
+            return await token_is_admin(token, db)
+
+    @staticmethod
+    def _with_header(send: Send, profile_id: str, response: dict) -> Send:
+        async def send_with_header(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+        return send_with_header
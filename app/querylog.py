@@ -0,0 +1,119 @@
+import logging
+import random
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import SLOW_QUERY_MS, SQL_LOG_SAMPLE_RATE
+
+
+logger = logging.getLogger("app.sql")
+MAX_STATEMENT_LENGTH = 2000
+
+
+@dataclass
+class SQLStats:
+    """
+    Счётчики SQL-запросов одного HTTP-запроса.
+    Attributes:
+        scope (dict): ASGI scope запроса, из которого берётся шаблон маршрута
+        queries (int): Количество выполненных выражений
+        time_ms (float): Суммарное время выполнения в миллисекундах
+        rows (int): Количество возвращённых или изменённых строк
+    """
+    scope: dict = field(repr=False)
+    queries: int = 0
+    time_ms: float = 0.0
+    rows: int = 0
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        return route.path if route is not None else self.scope.get("path", "")
+
+
+current_sql_stats: ContextVar[SQLStats | None] = ContextVar("current_sql_stats", default=None)
+
+
+def parameter_shape(parameters) -> object:
+    """
+    Описывает параметры выражения без значений: имена и типы.
+    Значения в лог не попадают - в них могут быть персональные данные.
+    Args:
+        parameters: Параметры DBAPI (dict, tuple/list или список наборов для executemany)
+    Returns:
+        object: Структура с именами типов
+    """
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return [len(parameters), parameter_shape(parameters[0])]
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_timer(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - context._query_started) * 1000
+    rows = max(cursor.rowcount, 0)
+    stats = current_sql_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.time_ms += elapsed_ms
+        stats.rows += rows
+
+    slow = elapsed_ms >= SLOW_QUERY_MS
+    if slow or (SQL_LOG_SAMPLE_RATE and random.random() < SQL_LOG_SAMPLE_RATE):
+        logger.log(
+            logging.WARNING if slow else logging.INFO,
+            "%s %.1f ms route=%s rows=%d params=%s\n%s",
+            "slow query" if slow else "sampled query",
+            elapsed_ms,
+            stats.route if stats is not None else "-",
+            rows,
+            parameter_shape(parameters),
+            statement[:MAX_STATEMENT_LENGTH],
+        )
+
+
+class QueryAccountingMiddleware:
+    """
+    Считает SQL-запросы каждого HTTP-запроса и отдаёт итоги в заголовке Server-Timing:
+    db - время в базе с числом запросов и строк, app - время до начала ответа.
+    Запросы потокового тела ответа в заголовок не попадают - он уже отправлен.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = SQLStats(scope=scope)
+        token = current_sql_stats.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                timing = (f'db;dur={stats.time_ms:.1f};desc="{stats.queries} queries, {stats.rows} rows", '
+                          f"app;dur={elapsed_ms:.1f}")
+                message["headers"] = [*message.get("headers", []), (b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_sql_stats.reset(token)
@@ -1,19 +1,98 @@
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from fastapi.responses import HTMLResponse
-from datetime import date
+from datetime import date, datetime, time, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, literal, union_all
 
 from app.models import Task, Meeting
-from app.database import get_async_db
-from app.config import templates
+from app.database import get_async_db, get_async_read_db
+from app.config import templates, DISPLAY_TZ
+from app.auth import get_current_user, Principal
+from app.page_cache import cached_page
+from app.calendar_feed import get_feed, feed_token, check_feed_token
+from app.versions import feed_versions, make_etag, is_not_modified, validator_headers
 
 
 router = APIRouter(prefix="/calendar", tags=["calendar"])
 
+EVENT_KINDS = {"task": "Задача", "meeting": "Встреча"}
+MAX_RANGE_DAYS = 366
 
-@router.get("/day/{day}", response_class=HTMLResponse)
-async def day_view(request: Request, day: date, db: AsyncSession = Depends(get_async_db)):
+
+def local_bounds(start: date, end: date) -> tuple[datetime, datetime]:
+    """
+    Переводит полуинтервал дат [start, end) в границы timestamptz
+    по полуночи в часовом поясе отображения.
+    Args:
+        start (date): Первый день диапазона
+        end (date): День, следующий за последним днём диапазона
+    Returns:
+        tuple[datetime, datetime]: Начало и конец диапазона с учётом часового пояса
+    """
+    return (
+        DISPLAY_TZ.localize(datetime.combine(start, time.min)),
+        DISPLAY_TZ.localize(datetime.combine(end, time.min)),
+    )
+
+
+async def fetch_events(db: AsyncSession, start: date, end: date) -> dict[date, list]:
+    """
+    Загружает задачи (по дедлайну) и встречи за полуинтервал дат [start, end)
+    одним запросом UNION ALL по диапазонам индексированных колонок.
+    Args:
+        db (AsyncSession): Асинхронная сессия базы данных
+        start (date): Первый день диапазона
+        end (date): День, следующий за последним днём диапазона
+    Returns:
+        dict[date, list]: События, сгруппированные по дням в часовом поясе отображения
+    """
+    start_at, end_at = local_bounds(start, end)
+
+    tasks = (
+        select(literal("task").label("kind"), Task.id, Task.title, Task.deadline.label("at"))
+        .where(Task.deadline >= start_at, Task.deadline < end_at)
+    )
+    meetings = (
+        select(literal("meeting").label("kind"), Meeting.id, Meeting.title, Meeting.scheduled_at.label("at"))
+        .where(Meeting.scheduled_at >= start_at, Meeting.scheduled_at < end_at)
+    )
+    events = union_all(tasks, meetings).subquery()
+    result = await db.execute(select(events).order_by(events.c.at, events.c.kind, events.c.id))
+
+    days: dict[date, list] = {}
+    for row in result:
+        days.setdefault(row.at.astimezone(DISPLAY_TZ).date(), []).append((EVENT_KINDS[row.kind], row.title))
+    return days
+
+
+async def render_range(request: Request, db: AsyncSession, start: date, end: date):
+    """
+    Рендерит страницу календаря за полуинтервал дат [start, end).
+    Args:
+        request (Request): Текущий HTTP-запрос
+        db (AsyncSession): Асинхронная сессия базы данных
+        start (date): Первый день диапазона
+        end (date): День, следующий за последним днём диапазона
+    Returns:
+        HTMLResponse: Страница с событиями периода по дням
+    """
+    days = await fetch_events(db, start, end)
+    return templates.TemplateResponse(
+        request,
+        "calendar/range.html",
+        {
+            "request": request,
+            "start": start,
+            "end": end - timedelta(days=1),
+            "dates": [start + timedelta(days=i) for i in range((end - start).days)],
+            "days": days,
+        }
+    )
+
+
+@router.get("/day/{day}", response_class=HTMLResponse,
+            dependencies=[cached_page("tasks", "meetings", per_user=False)])
+async def day_view(request: Request, day: date, db: AsyncSession = Depends(get_async_read_db)):
     """
     Отображает календарь задач и встреч за конкретный день.
     Args:
@@ -23,13 +102,8 @@ async def day_view(request: Request, day: date, db: AsyncSession = Depends(get_a
     Returns:
         HTMLResponse: Страница с задачами и встречами за выбранный день
     """
-    result_tasks = await db.execute(select(Task).where(func.date(Task.deadline) == day))
-    tasks = result_tasks.scalars().all()
-
-    result_meetings = await db.execute(select(Meeting).where(func.date(Meeting.scheduled_at) == day))
-    meetings = result_meetings.scalars().all()
-
-    items = [("Задача", t.title) for t in tasks] + [("Встреча", m.title) for m in meetings]
+    days = await fetch_events(db, day, day + timedelta(days=1))
+    items = days.get(day, [])
 
     return templates.TemplateResponse(
         request,
@@ -38,8 +112,42 @@ async def day_view(request: Request, day: date, db: AsyncSession = Depends(get_a
     )
 
 
-@router.get("/month/{year}/{month}")
-async def month_view(request: Request, year: int, month: int, db: AsyncSession = Depends(get_async_db)):
+@router.get("/week/{day}", response_class=HTMLResponse,
+            dependencies=[cached_page("tasks", "meetings", per_user=False)])
+async def week_view(request: Request, day: date, db: AsyncSession = Depends(get_async_read_db)):
+    """
+    Отображает календарь задач и встреч за неделю (с понедельника), содержащую указанный день.
+    Args:
+        request (Request): Текущий HTTP-запрос
+        day (date): Любой день недели
+        db (AsyncSession): Асинхронная сессия базы данных
+    Returns:
+        HTMLResponse: Страница с событиями недели по дням
+    """
+    start = day - timedelta(days=day.weekday())
+    return await render_range(request, db, start, start + timedelta(days=7))
+
+
+@router.get("/range", response_class=HTMLResponse,
+            dependencies=[cached_page("tasks", "meetings", per_user=False)])
+async def range_view(request: Request, start: date, end: date, db: AsyncSession = Depends(get_async_read_db)):
+    """
+    Отображает календарь задач и встреч за произвольный период.
+    Args:
+        request (Request): Текущий HTTP-запрос
+        start (date): Первый день периода
+        end (date): Последний день периода (включительно)
+        db (AsyncSession): Асинхронная сессия базы данных
+    Returns:
+        HTMLResponse: Страница с событиями периода по дням
+    """
+    if end < start or (end - start).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail="Некорректный период")
+    return await render_range(request, db, start, end + timedelta(days=1))
+
+
+@router.get("/month/{year}/{month}", dependencies=[cached_page("tasks", "meetings", per_user=False)])
+async def month_view(request: Request, year: int, month: int, db: AsyncSession = Depends(get_async_read_db)):
     """
     Отображает календарь задач и встреч за указанный месяц.
     Args:
@@ -58,24 +166,54 @@ async def month_view(request: Request, year: int, month: int, db: AsyncSession =
 
     days_in_month = (end_date - date(year, month, 1)).days
 
-    result_tasks = await db.execute(
-        select(Task).where(Task.deadline >= start_date, Task.deadline < end_date)
-    )
-    tasks = result_tasks.scalars().all()
-
-    result_meetings = await db.execute(
-        select(Meeting).where(Meeting.scheduled_at >= start_date, Meeting.scheduled_at < end_date)
-    )
-    meetings = result_meetings.scalars().all()
-
-    days: dict[date, list] = {}
-    for t in tasks:
-        days.setdefault(t.deadline.date(), []).append(("Задача", t.title))
-    for m in meetings:
-        days.setdefault(m.scheduled_at.date(), []).append(("Встреча", m.title))
+    days = await fetch_events(db, start_date, end_date)
 
     return templates.TemplateResponse(
         request,
         "calendar/months.html",
         {"request": request, "year": year, "month": month, "days": days, "days_in_month": days_in_month, "date": date}
-    )
\ No newline at end of file
+    )
+
+
+@router.get("/feed")
+async def feed_url(request: Request, current_user: Principal = Depends(get_current_user)):
+    """
+    Возвращает ссылку на календарную ленту текущего пользователя для подписки
+    в календарном клиенте.
+    Args:
+        request (Request): Текущий HTTP-запрос
+        current_user (Principal): Текущий пользователь
+    Returns:
+        dict: Ссылка на ленту .ics
+    """
+    url = request.url_for("user_feed", user_id=current_user.id).include_query_params(
+        token=feed_token(current_user.id)
+    )
+    return {"url": str(url)}
+
+
+@router.get("/feed/{user_id}.ics")
+async def user_feed(request: Request, user_id: int, token: str, db: AsyncSession = Depends(get_async_db)):
+    """
+    Отдаёт календарную ленту пользователя в формате iCalendar.
+    Повторный запрос с If-None-Match/If-Modified-Since получает 304 без сборки ленты,
+    пока задачи и встречи пользователя не менялись.
+    Args:
+        request (Request): Текущий HTTP-запрос
+        user_id (int): ID пользователя
+        token (str): Подпись ссылки из /calendar/feed
+        db (AsyncSession): Асинхронная сессия базы данных
+    Returns:
+        Response: Лента .ics или 304 Not Modified
+    """
+    if not check_feed_token(user_id, token):
+        raise HTTPException(status_code=404, detail="Лента не найдена")
+
+    version, modified_at = await feed_versions.get(db, user_id)
+    etag = make_etag("feed", user_id, version)
+    headers = {**validator_headers(etag, modified_at), "Cache-Control": "private, no-cache"}
+    if is_not_modified(request, etag, modified_at):
+        return Response(status_code=304, headers=headers)
+
+    feed = await get_feed(db, user_id, version, modified_at)
+    return Response(content=feed.body, media_type="text/calendar; charset=utf-8", headers=headers)
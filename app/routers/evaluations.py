@@ -1,110 +1,139 @@
-from fastapi import APIRouter, Depends, status, Request, Form
+from fastapi import APIRouter, Depends, status, Request, Form, Query
 from fastapi.responses import HTMLResponse, RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 from sqlalchemy import select
 
 from app.models import Evaluation, User, Task, Team
-from app.database import get_async_db
-from app.config import templates
-from app.auth import get_current_user
+from app.database import get_async_db, get_async_read_db
+from app.versions import table_versions, conditional_get
+from app.page_cache import cached_page
+from app.config import templates, PAGE_SIZE, MAX_PAGE_SIZE
+from app.auth import get_current_user, Principal
+from app.loaders import load_options
+from app.scope import resolve_scope
+from app.streaming import stream_template, stream_export, ExportFormat
+from app.pagination import paginate, keyset_order, OptionalInt, OptionalStr, OptionalDatetime
 
 
 router = APIRouter(prefix="/evaluations", tags=["evaluations"])
 
 
-@router.get("/")
-async def evaluations_list(request: Request, db: AsyncSession = Depends(get_async_db),
-                           current_user: User = Depends(get_current_user)):
+@router.get("/", dependencies=[cached_page("evaluations", "tasks", "users", "teams", "users_teams")])
+async def evaluations_list(request: Request,
+                           cursor: str | None = None,
+                           limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                           stream: bool = False,
+                           task_status: OptionalStr = None,
+                           user_id: OptionalInt = None,
+                           team_id: OptionalInt = None,
+                           db: AsyncSession = Depends(get_async_read_db),
+                           current_user: Principal = Depends(get_current_user)):
     """
-    Отображает список всех оценок, доступных текущему пользователю.
+    Отображает страницу списка оценок, доступных текущему пользователю.
     Для:
     - администратора: все оценки;
     - менеджера: оценки пользователей из его команд;
     - пользователя: только собственные оценки.
+    Постраничная навигация выполняется по курсору.
     Args:
         request (Request): Текущий HTTP-запрос
+        cursor (str | None): Курсор следующей страницы
+        limit (int): Размер страницы
+        stream (bool): Отдать весь отфильтрованный список потоком, без постраничной навигации
+        task_status (str | None): Фильтр по статусу оценённой задачи
+        user_id (int | None): Фильтр по оцениваемому пользователю
+        team_id (int | None): Фильтр по команде оцениваемого пользователя
         db (AsyncSession): Асинхронная сессия базы данных
-        current_user (User): Текущий авторизованный пользователь
+        current_user (Principal): Текущий авторизованный пользователь
     Returns:
         HTMLResponse: Страница со списком оценок
     """
-    if current_user.role == "admin":
-        result = await db.execute(
-            select(Evaluation).options(
-                selectinload(Evaluation.task),
-                selectinload(Evaluation.user),
-                selectinload(Evaluation.evaluator)
-            )
+    stmt = select(Evaluation).options(*load_options("evaluation_row"))
+
+    scope = await resolve_scope(db, current_user)
+    stmt = stmt.where(scope.user_clause(Evaluation.user_id))
+
+    if task_status:
+        stmt = stmt.where(Evaluation.task.has(Task.status == task_status))
+    if user_id:
+        stmt = stmt.where(Evaluation.user_id == user_id)
+    if team_id:
+        stmt = stmt.where(Evaluation.user.has(User.teams.any(Team.id == team_id)))
+
+    if stream:
+        return stream_template(
+            request,
+            "evaluations/evaluations_list.html",
+            {"page": None, "current_user": current_user},
+            db,
+            evaluations=keyset_order(stmt, Evaluation.id),
         )
-        evaluations = result.scalars().all()
 
-    elif current_user.role == "manager":
-        result_teams = await db.execute(
-            select(Team.id).where(Team.manager_id == current_user.id)
-        )
-        team_ids = result_teams.scalars().all()
-
-        if team_ids:
-            result = await db.execute(
-                select(Evaluation)
-                .options(
-                    selectinload(Evaluation.task),
-                    selectinload(Evaluation.user),
-                    selectinload(Evaluation.evaluator),
-                )
-                .where(Evaluation.user.has(User.teams.any(Team.id.in_(team_ids))))
-            )
-            evaluations = result.scalars().all()
-        else:
-            evaluations = []
-
-    else:
-        result = await db.execute(
-            select(Evaluation)
-            .options(
-                selectinload(Evaluation.task),
-                selectinload(Evaluation.user),
-                selectinload(Evaluation.evaluator)
-            )
-            .where(Evaluation.user_id == current_user.id)
-        )
-        evaluations = result.scalars().all()
+    page = await paginate(db, stmt, Evaluation.id, cursor=cursor, limit=limit)
 
     return templates.TemplateResponse(
         request,
         "evaluations/evaluations_list.html",
-        {"request": request, "evaluations": evaluations, "current_user": current_user}
+        {"request": request, "evaluations": page.items, "page": page, "current_user": current_user}
+    )
+
+
+@router.get("/export")
+async def evaluations_export(fmt: ExportFormat = "csv",
+                             created_from: OptionalDatetime = None,
+                             created_to: OptionalDatetime = None,
+                             db: AsyncSession = Depends(get_async_read_db),
+                             current_user: Principal = Depends(get_current_user)):
+    """
+    Выгружает оценки в CSV или NDJSON с теми же ограничениями по ролям, что и список оценок.
+    Args:
+        fmt (str): csv или ndjson
+        created_from (datetime | None): Оценки, поставленные не раньше
+        created_to (datetime | None): Оценки, поставленные раньше
+        db (AsyncSession): Асинхронная сессия базы данных
+        current_user (Principal): Текущий авторизованный пользователь
+    Returns:
+        StreamingResponse: Потоковая выгрузка оценок
+    """
+    stmt = (
+        select(Evaluation.id, Evaluation.score, Evaluation.created_at, Evaluation.task_id,
+               Task.title.label("task_title"), Evaluation.user_id, Evaluation.evaluator_id)
+        .join(Task, Task.id == Evaluation.task_id)
     )
 
+    scope = await resolve_scope(db, current_user)
+    stmt = stmt.where(scope.user_clause(Evaluation.user_id))
+    if created_from:
+        stmt = stmt.where(Evaluation.created_at >= created_from)
+    if created_to:
+        stmt = stmt.where(Evaluation.created_at < created_to)
+
+    return stream_export(db, stmt.order_by(Evaluation.id), fmt, "evaluations")
+
 
-@router.get("/create")
+@router.get("/create", dependencies=[conditional_get("tasks", "users_tasks", "users", "teams", "users_teams")])
 async def evaluation_create_form(request: Request, db: AsyncSession = Depends(get_async_db),
-                                 current_user: User = Depends(get_current_user)):
+                                 current_user: Principal = Depends(get_current_user)):
     """
     Отображает форму для создания новой оценки.
     Доступно только администраторам и менеджерам.
     Args:
         request (Request): Текущий HTTP-запрос
         db (AsyncSession): Асинхронная сессия базы данных
-        current_user (User): Текущий пользователь
+        current_user (Principal): Текущий пользователь
     Returns:
         HTMLResponse: Страница с формой создания оценки
     """
-    result_tasks = await db.execute(select(Task))
+    result_tasks = await db.execute(select(Task).options(*load_options("task_option")))
     tasks = result_tasks.scalars().all()
 
-    if current_user.role == "admin":
-        result_users = await db.execute(select(User))
-    elif current_user.role == "manager":
-        result_teams = await db.execute(select(Team.id).where(Team.manager_id == current_user.id))
-        team_ids = result_teams.scalars().all()
-        result_users = await db.execute(
-            select(User).where(User.teams.any(Team.id.in_(team_ids)))
-        )
-    else:
+    if current_user.role not in ("admin", "manager"):
         return HTMLResponse("User не может ставить оценки", status_code=403)
 
+    scope = await resolve_scope(db, current_user)
+    result_users = await db.execute(
+        select(User).options(*load_options("user_option")).where(scope.user_clause(User.id))
+    )
     users = result_users.scalars().all()
 
     return templates.TemplateResponse(
@@ -121,7 +150,7 @@ async def evaluation_created(
         task_title: str = Form(...),
         user_name: str = Form(...),
         db: AsyncSession = Depends(get_async_db),
-        current_user: User = Depends(get_current_user)
+        current_user: Principal = Depends(get_current_user)
 ):
     """
     Обрабатывает отправку формы создания оценки.
@@ -133,12 +162,14 @@ async def evaluation_created(
         task_title (str): Название оцениваемой задачи
         user_name (str): Имя оцениваемого пользователя
         db (AsyncSession): Асинхронная сессия базы данных
-        current_user (User): Текущий пользователь
+        current_user (Principal): Текущий пользователь
     Returns:
         HTMLResponse | TemplateResponse: Страница с подтверждением
         или сообщение об ошибке
     """
-    result_task = await db.execute(select(Task).where(Task.title == task_title))
+    result_task = await db.execute(
+        select(Task).options(*load_options("task_detail")).where(Task.title == task_title)
+    )
     task = result_task.scalars().first()
 
     if task.status != "done":
@@ -153,11 +184,9 @@ async def evaluation_created(
     if current_user.role == "user":
         return HTMLResponse("User не может ставить оценки", status_code=403)
 
-    if current_user.role == "manager":
-        result_teams = await db.execute(select(Team.id).where(Team.manager_id == current_user.id))
-        team_ids = result_teams.scalars().all()
-        if not any(team.id in team_ids for team in user.teams):
-            return HTMLResponse("Этого пользователя нет ни в одной из ваших команд", status_code=403)
+    scope = await resolve_scope(db, current_user)
+    if not scope.can_see_user(user.id):
+        return HTMLResponse("Этого пользователя нет ни в одной из ваших команд", status_code=403)
 
     if user not in task.users:
         return HTMLResponse(
@@ -165,13 +194,15 @@ async def evaluation_created(
             status_code=400
         )
 
+    evaluator = await db.get(User, current_user.id)
     evaluation = Evaluation(
         score=score,
-        task_id=task.id,
-        user_id=user.id,
-        evaluator_id=current_user.id
+        task=task,
+        user=user,
+        evaluator=evaluator
     )
     db.add(evaluation)
+    await table_versions.bump(db, "evaluations")
     await db.commit()
 
     return templates.TemplateResponse(
@@ -181,7 +212,7 @@ async def evaluation_created(
     )
 
 
-@router.get("/edit/{evaluation_id}")
+@router.get("/edit/{evaluation_id}", dependencies=[conditional_get("evaluations", "tasks", "users", per_user=False)])
 async def evaluation_edit_form(request: Request, evaluation_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Отображает форму редактирования оценки.
@@ -192,9 +223,9 @@ async def evaluation_edit_form(request: Request, evaluation_id: int, db: AsyncSe
     Returns:
         HTMLResponse: Страница с формой редактирования оценки
     """
-    evaluation = await db.get(Evaluation, evaluation_id)
+    evaluation = await db.get(Evaluation, evaluation_id, options=load_options("evaluation_row"))
 
-    result_users = await db.execute(select(User))
+    result_users = await db.execute(select(User).options(*load_options("user_option")))
     users = result_users.scalars().all()
 
     return templates.TemplateResponse(
@@ -225,6 +256,7 @@ async def evaluation_edit(
 
     evaluation.score = score
 
+    await table_versions.bump(db, "evaluations")
     await db.commit()
     return RedirectResponse(url="/evaluations", status_code=status.HTTP_303_SEE_OTHER)
 
@@ -241,5 +273,6 @@ async def evaluation_delete(evaluation_id: int, db: AsyncSession = Depends(get_a
     """
     evaluation = await db.get(Evaluation, evaluation_id)
     await db.delete(evaluation)
+    await table_versions.bump(db, "evaluations")
     await db.commit()
     return HTMLResponse(f"Оценка удалена")
\ No newline at end of file
@@ -4,7 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import templates
 from app.database import get_async_db
-from app.auth import authenticate_user, create_access_token
+from app.auth import authenticate_user, create_access_token, token_claims
 
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -46,7 +46,7 @@ async def login(
     if not user:
         return HTMLResponse("Неверные данные")
 
-    access_token = create_access_token(data={"sub": user.email})
+    access_token = create_access_token(data=token_claims(user))
 
     response = RedirectResponse(url="/", status_code=303)
     response.set_cookie(
@@ -1,40 +1,158 @@
-from fastapi import APIRouter, Depends, status, Request, Form
+from fastapi import APIRouter, Depends, status, HTTPException, Request, Form, Query
 from fastapi.responses import HTMLResponse, RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
-from sqlalchemy import select
-from datetime import datetime
+from sqlalchemy import select, func, cast, String
+from sqlalchemy.exc import IntegrityError
+from datetime import date, datetime, timedelta
 
-from app.models import Meeting, User
-from app.database import get_async_db
-from app.config import templates
+from app.models import Meeting, User, Team, users_meetings
+from app.database import get_async_db, get_async_read_db
+from app.config import templates, PAGE_SIZE, MAX_PAGE_SIZE, DISPLAY_TZ
+from app.loaders import load_options
+from app.streaming import stream_template, stream_export, ExportFormat
+from app.pagination import paginate, keyset_order, OptionalInt, OptionalDatetime
+from app.scheduling import fetch_busy, free_slots, working_windows
+from app.versions import feed_versions, table_versions, conditional_get
+from app.page_cache import cached_page
 
 
 router = APIRouter(prefix="/meetings", tags=["meetings"])
 
+MIN_DURATION_MINUTES = 5
+MAX_DURATION_MINUTES = 24 * 60
+MAX_SLOT_RANGE_DAYS = 62
 
-@router.get("/")
-async def meetings_list(request: Request, db: AsyncSession = Depends(get_async_db)):
+
+@router.get("/", dependencies=[cached_page("meetings", "users_meetings", "users", "users_teams", per_user=False)])
+async def meetings_list(request: Request,
+                        cursor: str | None = None,
+                        limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                        stream: bool = False,
+                        scheduled_from: OptionalDatetime = None,
+                        scheduled_to: OptionalDatetime = None,
+                        user_id: OptionalInt = None,
+                        team_id: OptionalInt = None,
+                        db: AsyncSession = Depends(get_async_read_db)):
     """
-    Отображает список всех встреч.
+    Отображает страницу списка встреч, упорядоченных по времени.
+    Постраничная навигация выполняется по курсору.
     Args:
         request (Request): Текущий HTTP-запрос
+        cursor (str | None): Курсор следующей страницы
+        limit (int): Размер страницы
+        stream (bool): Отдать весь отфильтрованный список потоком, без постраничной навигации
+        scheduled_from (datetime | None): Встречи не раньше
+        scheduled_to (datetime | None): Встречи раньше
+        user_id (int | None): Фильтр по участнику
+        team_id (int | None): Фильтр по команде участников
         db (AsyncSession): Асинхронная сессия базы данных
     Returns:
         HTMLResponse: Страница со списком встреч
     """
-    result = await db.execute(
-        select(Meeting).options(selectinload(Meeting.users))
-    )
-    meetings = result.scalars().all()
+    stmt = select(Meeting).options(*load_options("meeting_row"))
+
+    if scheduled_from:
+        stmt = stmt.where(Meeting.scheduled_at >= scheduled_from)
+    if scheduled_to:
+        stmt = stmt.where(Meeting.scheduled_at < scheduled_to)
+    if user_id:
+        stmt = stmt.where(Meeting.users.any(User.id == user_id))
+    if team_id:
+        stmt = stmt.where(Meeting.users.any(User.teams.any(Team.id == team_id)))
+
+    if stream:
+        return stream_template(
+            request,
+            "meetings/meetings_list.html",
+            {"page": None},
+            db,
+            meetings=keyset_order(stmt, Meeting.id, Meeting.scheduled_at),
+        )
+
+    page = await paginate(db, stmt, Meeting.id, Meeting.scheduled_at, cursor, limit)
     return templates.TemplateResponse(
         request,
         "meetings/meetings_list.html",
-        {"request": request, "meetings": meetings}
+        {"request": request, "meetings": page.items, "page": page}
+    )
+
+
+@router.get("/export")
+async def meetings_export(fmt: ExportFormat = "csv",
+                          scheduled_from: OptionalDatetime = None,
+                          scheduled_to: OptionalDatetime = None,
+                          db: AsyncSession = Depends(get_async_read_db)):
+    """
+    Выгружает встречи с ID участников в CSV или NDJSON.
+    Args:
+        fmt (str): csv или ndjson
+        scheduled_from (datetime | None): Встречи не раньше
+        scheduled_to (datetime | None): Встречи раньше
+        db (AsyncSession): Асинхронная сессия базы данных
+    Returns:
+        StreamingResponse: Потоковая выгрузка встреч
+    """
+    participant_ids = (
+        select(func.aggregate_strings(cast(users_meetings.c.user_id, String), ";"))
+        .where(users_meetings.c.meeting_id == Meeting.id)
+        .scalar_subquery()
+        .label("participant_ids")
     )
+    stmt = select(Meeting.id, Meeting.title, Meeting.scheduled_at, Meeting.ends_at, participant_ids)
 
+    if scheduled_from:
+        stmt = stmt.where(Meeting.scheduled_at >= scheduled_from)
+    if scheduled_to:
+        stmt = stmt.where(Meeting.scheduled_at < scheduled_to)
 
-@router.get("/create")
+    return stream_export(db, stmt.order_by(Meeting.id), fmt, "meetings")
+
+
+@router.get("/free-slots")
+async def meeting_free_slots(start: date,
+                             end: date,
+                             user_ids: list[int] = Query([]),
+                             team_id: OptionalInt = None,
+                             duration: int = Query(60, ge=MIN_DURATION_MINUTES, le=MAX_DURATION_MINUTES),
+                             work_start: int = Query(9, ge=0, le=23),
+                             work_end: int = Query(18, ge=1, le=24),
+                             deadline_block: int | None = Query(None, ge=1, le=MAX_DURATION_MINUTES),
+                             db: AsyncSession = Depends(get_async_read_db)):
+    """
+    Подбирает общие свободные слоты для пользователей и/или команды.
+    Занятость учитывает встречи и, если задан deadline_block, время перед дедлайнами задач.
+    Args:
+        start (date): Первый день периода
+        end (date): Последний день периода (включительно)
+        user_ids (list[int]): ID участников
+        team_id (int | None): Команда, все участники которой учитываются
+        duration (int): Длительность встречи в минутах
+        work_start (int): Час начала рабочего дня
+        work_end (int): Час окончания рабочего дня
+        deadline_block (int | None): Сколько минут до дедлайна задачи считать занятыми
+        db (AsyncSession): Асинхронная сессия базы данных
+    Returns:
+        dict: Свободные слоты в часовом поясе отображения
+    """
+    if end < start or (end - start).days >= MAX_SLOT_RANGE_DAYS or work_end <= work_start:
+        raise HTTPException(status_code=400, detail="Некорректный период")
+    if not user_ids and team_id is None:
+        raise HTTPException(status_code=400, detail="Укажите участников или команду")
+
+    windows = working_windows(start, end, work_start, work_end)
+    block = timedelta(minutes=deadline_block) if deadline_block else None
+    busy = await fetch_busy(db, user_ids, team_id, windows[0][0], windows[-1][1], block)
+    slots = free_slots(busy, windows, timedelta(minutes=duration))
+
+    return {
+        "slots": [
+            {"start": opens.astimezone(DISPLAY_TZ).isoformat(), "end": closes.astimezone(DISPLAY_TZ).isoformat()}
+            for opens, closes in slots
+        ]
+    }
+
+
+@router.get("/create", dependencies=[conditional_get("users", per_user=False)])
 async def meeting_create_form(request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Отображает форму для создания новой встречи.
@@ -44,7 +162,7 @@ async def meeting_create_form(request: Request, db: AsyncSession = Depends(get_a
     Returns:
         HTMLResponse: Страница с формой создания встречи
     """
-    result = await db.execute(select(User))
+    result = await db.execute(select(User).options(*load_options("user_option")))
     users = result.scalars().all()
     return templates.TemplateResponse(
         request,
@@ -53,22 +171,73 @@ async def meeting_create_form(request: Request, db: AsyncSession = Depends(get_a
     )
 
 
+def conflict_response(title: str | None = None) -> HTMLResponse:
+    """
+    Формирует ответ о конфликте расписания.
+    Args:
+        title (str | None): Название пересекающейся встречи, если известно
+    Returns:
+        HTMLResponse: Сообщение об ошибке со статусом 400
+    """
+    where = f"на встрече '{title}' " if title else ""
+    return HTMLResponse(
+        content=f"<h3 style='color:red;'>Ошибка:</h3>"
+                f"<p>Один из пользователей уже занят {where}в это время</p>",
+        status_code=400
+    )
+
+
+def is_overlap_violation(exc: IntegrityError) -> bool:
+    return "ex_users_meetings_no_overlap" in str(exc.orig)
+
+
+async def find_conflict(db: AsyncSession, starts_at: datetime, ends_at: datetime, user_ids: list[int],
+                        exclude_meeting_id: int | None = None) -> Meeting | None:
+    """
+    Ищет встречу, пересекающуюся по времени с [starts_at, ends_at) у кого-либо из участников.
+    Проверка нужна для понятного сообщения об ошибке; от гонок при одновременном
+    бронировании защищает exclusion-ограничение ex_users_meetings_no_overlap.
+    Args:
+        db (AsyncSession): Асинхронная сессия базы данных
+        starts_at (datetime): Начало встречи
+        ends_at (datetime): Окончание встречи
+        user_ids (list[int]): ID участников
+        exclude_meeting_id (int | None): ID редактируемой встречи
+    Returns:
+        Meeting | None: Первая пересекающаяся встреча
+    """
+    stmt = (
+        select(Meeting)
+        .join(users_meetings, users_meetings.c.meeting_id == Meeting.id)
+        .where(users_meetings.c.user_id.in_(user_ids),
+               Meeting.scheduled_at < ends_at,
+               Meeting.ends_at > starts_at)
+        .limit(1)
+    )
+    if exclude_meeting_id is not None:
+        stmt = stmt.where(Meeting.id != exclude_meeting_id)
+    result = await db.execute(stmt)
+    return result.scalars().first()
+
+
 @router.post("/create")
 async def meeting_create(
         request: Request,
         title: str = Form(...),
         scheduled_at: str = Form(...),
+        duration: int = Form(60, ge=MIN_DURATION_MINUTES, le=MAX_DURATION_MINUTES),
         user_ids: list[int] = Form([]),
         db: AsyncSession = Depends(get_async_db)
 ):
     """
     Обрабатывает создание новой встречи.
-    Проверяет, чтобы выбранные пользователи не имели конфликтующих встреч
-    в то же время, затем сохраняет новую встречу в базу данных.
+    Проверяет, чтобы у выбранных пользователей не было встреч,
+    пересекающихся по времени, затем сохраняет новую встречу в базу данных.
     Args:
         request (Request): Текущий HTTP-запрос
         title (str): Название встречи
         scheduled_at (str): Дата и время встречи в ISO-формате
+        duration (int): Длительность встречи в минутах
         user_ids (list[int]): Список ID пользователей, участвующих во встрече
         db (AsyncSession): Асинхронная сессия базы данных
     Returns:
@@ -76,26 +245,26 @@ async def meeting_create(
         или сообщение об ошибке при конфликте расписания
     """
     scheduled_at_dt = datetime.fromisoformat(scheduled_at)
+    ends_at_dt = scheduled_at_dt + timedelta(minutes=duration)
 
-    conflict = await db.execute(
-        select(Meeting)
-        .join(Meeting.users)
-        .where(Meeting.scheduled_at == scheduled_at_dt, User.id.in_(user_ids))
-    )
-    conflict_meeting = conflict.scalars().first()
+    conflict_meeting = await find_conflict(db, scheduled_at_dt, ends_at_dt, user_ids)
     if conflict_meeting:
-        return HTMLResponse(
-            content=f"<h3 style='color:red;'>Ошибка:</h3>"
-                    f"<p>Один из пользователей уже занят на встрече '{conflict_meeting.title}' в это время</p>",
-            status_code=400
-        )
+        return conflict_response(conflict_meeting.title)
 
     result = await db.execute(select(User).where(User.id.in_(user_ids)))
     users = result.scalars().all()
 
-    meeting = Meeting(title=title, scheduled_at=scheduled_at_dt, users=users)
+    meeting = Meeting(title=title, scheduled_at=scheduled_at_dt, ends_at=ends_at_dt, users=users)
     db.add(meeting)
-    await db.commit()
+    try:
+        await table_versions.bump(db, "meetings", "users_meetings")
+        await feed_versions.bump(db, *(user.id for user in users))
+        await db.commit()
+    except IntegrityError as exc:
+        if not is_overlap_violation(exc):
+            raise
+        await db.rollback()
+        return conflict_response()
     return templates.TemplateResponse(
         request,
         "meetings/meeting_created.html",
@@ -103,7 +272,7 @@ async def meeting_create(
     )
 
 
-@router.get("/edit/{meeting_id}")
+@router.get("/edit/{meeting_id}", dependencies=[conditional_get("meetings", "users_meetings", "users", per_user=False)])
 async def meeting_edit_form(request: Request, meeting_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Отображает форму редактирования встречи.
@@ -114,9 +283,9 @@ async def meeting_edit_form(request: Request, meeting_id: int, db: AsyncSession
     Returns:
         HTMLResponse: Страница с формой редактирования встречи
     """
-    meeting = await db.get(Meeting, meeting_id)
+    meeting = await db.get(Meeting, meeting_id, options=load_options("meeting_row"))
 
-    result = await db.execute(select(User))
+    result = await db.execute(select(User).options(*load_options("user_option")))
     users = result.scalars().all()
 
     return templates.TemplateResponse(
@@ -132,18 +301,20 @@ async def meeting_edit(
         meeting_id: int,
         title: str = Form(...),
         scheduled_at: str = Form(...),
+        duration: int = Form(60, ge=MIN_DURATION_MINUTES, le=MAX_DURATION_MINUTES),
         user_ids: list[int] = Form([]),
         db: AsyncSession = Depends(get_async_db)
 ):
     """
     Обновляет данные встречи по ID.
-    Проверяет конфликты по времени для участников и обновляет
-    название, время и список пользователей встречи.
+    Проверяет пересечения по времени для участников и обновляет
+    название, время, длительность и список пользователей встречи.
     Args:
         request (Request): Текущий HTTP-запрос
         meeting_id (int): ID редактируемой встречи
         title (str): Новое название встречи
         scheduled_at (str): Новое время встречи в ISO-формате
+        duration (int): Новая длительность встречи в минутах
         user_ids (list[int]): Обновлённый список участников
         db (AsyncSession): Асинхронная сессия базы данных
     Returns:
@@ -151,29 +322,35 @@ async def meeting_edit(
         или сообщение об ошибке при конфликте
     """
     scheduled_at_dt = datetime.fromisoformat(scheduled_at)
+    ends_at_dt = scheduled_at_dt + timedelta(minutes=duration)
 
-    conflict = await db.execute(
-        select(Meeting)
-        .join(Meeting.users)
-        .where(Meeting.scheduled_at == scheduled_at_dt, User.id.in_(user_ids))
-    )
-    conflict_meeting = conflict.scalars().first()
+    conflict_meeting = await find_conflict(db, scheduled_at_dt, ends_at_dt, user_ids, exclude_meeting_id=meeting_id)
     if conflict_meeting:
-        return HTMLResponse(
-            content=f"<h3 style='color:red;'>Ошибка:</h3>"
-                    f"<p>Один из пользователей уже занят на встрече '{conflict_meeting.title}' в это время</p>",
-            status_code=400
-        )
-
-    meeting = await db.get(Meeting, meeting_id)
-
-    meeting.title = title
-    meeting.scheduled_at = scheduled_at_dt
+        return conflict_response(conflict_meeting.title)
 
+    meeting = await db.get(Meeting, meeting_id, options=load_options("meeting_row"))
     result = await db.execute(select(User).where(User.id.in_(user_ids)))
-    meeting.users = result.scalars().all()
+    users = result.scalars().all()
 
-    await db.commit()
+    # Период участника берётся из времени встречи, поэтому порядок важен: исключённые участники
+    # удаляются до переноса встречи, а новые добавляются после, чтобы не проверять их по старому времени
+    previous_user_ids = [user.id for user in meeting.users]
+    try:
+        meeting.users = [user for user in meeting.users if user in users]
+        await db.flush()
+        meeting.title = title
+        meeting.scheduled_at = scheduled_at_dt
+        meeting.ends_at = ends_at_dt
+        await db.flush()
+        meeting.users = users
+        await table_versions.bump(db, "meetings", "users_meetings")
+        await feed_versions.bump(db, *previous_user_ids, *(user.id for user in users))
+        await db.commit()
+    except IntegrityError as exc:
+        if not is_overlap_violation(exc):
+            raise
+        await db.rollback()
+        return conflict_response()
     return RedirectResponse(url="/meetings", status_code=status.HTTP_303_SEE_OTHER)
 
 
@@ -187,7 +364,10 @@ async def meeting_delete(meeting_id: int, db: AsyncSession = Depends(get_async_d
     Returns:
         HTMLResponse: Сообщение об успешном удалении встречи
     """
-    meeting = await db.get(Meeting, meeting_id)
+    meeting = await db.get(Meeting, meeting_id, options=load_options("meeting_row"))
+    user_ids = [user.id for user in meeting.users]
     await db.delete(meeting)
+    await table_versions.bump(db, "meetings", "users_meetings")
+    await feed_versions.bump(db, *user_ids)
     await db.commit()
     return HTMLResponse(f"Встреча {meeting.title} удалена")
\ No newline at end of file
@@ -1,95 +1,149 @@
-from fastapi import APIRouter, Depends, status, HTTPException, Request, Form
+from fastapi import APIRouter, Depends, status, HTTPException, Request, Form, Query, UploadFile, File
 from fastapi.responses import HTMLResponse, RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
-from sqlalchemy import select
+from sqlalchemy import select, func, cast, String
 from datetime import datetime
-
-from app.models import Task, User, TaskComment, Team
-from app.database import get_async_db
-from app.auth import get_current_user
-from app.config import templates
+import io
+
+from app.models import Task, User, TaskComment, Team, users_tasks
+from app.database import get_async_db, get_async_read_db
+from app.auth import get_current_user, Principal
+from app.loaders import load_options
+from app.scope import resolve_scope
+from app.versions import feed_versions, table_versions, conditional_get
+from app.page_cache import cached_page
+from app.importer import import_tasks, detect_format, FORMATS, IMPORT_CHANGES
+from app.schemas import ImportReport
+from app.streaming import stream_template, stream_export, ExportFormat
+from app.pagination import paginate, keyset_order, OptionalInt, OptionalStr, OptionalDatetime
+from app.config import templates, PAGE_SIZE, MAX_PAGE_SIZE
 
 
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
 
-@router.get("/")
-async def tasks_list(request: Request, db: AsyncSession = Depends(get_async_db),
-                     current_user: User = Depends(get_current_user)):
+@router.get("/", dependencies=[cached_page("tasks", "users_tasks", "task_comments", "users", "teams", "users_teams")])
+async def tasks_list(request: Request,
+                     cursor: str | None = None,
+                     limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                     stream: bool = False,
+                     task_status: OptionalStr = None,
+                     deadline_from: OptionalDatetime = None,
+                     deadline_to: OptionalDatetime = None,
+                     user_id: OptionalInt = None,
+                     team_id: OptionalInt = None,
+                     db: AsyncSession = Depends(get_async_read_db),
+                     current_user: Principal = Depends(get_current_user)):
     """
-    Отображает список задач в зависимости от роли пользователя.
+    Отображает страницу списка задач в зависимости от роли пользователя.
     Admin видит все задачи, менеджер - только задачи своих команд,
-    пользователь - только свои.
+    пользователь - только свои. Задачи упорядочены по дедлайну и ID,
+    постраничная навигация выполняется по курсору.
     Args:
         request (Request): Текущий HTTP-запрос
+        cursor (str | None): Курсор следующей страницы
+        limit (int): Размер страницы
+        stream (bool): Отдать весь отфильтрованный список потоком, без постраничной навигации
+        task_status (str | None): Фильтр по статусу
+        deadline_from (datetime | None): Дедлайн не раньше
+        deadline_to (datetime | None): Дедлайн раньше
+        user_id (int | None): Фильтр по назначенному пользователю
+        team_id (int | None): Фильтр по команде назначенных пользователей
         db (AsyncSession): Асинхронная сессия базы данных
-        current_user (User): Текущий авторизованный пользователь
+        current_user (Principal): Текущий авторизованный пользователь
     Returns:
         HTMLResponse: Страница со списком задач
     """
-    if current_user.role == "admin":
-        result = await db.execute(
-            select(Task)
-            .options(selectinload(Task.users), selectinload(Task.comments))
+    stmt = select(Task).options(*load_options("task_list_row"))
+
+    scope = await resolve_scope(db, current_user)
+    stmt = stmt.where(scope.task_clause())
+
+    if task_status:
+        stmt = stmt.where(Task.status == task_status)
+    if deadline_from:
+        stmt = stmt.where(Task.deadline >= deadline_from)
+    if deadline_to:
+        stmt = stmt.where(Task.deadline < deadline_to)
+    if user_id:
+        stmt = stmt.where(Task.users.any(User.id == user_id))
+    if team_id:
+        stmt = stmt.where(Task.users.any(User.teams.any(Team.id == team_id)))
+
+    if stream:
+        return stream_template(
+            request,
+            "tasks/tasks_list.html",
+            {"page": None, "current_user": current_user},
+            db,
+            tasks=keyset_order(stmt, Task.id, Task.deadline),
         )
-        tasks = result.scalars().all()
 
-    elif current_user.role == "manager":
-        result_teams = await db.execute(
-            select(Team.id).where(Team.manager_id == current_user.id)
-        )
-        team_ids = result_teams.scalars().all()
-
-        if team_ids:
-            result = await db.execute(
-                select(Task)
-                .options(selectinload(Task.users), selectinload(Task.comments))
-                .where(Task.users.any(User.teams.any(Team.id.in_(team_ids))))
-            )
-            tasks = result.scalars().all()
-        else:
-            tasks = []
-
-    else:
-        result = await db.execute(
-            select(Task)
-            .options(selectinload(Task.users), selectinload(Task.comments))
-            .where(Task.users.any(User.id == current_user.id))
-        )
-        tasks = result.scalars().all()
+    page = await paginate(db, stmt, Task.id, Task.deadline, cursor, limit)
 
     return templates.TemplateResponse(
         request,
         "tasks/tasks_list.html",
-        {"request": request, "tasks": tasks, "current_user": current_user}
+        {"request": request, "tasks": page.items, "page": page, "current_user": current_user}
     )
 
 
-@router.get("/create")
+@router.get("/export")
+async def tasks_export(fmt: ExportFormat = "csv",
+                       deadline_from: OptionalDatetime = None,
+                       deadline_to: OptionalDatetime = None,
+                       db: AsyncSession = Depends(get_async_read_db),
+                       current_user: Principal = Depends(get_current_user)):
+    """
+    Выгружает задачи в CSV или NDJSON с теми же ограничениями по ролям, что и список задач.
+    Args:
+        fmt (str): csv или ndjson
+        deadline_from (datetime | None): Дедлайн не раньше
+        deadline_to (datetime | None): Дедлайн раньше
+        db (AsyncSession): Асинхронная сессия базы данных
+        current_user (Principal): Текущий авторизованный пользователь
+    Returns:
+        StreamingResponse: Потоковая выгрузка задач
+    """
+    assignee_ids = (
+        select(func.aggregate_strings(cast(users_tasks.c.user_id, String), ";"))
+        .where(users_tasks.c.task_id == Task.id)
+        .scalar_subquery()
+        .label("assignee_ids")
+    )
+    stmt = select(Task.id, Task.title, Task.description, Task.status, Task.deadline, assignee_ids)
+
+    scope = await resolve_scope(db, current_user)
+    stmt = stmt.where(scope.task_clause())
+    if deadline_from:
+        stmt = stmt.where(Task.deadline >= deadline_from)
+    if deadline_to:
+        stmt = stmt.where(Task.deadline < deadline_to)
+
+    return stream_export(db, stmt.order_by(Task.id), fmt, "tasks")
+
+
+@router.get("/create", dependencies=[conditional_get("users", "teams", "users_teams")])
 async def task_create_form(request: Request, db: AsyncSession = Depends(get_async_db),
-                           current_user: User = Depends(get_current_user)):
+                           current_user: Principal = Depends(get_current_user)):
     """
     Отображает форму создания новой задачи.
     Доступно только для администратора и менеджера.
     Args:
         request (Request): Текущий HTTP-запрос
         db (AsyncSession): Асинхронная сессия базы данных
-        current_user (User): Текущий пользователь
+        current_user (Principal): Текущий пользователь
     Returns:
         HTMLResponse: Страница с формой создания задачи
     """
     if current_user.role == "user":
         raise HTTPException(status_code=403, detail="User не может создавать задачу")
 
-    if current_user.role == "admin":
-        result_users = await db.execute(select(User))
-        users = result_users.scalars().all()
-
-    elif current_user.role == "manager":
-        result_users = await db.execute(
-            select(User).where(User.teams.any(Team.manager_id == current_user.id)))
-        users = result_users.scalars().all()
+    scope = await resolve_scope(db, current_user)
+    result_users = await db.execute(
+        select(User).options(*load_options("user_option")).where(scope.user_clause(User.id))
+    )
+    users = result_users.scalars().all()
 
     return templates.TemplateResponse(
         request,
@@ -108,7 +162,7 @@ async def task_create(
         user_ids: list[int] = Form([]),
         first_comment: str = Form(...),
         db: AsyncSession = Depends(get_async_db),
-        current_user: User = Depends(get_current_user)
+        current_user: Principal = Depends(get_current_user)
 ):
     """
     Обрабатывает создание новой задачи и первого комментария.
@@ -123,7 +177,7 @@ async def task_create(
         user_ids (list[int]): Список пользователей, назначенных на задачу
         first_comment (str): Текст первого комментария
         db (AsyncSession): Асинхронная сессия базы данных
-        current_user (User): Текущий пользователь
+        current_user (Principal): Текущий пользователь
     Returns:
         HTMLResponse: Страница с подтверждением создания задачи
     """
@@ -132,17 +186,9 @@ async def task_create(
 
     deadline_dt = datetime.fromisoformat(deadline)
 
-    if current_user.role == "admin":
-        result = await db.execute(select(User).where(User.id.in_(user_ids)))
-        users = result.scalars().all()
-
-    elif current_user.role == "manager":
-        result = await db.execute(
-            select(User)
-            .where(User.id.in_(user_ids))
-            .where(User.teams.any(Team.manager_id == current_user.id))
-        )
-        users = result.scalars().all()
+    scope = await resolve_scope(db, current_user)
+    result = await db.execute(select(User).where(User.id.in_(scope.visible_user_ids(user_ids))))
+    users = result.scalars().all()
 
     task = Task(title=title, description=description, status=task_status, deadline=deadline_dt, users=users)
 
@@ -153,6 +199,8 @@ async def task_create(
         comment = TaskComment(content=first_comment, task_id=task.id, user_id=current_user.id)
         db.add(comment)
 
+    await table_versions.bump(db, "tasks", "users_tasks", "task_comments")
+    await feed_versions.bump(db, *(user.id for user in users))
     await db.commit()
     return templates.TemplateResponse(
         request,
@@ -161,9 +209,48 @@ async def task_create(
     )
 
 
-@router.get("/edit/{task_id}")
+@router.post("/import", response_model=ImportReport)
+async def task_import(
+        file: UploadFile = File(...),
+        fmt: str | None = Form(None, alias="format"),
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(get_current_user)
+):
+    """
+    Массово импортирует задачи из CSV или NDJSON.
+    Колонки: title, description, status, deadline, assignee_ids (через ";" в CSV), comment.
+    Менеджер может назначать только участников своих команд.
+    Некорректные строки пропускаются и перечисляются в отчёте.
+    Args:
+        file (UploadFile): Файл с задачами
+        fmt (str | None): csv или ndjson, по умолчанию определяется по расширению файла
+        db (AsyncSession): Асинхронная сессия базы данных
+        current_user (Principal): Текущий пользователь
+    Returns:
+        ImportReport: Число импортированных задач и ошибки по строкам
+    """
+    if current_user.role == "user":
+        raise HTTPException(status_code=403, detail="User не может создавать задачу")
+    fmt = fmt or detect_format(file.filename)
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Неизвестный формат: {fmt}")
+
+    scope = await resolve_scope(db, current_user)
+    source = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    try:
+        report = await import_tasks(await db.connection(), source, fmt, current_user.id, scope)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Файл должен быть в кодировке UTF-8")
+    if report.imported:
+        await table_versions.bump(db, *IMPORT_CHANGES["tables"])
+        await feed_versions.bump_all(db)
+    await db.commit()
+    return report
+
+
+@router.get("/edit/{task_id}", dependencies=[conditional_get("tasks", "users_tasks", "users")])
 async def task_edit_form(request: Request, task_id: int, db: AsyncSession = Depends(get_async_db),
-                         current_user: User = Depends(get_current_user)):
+                         current_user: Principal = Depends(get_current_user)):
     """
     Отображает форму редактирования задачи.
     Проверяет права доступа - редактировать могут только
@@ -172,19 +259,19 @@ async def task_edit_form(request: Request, task_id: int, db: AsyncSession = Depe
         request (Request): Текущий HTTP-запрос.
         task_id (int): ID задачи.
         db (AsyncSession): Асинхронная сессия базы данных.
-        current_user (User): Текущий пользователь.
+        current_user (Principal): Текущий пользователь.
     Returns:
         HTMLResponse: Страница с формой редактирования задачи.
     """
     result_task = await db.execute(
-        select(Task).options(selectinload(Task.users)).where(Task.id == task_id)
+        select(Task).options(*load_options("task_detail")).where(Task.id == task_id)
     )
     task = result_task.scalars().first()
 
-    if current_user.role != "admin" and current_user not in task.users and current_user.role != "manager":
+    if current_user.role != "admin" and current_user.id not in {user.id for user in task.users} and current_user.role != "manager":
         raise HTTPException(status_code=403, detail="У вас нет доступа к этой задаче")
 
-    result_users = await db.execute(select(User))
+    result_users = await db.execute(select(User).options(*load_options("user_option")))
     users = result_users.scalars().all()
 
     return templates.TemplateResponse(
@@ -204,7 +291,7 @@ async def task_edit(
         deadline: str = Form(...),
         user_ids: list[int] = Form([]),
         db: AsyncSession = Depends(get_async_db),
-        current_user: User = Depends(get_current_user)
+        current_user: Principal = Depends(get_current_user)
 ):
     """
     Обновляет информацию о задаче по её ID.
@@ -218,17 +305,18 @@ async def task_edit(
         deadline (str): Новая дата в ISO-формате
         user_ids (list[int]): Обновлённый список участников
         db (AsyncSession): Асинхронная сессия базы данных
-        current_user (User): Текущий пользователь
+        current_user (Principal): Текущий пользователь
     Returns:
         RedirectResponse: Перенаправление на список задач
     """
     result_task = await db.execute(
-        select(Task).options(selectinload(Task.users)).where(Task.id == task_id))
+        select(Task).options(*load_options("task_detail")).where(Task.id == task_id))
     task = result_task.scalars().first()
 
-    if current_user.role != "admin" and current_user not in task.users and current_user.role != "manager":
+    if current_user.role != "admin" and current_user.id not in {user.id for user in task.users} and current_user.role != "manager":
         raise HTTPException(status_code=403, detail="У вас нет доступа к этой задаче")
 
+    previous_user_ids = [user.id for user in task.users]
     task.title = title
     task.description = description
     task.status = task_status
@@ -237,13 +325,15 @@ async def task_edit(
     result = await db.execute(select(User).where(User.id.in_(user_ids)))
     task.users = result.scalars().all()
 
+    await table_versions.bump(db, "tasks", "users_tasks")
+    await feed_versions.bump(db, *previous_user_ids, *(user.id for user in task.users))
     await db.commit()
     return RedirectResponse(url="/tasks", status_code=status.HTTP_303_SEE_OTHER)
 
 
 @router.get("/delete/{task_id}")
 async def task_delete(task_id: int, db: AsyncSession = Depends(get_async_db),
-                      current_user: User = Depends(get_current_user)):
+                      current_user: Principal = Depends(get_current_user)):
     """
     Удаляет задачу по ID.
     Проверяет, что пользователь имеет права (админ, менеджер
@@ -251,16 +341,18 @@ async def task_delete(task_id: int, db: AsyncSession = Depends(get_async_db),
     Args:
         task_id (int): ID задачи
         db (AsyncSession): Асинхронная сессия базы данных
-        current_user (User): Текущий пользователь
+        current_user (Principal): Текущий пользователь
     Returns:
         HTMLResponse: Сообщение об успешном удалении задачи
     """
-    task = await db.get(Task, task_id)
+    task = await db.get(Task, task_id, options=load_options("task_detail"))
 
-    if current_user.role != "admin" and current_user not in task.users and current_user.role != "manager":
+    if current_user.role != "admin" and current_user.id not in {user.id for user in task.users} and current_user.role != "manager":
         raise HTTPException(status_code=403, detail="У вас нет доступа к этой задаче")
 
     await db.delete(task)
+    await table_versions.bump(db, "tasks", "users_tasks", "task_comments", "evaluations")
+    await feed_versions.bump(db, *(user.id for user in task.users))
     await db.commit()
     return HTMLResponse(f"Задача {task.title} удалена")
 
@@ -287,7 +379,7 @@ async def add_comment(
         task_id: int,
         content: str = Form(...),
         db: AsyncSession = Depends(get_async_db),
-        current_user: User = Depends(get_current_user)
+        current_user: Principal = Depends(get_current_user)
 ):
     """
     Добавляет комментарий к задаче.
@@ -295,11 +387,12 @@ async def add_comment(
         task_id (int): ID задачи
         content (str): Текст комментария
         db (AsyncSession): Асинхронная сессия базы данных
-        current_user (User): Автор комментария
+        current_user (Principal): Автор комментария
     Returns:
         RedirectResponse: Перенаправление на список задач
     """
     comment = TaskComment(content=content, task_id=task_id, user_id=current_user.id)
     db.add(comment)
+    await table_versions.bump(db, "task_comments")
     await db.commit()
     return RedirectResponse(url="/tasks", status_code=303)
\ No newline at end of file
@@ -1,55 +1,73 @@
-from fastapi import APIRouter, Depends, status, Request, Form
+from fastapi import APIRouter, Depends, status, Request, Form, Query
 from fastapi.responses import RedirectResponse, HTMLResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 from sqlalchemy import select
 
-from app.database import get_async_db
+from app.database import get_async_db, get_async_read_db
+from app.versions import table_versions, conditional_get
+from app.page_cache import cached_page
 from app.models import Team, User
-from app.config import templates
-from app.auth import get_current_user
+from app.config import templates, PAGE_SIZE, MAX_PAGE_SIZE
+from app.auth import get_current_user, Principal, invalidate_principal
+from app.loaders import load_options
+from app.scope import invalidate_scope
+from app.pagination import paginate, OptionalInt
 
 
 router = APIRouter(prefix="/teams", tags=["teams"])
 
 
-@router.get("/")
-async def teams_list(request: Request, db: AsyncSession = Depends(get_async_db)):
+@router.get("/", dependencies=[cached_page("teams", "users_teams", "users", per_user=False)])
+async def teams_list(request: Request,
+                     cursor: str | None = None,
+                     limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                     user_id: OptionalInt = None,
+                     manager_id: OptionalInt = None,
+                     db: AsyncSession = Depends(get_async_read_db)):
     """
-    Отображает список всех команд с участниками.
+    Отображает страницу списка команд с участниками.
+    Постраничная навигация выполняется по курсору.
     Args:
         request (Request): Текущий HTTP-запрос
+        cursor (str | None): Курсор следующей страницы
+        limit (int): Размер страницы
+        user_id (int | None): Фильтр по участнику команды
+        manager_id (int | None): Фильтр по менеджеру команды
         db (AsyncSession): Асинхронная сессия базы данных
     Returns:
         HTMLResponse: Страница со списком команд
     """
-    result = await db.execute(
-        select(Team).options(selectinload(Team.users))
-    )
-    teams = result.scalars().all()
+    stmt = select(Team).options(*load_options("team_row"))
+
+    if user_id:
+        stmt = stmt.where(Team.users.any(User.id == user_id))
+    if manager_id:
+        stmt = stmt.where(Team.manager_id == manager_id)
+
+    page = await paginate(db, stmt, Team.id, cursor=cursor, limit=limit)
     return templates.TemplateResponse(
         request,
         "teams/teams_list.html",
-        {"request": request, "teams": teams}
+        {"request": request, "teams": page.items, "page": page}
     )
 
 
-@router.get("/create")
+@router.get("/create", dependencies=[conditional_get("users")])
 async def team_create_form(request: Request, db: AsyncSession = Depends(get_async_db),
-                           current_user: User = Depends(get_current_user)):
+                           current_user: Principal = Depends(get_current_user)):
     """
     Отображает форму создания новой команды.
     Доступно только для администратора.
     Args:
         request (Request): Текущий HTTP-запрос
         db (AsyncSession): Асинхронная сессия базы данных
-        current_user (User): Текущий пользователь
+        current_user (Principal): Текущий пользователь
     Returns:
         HTMLResponse: Страница с формой создания команды
     """
     if current_user.role != "admin":
         return HTMLResponse("Только admin может создавать команды", status_code=403)
-    result = await db.execute(select(User))
+    result = await db.execute(select(User).options(*load_options("user_option")))
     users = result.scalars().all()
     return templates.TemplateResponse(
         request,
@@ -88,7 +106,10 @@ async def team_create(
             team.manager = manager
 
     db.add(team)
+    await table_versions.bump(db, "teams", "users_teams")
     await db.commit()
+    invalidate_principal(*user_ids)
+    invalidate_scope(team.manager_id)
     return templates.TemplateResponse(
         request,
         "teams/team_created.html",
@@ -96,7 +117,7 @@ async def team_create(
     )
 
 
-@router.get("/edit/{team_id}")
+@router.get("/edit/{team_id}", dependencies=[conditional_get("teams", "users_teams", "users", per_user=False)])
 async def team_edit_form(request: Request, team_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Отображает форму редактирования существующей команды.
@@ -107,9 +128,9 @@ async def team_edit_form(request: Request, team_id: int, db: AsyncSession = Depe
     Returns:
         HTMLResponse: Страница с формой редактирования команды
     """
-    team = await db.get(Team, team_id)
+    team = await db.get(Team, team_id, options=load_options("team_row"))
 
-    result = await db.execute(select(User))
+    result = await db.execute(select(User).options(*load_options("user_option")))
     users = result.scalars().all()
 
     return templates.TemplateResponse(
@@ -141,7 +162,9 @@ async def team_edit(
     Returns:
         RedirectResponse: Перенаправление на страницу списка команд
     """
-    team = await db.get(Team, team_id)
+    team = await db.get(Team, team_id, options=load_options("team_row"))
+    affected_ids = {user.id for user in team.users} | set(user_ids)
+    previous_manager_id = team.manager_id
 
     result = await db.execute(select(User).where(User.id.in_(user_ids)))
     users = result.scalars().all()
@@ -156,7 +179,10 @@ async def team_edit(
     else:
         team.manager = None
 
+    await table_versions.bump(db, "teams", "users_teams")
     await db.commit()
+    invalidate_principal(*affected_ids)
+    invalidate_scope(previous_manager_id, team.manager_id)
     return RedirectResponse(url="/teams", status_code=status.HTTP_303_SEE_OTHER)
 
 
@@ -170,7 +196,12 @@ async def team_delete(team_id: int, db: AsyncSession = Depends(get_async_db)):
     Returns:
         RedirectResponse: Перенаправление на список команд
     """
-    team = await db.get(Team, team_id)
+    team = await db.get(Team, team_id, options=load_options("team_row"))
+    member_ids = [user.id for user in team.users]
+    manager_id = team.manager_id
     await db.delete(team)
+    await table_versions.bump(db, "teams", "users_teams")
     await db.commit()
+    invalidate_principal(*member_ids)
+    invalidate_scope(manager_id)
     return RedirectResponse(url="/teams", status_code=status.HTTP_303_SEE_OTHER)
\ No newline at end of file
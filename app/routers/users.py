@@ -1,12 +1,12 @@
 from fastapi import APIRouter, Depends, status, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
 from app.schemas import UserCreate, UserRead
 from app.models import User
 from app.database import get_async_db
-from app.auth import hash_password, verify_password, create_access_token
+from app.versions import table_versions
+from app.auth import hash_password_async, authenticate_user, create_access_token, token_claims
 
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -26,10 +26,11 @@ async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)
     db_user = User(
         name=user.name,
         email=user.email,
-        hashed_password=hash_password(user.password),
+        hashed_password=await hash_password_async(user.password),
         role=user.role
     )
     db.add(db_user)
+    await table_versions.bump(db, "users")
     await db.commit()
     return db_user
 
@@ -46,13 +47,12 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSessi
     Returns:
         dict: Содержит access_token и тип токена ("bearer")
     """
-    result = await db.scalars(select(User).where(User.email == form_data.username))
-    user = result.first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = await authenticate_user(db, form_data.username, form_data.password)
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"}
         )
-    access_token = create_access_token({"sub": user.email, "role": user.role, "id": user.id})
+    access_token = create_access_token(token_claims(user))
     return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
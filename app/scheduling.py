@@ -0,0 +1,134 @@
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable
+
+from sqlalchemy import select, union, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import DISPLAY_TZ
+from app.models import Meeting, Task, users_meetings, users_tasks, users_teams
+
+
+Interval = tuple[datetime, datetime]
+
+
+def _aware(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+async def fetch_busy(db: AsyncSession, user_ids: Iterable[int], team_id: int | None,
+                     start: datetime, end: datetime, deadline_block: timedelta | None = None) -> list[Interval]:
+    """
+    Загружает занятые интервалы участников за период одним запросом:
+    встречи (по индексу users_meetings) и, при необходимости, дедлайны задач.
+    Одинаковые интервалы нескольких участников схлопываются в запросе (UNION).
+    Args:
+        db (AsyncSession): Асинхронная сессия базы данных
+        user_ids (Iterable[int]): ID участников
+        team_id (int | None): Команда, все участники которой добавляются к user_ids
+        start (datetime): Начало периода
+        end (datetime): Конец периода
+        deadline_block (timedelta | None): Сколько времени до дедлайна задачи считать занятым, None - не учитывать
+    Returns:
+        list[Interval]: Занятые интервалы (начало, конец) в порядке начала
+    """
+    start, end = start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+    participants = select(users_teams.c.user_id).where(users_teams.c.team_id == team_id)
+    members = users_meetings.c.user_id.in_(list(user_ids))
+    if team_id is not None:
+        members = members | users_meetings.c.user_id.in_(participants)
+
+    busy = (
+        select(literal("meeting").label("kind"), Meeting.scheduled_at.label("starts_at"), Meeting.ends_at.label("ends_at"))
+        .join(users_meetings, users_meetings.c.meeting_id == Meeting.id)
+        .where(members, Meeting.scheduled_at < end, Meeting.ends_at > start)
+    )
+    if deadline_block is not None:
+        assignees = users_tasks.c.user_id.in_(list(user_ids))
+        if team_id is not None:
+            assignees = assignees | users_tasks.c.user_id.in_(participants)
+        deadlines = (
+            select(literal("deadline").label("kind"), Task.deadline.label("starts_at"), Task.deadline.label("ends_at"))
+            .join(users_tasks, users_tasks.c.task_id == Task.id)
+            .where(assignees, Task.deadline > start, Task.deadline < end + deadline_block)
+        )
+        busy = union(busy, deadlines)
+    else:
+        busy = busy.distinct()
+
+    result = await db.execute(busy)
+    intervals = []
+    for kind, starts_at, ends_at in result:
+        if kind == "deadline":
+            starts_at = ends_at - deadline_block
+        intervals.append((_aware(starts_at), _aware(ends_at)))
+    intervals.sort()
+    return intervals
+
+
+def merge_intervals(intervals: list[Interval]) -> list[Interval]:
+    """
+    Объединяет пересекающиеся и смежные интервалы за один проход по отсортированному списку.
+    Args:
+        intervals (list[Interval]): Интервалы, отсортированные по началу
+    Returns:
+        list[Interval]: Непересекающиеся интервалы
+    """
+    merged: list[Interval] = []
+    for starts_at, ends_at in intervals:
+        if merged and starts_at <= merged[-1][1]:
+            if ends_at > merged[-1][1]:
+                merged[-1] = (merged[-1][0], ends_at)
+        else:
+            merged.append((starts_at, ends_at))
+    return merged
+
+
+def working_windows(start: date, end: date, work_start: int, work_end: int) -> list[Interval]:
+    """
+    Строит рабочие окна по дням в часовом поясе отображения.
+    Args:
+        start (date): Первый день
+        end (date): Последний день (включительно)
+        work_start (int): Час начала рабочего дня
+        work_end (int): Час окончания рабочего дня (24 - полночь)
+    Returns:
+        list[Interval]: Рабочие окна в порядке времени
+    """
+    windows = []
+    day = start
+    while day <= end:
+        opens = DISPLAY_TZ.localize(datetime.combine(day, time(work_start)))
+        closes = DISPLAY_TZ.localize(datetime.combine(day + timedelta(days=work_end // 24), time(work_end % 24)))
+        windows.append((opens, closes))
+        day += timedelta(days=1)
+    return windows
+
+
+def free_slots(busy: list[Interval], windows: list[Interval], duration: timedelta) -> list[Interval]:
+    """
+    Находит свободные промежутки не короче duration внутри рабочих окон.
+    Sweep-line: занятые интервалы объединяются, затем окна и занятость проходятся
+    одним указателем, так что сложность линейна после сортировки.
+    Args:
+        busy (list[Interval]): Занятые интервалы, отсортированные по началу
+        windows (list[Interval]): Рабочие окна в порядке времени
+        duration (timedelta): Минимальная длительность слота
+    Returns:
+        list[Interval]: Свободные слоты
+    """
+    merged = merge_intervals(busy)
+    slots = []
+    i = 0
+    for opens, closes in windows:
+        while i < len(merged) and merged[i][1] <= opens:
+            i += 1
+        cursor = opens
+        j = i
+        while j < len(merged) and merged[j][0] < closes:
+            if merged[j][0] - cursor >= duration:
+                slots.append((cursor, merged[j][0]))
+            cursor = max(cursor, merged[j][1])
+            j += 1
+        if closes - cursor >= duration:
+            slots.append((cursor, closes))
+    return slots
@@ -1,4 +1,7 @@
-from pydantic import BaseModel, Field, EmailStr, ConfigDict
+from datetime import datetime
+from typing import Annotated
+
+from pydantic import BaseModel, Field, EmailStr, ConfigDict, BeforeValidator
 
 
 class UserCreate(BaseModel):
@@ -14,4 +17,35 @@ class UserRead(BaseModel):
     email: EmailStr
     role: str
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+
+def _split_ids(value):
+    if isinstance(value, str):
+        return [part for part in value.replace(",", ";").split(";") if part.strip()]
+    return value
+
+
+def _empty_to_none(value):
+    return value if value != "" else None
+
+
+class TaskImportRow(BaseModel):
+    title: str = Field(min_length=1)
+    description: str = ""
+    status: str = Field(default="open", pattern="^(open|in_progress|done)$")
+    deadline: Annotated[datetime | None, BeforeValidator(_empty_to_none)] = None
+    # В CSV ID исполнителей перечисляются через ";"
+    assignee_ids: Annotated[list[int], BeforeValidator(_split_ids)] = []
+    comment: str = ""
+
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+
+class ImportReport(BaseModel):
+    imported: int = 0
+    error_count: int = 0
+    errors: list[ImportRowError] = []
@@ -0,0 +1,160 @@
+from dataclasses import dataclass
+from typing import Iterable
+
+from sqlalchemy import select, true, ColumnElement
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth import Principal
+from app.cache import TTLCache
+from app.config import SCOPE_CACHE_SIZE, SCOPE_CACHE_TTL
+from app.invalidation import invalidation_bus
+from app.models import Task, Team, users_teams, users_tasks
+
+
+@dataclass(frozen=True)
+class Scope:
+    """
+    Область видимости пользователя: чьи задачи и оценки он видит.
+    Admin видит всех, менеджер - участников своих команд, пользователь - только себя.
+    Attributes:
+        member_ids (frozenset[int] | None): ID видимых пользователей, None - без ограничений
+        team_ids (frozenset[int] | None): ID команд менеджера, None - если пользователь не менеджер
+    """
+    member_ids: frozenset[int] | None
+    team_ids: frozenset[int] | None = None
+
+    @property
+    def unrestricted(self) -> bool:
+        return self.member_ids is None
+
+    def can_see_user(self, user_id: int) -> bool:
+        """
+        Проверяет, входит ли пользователь в область видимости.
+        Args:
+            user_id (int): ID пользователя
+        Returns:
+            bool: True, если пользователь виден
+        """
+        return self.unrestricted or user_id in self.member_ids
+
+    def visible_user_ids(self, user_ids: Iterable[int]) -> set[int]:
+        """
+        Оставляет из переданных ID только видимых пользователей.
+        Args:
+            user_ids (Iterable[int]): ID пользователей
+        Returns:
+            set[int]: Пересечение с областью видимости
+        """
+        user_ids = set(user_ids)
+        return user_ids if self.unrestricted else user_ids & self.member_ids
+
+    def user_clause(self, column) -> ColumnElement:
+        """
+        Условие "колонка с ID пользователя в области видимости".
+        Для менеджера ограничение строится через ID команд, а не через список участников,
+        чтобы число параметров запроса не росло вместе с командами.
+        Args:
+            column: Колонка с ID пользователя
+        Returns:
+            ColumnElement: Условие для where()
+        """
+        if self.unrestricted:
+            return true()
+        if self.team_ids is not None:
+            return column.in_(select(users_teams.c.user_id).where(users_teams.c.team_id.in_(self.team_ids)))
+        return column.in_(self.member_ids)
+
+    def task_clause(self) -> ColumnElement:
+        """
+        Условие "на задачу назначен хотя бы один видимый пользователь" -
+        одно полусоединение по users_tasks вместо вложенных коррелированных EXISTS.
+        Returns:
+            ColumnElement: Условие для where()
+        """
+        if self.unrestricted:
+            return true()
+        if self.team_ids is not None:
+            visible_tasks = (
+                select(users_tasks.c.task_id)
+                .join(users_teams, users_teams.c.user_id == users_tasks.c.user_id)
+                .where(users_teams.c.team_id.in_(self.team_ids))
+            )
+        else:
+            visible_tasks = select(users_tasks.c.task_id).where(users_tasks.c.user_id.in_(self.member_ids))
+        return Task.id.in_(visible_tasks)
+
+
+# manager_id -> Scope с командами менеджера и их участниками
+manager_scopes = TTLCache(maxsize=SCOPE_CACHE_SIZE, ttl=SCOPE_CACHE_TTL)
+
+
+def invalidate_scope(*manager_ids: int | None) -> None:
+    """
+    Сбрасывает закэшированные области видимости менеджеров
+    после изменения команд, их состава или менеджера.
+    Без аргументов сбрасывает кэш целиком.
+    Args:
+        *manager_ids (int | None): ID менеджеров
+    """
+    if not manager_ids:
+        manager_scopes.clear()
+        invalidation_bus.publish("scopes", None)
+        return
+    for manager_id in manager_ids:
+        if manager_id is not None:
+            manager_scopes.pop(manager_id)
+    invalidation_bus.publish("scopes", manager_ids)
+
+
+def _apply_remote_scopes(manager_ids: tuple[int, ...] | None) -> None:
+    if manager_ids is None:
+        invalidate_scope()
+    elif manager_ids:
+        invalidate_scope(*manager_ids)
+
+
+invalidation_bus.register("scopes", _apply_remote_scopes)
+
+
+async def load_manager_scope(db: AsyncSession, manager_id: int) -> Scope:
+    """
+    Загружает команды менеджера и их участников одним запросом.
+    Args:
+        db (AsyncSession): Асинхронная сессия базы данных
+        manager_id (int): ID менеджера
+    Returns:
+        Scope: Область видимости менеджера
+    """
+    result = await db.execute(
+        select(Team.id, users_teams.c.user_id)
+        .outerjoin(users_teams, users_teams.c.team_id == Team.id)
+        .where(Team.manager_id == manager_id)
+    )
+    team_ids, member_ids = set(), set()
+    for team_id, user_id in result:
+        team_ids.add(team_id)
+        if user_id is not None:
+            member_ids.add(user_id)
+    return Scope(member_ids=frozenset(member_ids), team_ids=frozenset(team_ids))
+
+
+async def resolve_scope(db: AsyncSession, principal: Principal) -> Scope:
+    """
+    Возвращает область видимости текущего пользователя.
+    Области менеджеров кэшируются до изменения их команд.
+    Args:
+        db (AsyncSession): Асинхронная сессия базы данных
+        principal (Principal): Текущий пользователь
+    Returns:
+        Scope: Область видимости
+    """
+    if principal.role == "admin":
+        return Scope(member_ids=None)
+    if principal.role != "manager":
+        return Scope(member_ids=frozenset({principal.id}))
+
+    scope = manager_scopes.get(principal.id)
+    if scope is None:
+        scope = await load_manager_scope(db, principal.id)
+        manager_scopes.set(principal.id, scope)
+    return scope
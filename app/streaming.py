@@ -0,0 +1,133 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import Annotated, AsyncIterator
+
+from fastapi import Request, Query
+from fastapi.responses import StreamingResponse
+from jinja2 import Environment
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import templates, STREAM_YIELD_PER, STREAM_CHUNK_SIZE
+
+
+# Асинхронное окружение Jinja с теми же шаблонами, фильтрами и глобальными функциями,
+# что и у templates: в нём {% for %} умеет перебирать асинхронные итераторы
+stream_env = Environment(loader=templates.env.loader, autoescape=templates.env.autoescape, enable_async=True)
+stream_env.filters.update(templates.env.filters)
+stream_env.globals.update(templates.env.globals)
+
+
+async def stream_rows(session: AsyncSession, stmt: Select) -> AsyncIterator:
+    """
+    Перебирает ORM-объекты через серверный курсор порциями по STREAM_YIELD_PER строк.
+    Запрос выполняется при первой итерации, то есть когда шаблон дошёл до цикла.
+    Args:
+        session (AsyncSession): Асинхронная сессия базы данных
+        stmt (Select): Упорядоченный запрос
+    Yields:
+        ORM-объекты результата
+    """
+    result = await session.stream_scalars(stmt.execution_options(yield_per=STREAM_YIELD_PER))
+    async for row in result:
+        yield row
+
+
+def stream_template(request: Request, name: str, context: dict, db: AsyncSession,
+                    **streams: Select) -> StreamingResponse:
+    """
+    Рендерит шаблон по частям в StreamingResponse.
+    Шапка страницы отправляется сразу, строки подгружаются из курсора по мере рендеринга,
+    поэтому память не зависит от числа строк.
+    Сессия зависимости get_async_db закрывается до отправки тела ответа,
+    поэтому запросы выполняются в отдельной сессии на том же engine. Она берёт из пула
+    своё подключение: пока сессия запроса не вернула своё, страница занимает два подключения,
+    и незафиксированные изменения сессии запроса в потоке не видны.
+    Args:
+        request (Request): Текущий HTTP-запрос
+        name (str): Имя шаблона
+        context (dict): Контекст шаблона
+        db (AsyncSession): Сессия запроса, из которой берётся engine
+        **streams (Select): Переменные шаблона, которые перебираются из курсора
+    Returns:
+        StreamingResponse: Потоковый HTML-ответ
+    """
+    template = stream_env.get_template(name)
+
+    async def body():
+        async with AsyncSession(db.bind, expire_on_commit=False) as session:
+            rows = {key: stream_rows(session, stmt) for key, stmt in streams.items()}
+            buffer, size, flushed = [], 0, False
+            async for chunk in template.generate_async({**context, **rows, "request": request}):
+                buffer.append(chunk)
+                size += len(chunk)
+                if not flushed or size >= STREAM_CHUNK_SIZE:
+                    yield "".join(buffer)
+                    buffer, size, flushed = [], 0, True
+            if buffer:
+                yield "".join(buffer)
+
+    return StreamingResponse(body(), media_type="text/html; charset=utf-8")
+
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+# Параметр ?format= для эндпоинтов выгрузки
+ExportFormat = Annotated[str, Query(alias="format", pattern="^(csv|ndjson)$")]
+
+
+def _export_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def stream_export(db: AsyncSession, stmt: Select, fmt: str, filename: str) -> StreamingResponse:
+    """
+    Выгружает результат запроса в CSV или NDJSON потоком из серверного курсора.
+    Строки не превращаются в ORM-объекты и не накапливаются в памяти:
+    в каждый момент времени в памяти одна порция курсора и один блок ответа.
+    Args:
+        db (AsyncSession): Сессия запроса, из которой берётся engine
+        stmt (Select): Упорядоченный запрос по колонкам, имена колонок - заголовки выгрузки
+        fmt (str): csv или ndjson
+        filename (str): Имя файла без расширения
+    Returns:
+        StreamingResponse: Потоковая выгрузка
+    """
+    columns = [column.key for column in stmt.selected_columns]
+
+    async def body():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if fmt == "csv":
+            writer.writerow(columns)
+
+        async with AsyncSession(db.bind) as session:
+            result = await session.stream(stmt.execution_options(yield_per=STREAM_YIELD_PER))
+            async for partition in result.partitions():
+                for row in partition:
+                    values = [_export_value(value) for value in row]
+                    if fmt == "csv":
+                        writer.writerow(values)
+                    else:
+                        buffer.write(json.dumps(dict(zip(columns, values)), ensure_ascii=False))
+                        buffer.write("\n")
+                if buffer.tell() >= STREAM_CHUNK_SIZE:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
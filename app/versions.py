@@ -0,0 +1,307 @@
+from datetime import datetime, time as day_time, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, Hashable, Iterable
+
+from fastapi import Depends, Request, Response
+from sqlalchemy import event, select
+from sqlalchemy.dialects.postgresql import Insert, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.auth import get_current_user, Principal
+from app.config import DISPLAY_TZ
+from app.database import get_async_db, replica_may_lag
+from app.invalidation import invalidation_bus
+from app.models import data_versions
+
+
+# Ключ строки эпохи реестра в data_versions
+EPOCH_KEY = "*"
+# Ключ session.info: ключи, версии которых подняты в текущей транзакции
+PENDING_BUMPS = "version_bumps"
+
+
+class VersionRegistry:
+    """
+    Версии данных для условных GET-запросов (ETag/Last-Modified), общие для всех воркеров.
+    Версия ключа - счётчик в таблице data_versions, который bump увеличивает в той же транзакции,
+    что изменяет данные, поэтому все воркеры отдают для одних и тех же данных один ETag.
+    Токен версии состоит из эпохи реестра (её меняет bump_all) и счётчика ключа.
+    Прочитанные версии кэшируются в памяти процесса: после фиксации транзакции кэш сбрасывается
+    локально и через шину инвалидации у других воркеров, а слушатели получают изменённые ключи
+    (None - изменено всё).
+    Args:
+        name (str): Имя реестра в data_versions и в шине инвалидации
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._versions: dict[Hashable, tuple[str, datetime]] = {}
+        # Растёт при каждом сбросе: версии, прочитанные до сброса, не попадают в кэш
+        self._generation = 0
+        self.listeners: list[Callable[[tuple[Hashable, ...] | None], None]] = []
+        invalidation_bus.register(name, self.invalidate)
+
+    def upsert(self, *keys: Hashable) -> Insert:
+        """
+        Выражение, увеличивающее версии ключей в data_versions.
+        Args:
+            *keys (Hashable): Ключи изменённых данных, EPOCH_KEY - эпоха реестра
+        Returns:
+            Insert: INSERT ... ON CONFLICT DO UPDATE
+        """
+        now = datetime.now(timezone.utc)
+        # Транзакции блокируют строки версий в одном порядке и не ждут друг друга по кругу
+        stmt = insert(data_versions).values([
+            {"registry": self.name, "key": key, "version": 1, "modified_at": now}
+            for key in sorted({str(key) for key in keys})
+        ])
+        return stmt.on_conflict_do_update(
+            index_elements=[data_versions.c.registry, data_versions.c.key],
+            set_={"version": data_versions.c.version + 1, "modified_at": stmt.excluded.modified_at},
+        )
+
+    async def bump(self, db: AsyncSession, *keys: Hashable) -> None:
+        """
+        Увеличивает версии ключей в текущей транзакции сессии; кэши сбрасываются после её фиксации.
+        Вызывается непосредственно перед commit: строки версий заблокированы до конца транзакции.
+        Args:
+            db (AsyncSession): Сессия, в транзакции которой изменены данные
+            *keys (Hashable): Ключи изменённых данных
+        """
+        keys = {key for key in keys if key is not None}
+        if not keys:
+            return
+        await db.execute(self.upsert(*keys))
+        pending = db.info.setdefault(PENDING_BUMPS, {})
+        if pending.get(self, set()) is not None:
+            pending.setdefault(self, set()).update(keys)
+
+    async def bump_all(self, db: AsyncSession) -> None:
+        """
+        Меняет эпоху реестра, когда затронутые ключи неизвестны: меняются версии всех ключей.
+        Args:
+            db (AsyncSession): Сессия, в транзакции которой изменены данные
+        """
+        await db.execute(self.upsert(EPOCH_KEY))
+        db.info.setdefault(PENDING_BUMPS, {})[self] = None
+
+    def invalidate(self, keys: Iterable[Hashable] | None) -> None:
+        """
+        Сбрасывает кэш версий и уведомляет слушателей.
+        Вызывается после фиксации bump и для изменений, пришедших от других воркеров.
+        Args:
+            keys (Iterable[Hashable] | None): Изменённые ключи, None - все
+        """
+        self._generation += 1
+        if keys is None:
+            self._versions.clear()
+        else:
+            keys = tuple(keys)
+            for key in keys:
+                self._versions.pop(key, None)
+        for listener in self.listeners:
+            listener(keys)
+
+    async def get_many(self, db: AsyncSession, keys: Iterable[Hashable]) -> list[tuple[str, datetime]]:
+        """
+        Возвращает текущие версии ключей; отсутствующие в кэше читаются одним запросом.
+        Args:
+            db (AsyncSession): Сессия основной базы: реплика может отставать
+            keys (Iterable[Hashable]): Ключи данных
+        Returns:
+            list[tuple[str, datetime]]: Токены версий для ETag и время последнего изменения
+        """
+        keys = list(keys)
+        versions = {key: self._versions[key] for key in keys if key in self._versions}
+        missing = {str(key): key for key in keys if key not in versions}
+        if missing:
+            generation = self._generation
+            result = await db.execute(
+                select(data_versions.c.key, data_versions.c.version, data_versions.c.modified_at)
+                .where(data_versions.c.registry == self.name, data_versions.c.key.in_([EPOCH_KEY, *missing]))
+            )
+            rows = {key: (version, modified_at) for key, version, modified_at in result}
+            # Строку эпохи создают миграция и create_all; без неё время изменения неизвестно
+            epoch, epoch_modified_at = rows.pop(EPOCH_KEY, (0, datetime.now(timezone.utc)))
+            loaded = {}
+            for name, key in missing.items():
+                version, modified_at = rows.get(name, (0, epoch_modified_at))
+                loaded[key] = (f"{epoch}.{version}", max(modified_at, epoch_modified_at))
+            if generation == self._generation:
+                self._versions.update(loaded)
+            versions.update(loaded)
+        return [versions[key] for key in keys]
+
+    async def get(self, db: AsyncSession, key: Hashable) -> tuple[str, datetime]:
+        """
+        Возвращает текущую версию ключа.
+        Args:
+            db (AsyncSession): Сессия основной базы
+            key (Hashable): Ключ данных
+        Returns:
+            tuple[str, datetime]: Токен версии для ETag и время последнего изменения
+        """
+        return (await self.get_many(db, [key]))[0]
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_bumps(session: Session) -> None:
+    # Версии в базе видны другим транзакциям только после commit, поэтому кэши сбрасываются сейчас
+    for registry, keys in session.info.pop(PENDING_BUMPS, {}).items():
+        registry.invalidate(keys)
+        invalidation_bus.publish(registry.name, keys)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_bumps(session: Session) -> None:
+    session.info.pop(PENDING_BUMPS, None)
+
+
+# Версии календарных лент пользователей по ID пользователя
+feed_versions = VersionRegistry("feeds")
+# Версии таблиц для условных GET HTML-страниц по имени таблицы
+table_versions = VersionRegistry("tables")
+
+
+def make_etag(*parts) -> str:
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def is_not_modified(request: Request, etag: str, modified_at: datetime) -> bool:
+    """
+    Проверяет условный GET-запрос: If-None-Match имеет приоритет над If-Modified-Since.
+    Args:
+        request (Request): Текущий HTTP-запрос
+        etag (str): Текущий ETag ресурса
+        modified_at (datetime): Время последнего изменения ресурса (UTC)
+    Returns:
+        bool: True, если клиенту можно ответить 304 Not Modified
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return modified_at.replace(microsecond=0) <= since
+    return False
+
+
+def validator_headers(etag: str, modified_at: datetime) -> dict[str, str]:
+    """
+    Заголовки валидаторов ответа.
+    Last-Modified имеет точность в секунду: пока не закончилась секунда последнего изменения,
+    следующее изменение в ту же секунду дало бы то же значение, поэтому отдаётся только ETag.
+    Args:
+        etag (str): ETag ресурса
+        modified_at (datetime): Время последнего изменения ресурса (UTC)
+    Returns:
+        dict[str, str]: ETag и, если можно, Last-Modified
+    """
+    headers = {"ETag": etag}
+    if modified_at.replace(microsecond=0) < datetime.now(timezone.utc).replace(microsecond=0):
+        headers["Last-Modified"] = format_datetime(modified_at, usegmt=True)
+    return headers
+
+
+class NotModified(Exception):
+    """
+    Прерывает обработку условного GET-запроса до запросов страницы к базе данных.
+    Args:
+        headers (dict[str, str]): Заголовки ответа 304
+    """
+
+    def __init__(self, headers: dict[str, str]):
+        self.headers = headers
+
+
+async def not_modified_handler(request: Request, exc: NotModified) -> Response:
+    return Response(status_code=304, headers=exc.headers)
+
+
+async def check_validators(request: Request, db: AsyncSession, tables: Iterable[str], *owner) -> tuple[str, ...]:
+    """
+    Вычисляет ETag страницы из версий таблиц, текущей даты (страницы показывают "сегодня")
+    и владельца, и завершает запрос ответом 304, если валидатор клиента совпал.
+    Заголовки валидаторов сохраняются в request.state для ValidatorHeadersMiddleware.
+    Args:
+        request (Request): Текущий HTTP-запрос
+        db (AsyncSession): Сессия основной базы для чтения версий
+        tables (Iterable[str]): Имена таблиц, от которых зависит страница
+        *owner: Роль и ID пользователя для страниц, зависящих от пользователя
+    Returns:
+        tuple[str, ...]: Токены версий таблиц и текущая дата
+    Raises:
+        NotModified: Если клиенту можно ответить 304
+    """
+    today = datetime.now(DISPLAY_TZ).date()
+    versions = await table_versions.get_many(db, tables)
+    tokens = (*(version for version, _ in versions), today.isoformat())
+    midnight = DISPLAY_TZ.localize(datetime.combine(today, day_time.min)).astimezone(timezone.utc)
+    modified_at = max([midnight, *(modified_at for _, modified_at in versions)])
+    etag = make_etag(*owner, *tokens)
+    headers = {**validator_headers(etag, modified_at), "Cache-Control": "private, no-cache"}
+    if is_not_modified(request, etag, modified_at):
+        raise NotModified(headers)
+    request.state.validators = headers
+    request.state.modified_at = modified_at.timestamp()
+    return tokens
+
+
+def conditional_get(*tables: str, per_user: bool = True):
+    """
+    Зависимость для HTML-страниц: ETag собирается из версий таблиц, которые показывает страница,
+    и роли/ID пользователя (страницы учитывают область видимости). Если клиент прислал
+    совпадающий валидатор, запрос завершается ответом 304 до выполнения запросов страницы к базе.
+    Args:
+        *tables (str): Имена таблиц, от которых зависит страница
+        per_user (bool): Зависит ли страница от текущего пользователя
+    Returns:
+        Depends: Зависимость FastAPI
+    """
+    async def check(request: Request, db: AsyncSession = Depends(get_async_db),
+                    current_user: Principal = Depends(get_current_user)) -> None:
+        await check_validators(request, db, tables, current_user.role, current_user.id)
+
+    async def check_anonymous(request: Request, db: AsyncSession = Depends(get_async_db)) -> None:
+        await check_validators(request, db, tables)
+
+    return Depends(check if per_user else check_anonymous)
+
+
+class ValidatorHeadersMiddleware:
+    """
+    Добавляет к успешным ответам заголовки валидаторов, вычисленные зависимостью conditional_get.
+    Обработчики возвращают готовые Response, поэтому заголовки нельзя выставить в самой зависимости.
+    Ответ, который мог быть собран из отстающей реплики, отдаётся без валидаторов.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_validators(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                state = scope.get("state", {})
+                validators = state.get("validators")
+                if validators and not replica_may_lag(state, state["modified_at"]):
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        *((name.lower().encode(), value.encode()) for name, value in validators.items()),
+                    ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_validators)
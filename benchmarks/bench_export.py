@@ -0,0 +1,124 @@
+"""
+Бенчмарк потоковой выгрузки: строки в секунду, байты в секунду и пиковая память процесса
+для /tasks/export, /evaluations/export и /meetings/export в форматах CSV и NDJSON.
+
+Заполняет базу (по умолчанию тестовую, TEST_DB_NAME) синтетическими данными и вызывает эндпоинты
+приложения напрямую через ASGI, без сети. Схема базы пересоздаётся - не запускайте на рабочей БД.
+Пиковая память (ru_maxrss) не должна расти вместе с --tasks.
+
+Запуск:
+    python -m benchmarks.bench_export --tasks 1000000
+"""
+import argparse
+import asyncio
+import json
+import resource
+import time
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from app.auth import get_current_user, Principal
+from app.config import TEST_DATABASE_URL
+from app.database import get_async_db, get_async_read_db
+from app.main import app
+from app.models import Base
+from benchmarks.seed import SeedSize, seed
+
+
+ENDPOINTS = ["/tasks/export", "/evaluations/export", "/meetings/export"]
+
+
+def peak_rss_mb() -> float:
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+async def measure(path: str, fmt: str) -> dict:
+    """
+    Вызывает приложение как ASGI-функцию и считает байты по мере отправки:
+    тестовый транспорт httpx собирает тело ответа целиком и исказил бы замер памяти.
+    """
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "server": ("bench", 80), "client": ("127.0.0.1", 0), "root_path": "",
+        "path": path, "raw_path": path.encode(), "query_string": f"format={fmt}".encode(), "headers": [],
+    }
+    stats = {"status": None, "first_byte": None, "size": 0, "lines": 0}
+    requested, done = False, asyncio.Event()
+    started = time.perf_counter()
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            stats["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            if body and stats["first_byte"] is None:
+                stats["first_byte"] = time.perf_counter() - started
+            stats["size"] += len(body)
+            stats["lines"] += body.count(b"\n")
+            if not message.get("more_body", False):
+                done.set()
+
+    await app(scope, receive, send)
+    elapsed = time.perf_counter() - started
+    if stats["status"] != 200:
+        raise RuntimeError(f"{path}: HTTP {stats['status']}")
+
+    rows = stats["lines"] - 1 if fmt == "csv" else stats["lines"]
+    return {
+        "rows": rows,
+        "mb": round(stats["size"] / 2**20, 1),
+        "seconds": round(elapsed, 2),
+        "ttfb_ms": round((stats["first_byte"] or elapsed) * 1000, 1),
+        "rows_per_second": round(rows / elapsed),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+async def run(url: str, size: SeedSize) -> dict:
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await seed(conn, size)
+
+    session_maker = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def override_get_db():
+        async with session_maker() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = override_get_db
+    app.dependency_overrides[get_async_read_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: Principal(id=1, email="user1@bench.local", role="admin")
+
+    report = {"size": size.__dict__, "rss_before_mb": peak_rss_mb()}
+    for path in ENDPOINTS:
+        for fmt in ("csv", "ndjson"):
+            report[f"{path}?format={fmt}"] = await measure(path, fmt)
+
+    app.dependency_overrides.clear()
+    await engine.dispose()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=TEST_DATABASE_URL)
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.url, SeedSize(tasks=args.tasks, users=args.users)))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Бенчмарк подбора свободных слотов: 200 участников, окно в месяц.
+
+Заполняет базу (по умолчанию тестовую, TEST_DB_NAME) синтетическими данными и замеряет
+отдельно запрос занятости (fetch_busy) и sweep-line (free_slots): медиану и p95 по --runs запускам.
+Схема базы пересоздаётся - не запускайте на рабочей БД.
+
+Запуск:
+    python -m benchmarks.bench_free_slots --participants 200 --days 30
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import date, timedelta
+
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+from app.config import TEST_DATABASE_URL
+from app.models import Base
+from app.scheduling import fetch_busy, free_slots, working_windows
+from benchmarks.seed import SeedSize, seed
+
+
+def summary(samples: list[float]) -> dict:
+    samples = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(samples) * 1000, 2),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1] * 1000, 2),
+    }
+
+
+async def run(url: str, size: SeedSize, participants: int, days: int, runs: int, deadline_block: int | None) -> dict:
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await seed(conn, size)
+
+    start = date.today()
+    windows = working_windows(start, start + timedelta(days=days - 1), 9, 18)
+    block = timedelta(minutes=deadline_block) if deadline_block else None
+    user_ids = list(range(1, participants + 1))
+
+    query_times, sweep_times = [], []
+    async with AsyncSession(engine) as db:
+        for _ in range(runs):
+            started = time.perf_counter()
+            busy = await fetch_busy(db, user_ids, None, windows[0][0], windows[-1][1], block)
+            query_times.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            slots = free_slots(busy, windows, timedelta(minutes=60))
+            sweep_times.append(time.perf_counter() - started)
+
+    await engine.dispose()
+    return {
+        "size": size.__dict__,
+        "participants": participants,
+        "days": days,
+        "busy_intervals": len(busy),
+        "free_slots": len(slots),
+        "query": summary(query_times),
+        "sweep": summary(sweep_times),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=TEST_DATABASE_URL)
+    parser.add_argument("--participants", type=int, default=200)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--deadline-block", type=int, default=None, help="Минут до дедлайна задачи, считающихся занятыми")
+    parser.add_argument("--meetings", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    args = parser.parse_args()
+
+    size = SeedSize(users=args.users, tasks=100_000, meetings=args.meetings, evaluations=0)
+    report = asyncio.run(run(args.url, size, args.participants, args.days, args.runs, args.deadline_block))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Бенчмарк массового импорта задач: COPY через временную таблицу против создания задач по одной через ORM
+(как в POST /tasks/create: выборка пользователей, flush, комментарий, commit).
+
+Схема базы (по умолчанию тестовой, TEST_DB_NAME) пересоздаётся - не запускайте на рабочей БД.
+
+Запуск:
+    python -m benchmarks.bench_import --rows 100000 --orm-rows 2000
+"""
+import argparse
+import asyncio
+import csv
+import json
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+from app.config import TEST_DATABASE_URL
+from app.importer import import_tasks
+from app.models import Base, Task, TaskComment, User
+from benchmarks.seed import SeedSize, seed
+
+
+def write_csv(path: str, rows: int, users: int) -> None:
+    start = datetime(2030, 1, 1)
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["title", "description", "status", "deadline", "assignee_ids", "comment"])
+        for i in range(rows):
+            assignees = f"{i % users + 1};{(i * 7) % users + 1}"
+            deadline = (start + timedelta(minutes=i)).isoformat()
+            writer.writerow([f"Imported {i}", f"Description {i}", "open", deadline, assignees, f"Comment {i}"])
+
+
+async def bench_copy(engine, path: str, rows: int) -> dict:
+    started = time.perf_counter()
+    with open(path, encoding="utf-8", newline="") as source:
+        async with engine.begin() as conn:
+            report = await import_tasks(conn, source, "csv", author_id=1)
+    elapsed = time.perf_counter() - started
+    return {"rows": rows, "imported": report.imported, "errors": report.error_count,
+            "seconds": round(elapsed, 2), "rows_per_second": round(report.imported / elapsed)}
+
+
+async def bench_orm(engine, rows: int, users: int) -> dict:
+    start = datetime(2031, 1, 1)
+    started = time.perf_counter()
+    for i in range(rows):
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            user_ids = [i % users + 1, (i * 7) % users + 1]
+            assigned = (await db.execute(select(User).where(User.id.in_(user_ids)))).scalars().all()
+            task = Task(title=f"Orm {i}", description="", status="open",
+                        deadline=start + timedelta(minutes=i), users=assigned)
+            db.add(task)
+            await db.flush()
+            db.add(TaskComment(content=f"Comment {i}", task_id=task.id, user_id=1))
+            await db.commit()
+    elapsed = time.perf_counter() - started
+    return {"rows": rows, "seconds": round(elapsed, 2), "rows_per_second": round(rows / elapsed)}
+
+
+async def run(url: str, rows: int, orm_rows: int, users: int) -> dict:
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await seed(conn, SeedSize(users=users, teams=max(1, users // 20), tasks=0, meetings=0, evaluations=0))
+
+    with tempfile.NamedTemporaryFile(suffix=".csv") as file:
+        write_csv(file.name, rows, users)
+        report = {"copy": await bench_copy(engine, file.name, rows)}
+
+    if orm_rows:
+        report["orm"] = await bench_orm(engine, orm_rows, users)
+        report["speedup"] = round(report["copy"]["rows_per_second"] / report["orm"]["rows_per_second"], 1)
+
+    await engine.dispose()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=TEST_DATABASE_URL)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--orm-rows", type=int, default=2_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.url, args.rows, args.orm_rows, args.users))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Бенчмарк индексов: планы и время горячих запросов до и после создания индексов.
+
+Заполняет базу (по умолчанию тестовую, TEST_DB_NAME) ~1M задач, удаляет вторичные индексы,
+снимает EXPLAIN ANALYZE для запросов calendar.month_view, tasks.tasks_list (ветка менеджера)
+и evaluations.evaluations_list (ветки менеджера и пользователя), затем создаёт индексы
+и повторяет замеры. Схема базы пересоздаётся - не запускайте на рабочей БД.
+
+Запуск:
+    python -m benchmarks.bench_indexes --tasks 1000000
+"""
+import argparse
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncConnection
+from sqlalchemy.schema import CreateIndex, DropIndex
+
+from app.config import TEST_DATABASE_URL
+from app.models import Base, Task, Team, User, Evaluation
+from benchmarks.seed import SeedSize, seed
+
+
+async def explain(conn: AsyncConnection, stmt) -> dict:
+    """
+    Выполняет EXPLAIN (ANALYZE, FORMAT JSON) для SQLAlchemy-выражения.
+    Args:
+        conn (AsyncConnection): Соединение с базой
+        stmt: SQLAlchemy select
+    Returns:
+        dict: Корневой узел плана и время выполнения
+    """
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    result = await conn.exec_driver_sql("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + compiled.string, params)
+    return result.scalar()[0]
+
+
+def plan_nodes(node: dict) -> list[str]:
+    nodes = [f"{node['Node Type']}:{node.get('Relation Name', node.get('Index Name', ''))}".rstrip(":")]
+    for child in node.get("Plans", []):
+        nodes.extend(plan_nodes(child))
+    return nodes
+
+
+def hot_queries(manager_team_ids: list[int]) -> dict:
+    now = datetime.now(timezone.utc)
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    month_end = (month_start + timedelta(days=32)).replace(day=1)
+    return {
+        "calendar.month_view": select(Task).where(Task.deadline >= month_start, Task.deadline < month_end),
+        "tasks.tasks_list[manager]": select(Task).where(
+            Task.users.any(User.teams.any(Team.id.in_(manager_team_ids)))
+        ),
+        "evaluations.evaluations_list[manager]": select(Evaluation).where(
+            Evaluation.user.has(User.teams.any(Team.id.in_(manager_team_ids)))
+        ),
+        "evaluations.evaluations_list[user]": select(Evaluation).where(Evaluation.user_id == 42),
+    }
+
+
+async def measure(conn: AsyncConnection, queries: dict) -> dict:
+    report = {}
+    for name, stmt in queries.items():
+        plan = await explain(conn, stmt)
+        report[name] = {
+            "execution_ms": round(plan["Execution Time"], 2),
+            "total_cost": plan["Plan"]["Total Cost"],
+            "nodes": plan_nodes(plan["Plan"]),
+        }
+    return report
+
+
+async def run(url: str, size: SeedSize) -> dict:
+    engine = create_async_engine(url)
+    indexes = [index for table in Base.metadata.sorted_tables for index in table.indexes]
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        for index in indexes:
+            await conn.execute(DropIndex(index))
+        await seed(conn, size)
+
+    async with engine.connect() as conn:
+        result = await conn.execute(select(Team.id).where(Team.manager_id == 20))
+        queries = hot_queries(result.scalars().all())
+        before = await measure(conn, queries)
+
+    async with engine.begin() as conn:
+        for index in indexes:
+            await conn.execute(CreateIndex(index))
+        await conn.execute(text("ANALYZE"))
+
+    async with engine.connect() as conn:
+        after = await measure(conn, queries)
+
+    await engine.dispose()
+    return {"size": size.__dict__, "before": before, "after": after}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=TEST_DATABASE_URL)
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.url, SeedSize(tasks=args.tasks, users=args.users)))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
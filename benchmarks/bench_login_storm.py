@@ -0,0 +1,99 @@
+"""
+Бенчмарк: задержка "посторонних" запросов во время шторма логинов.
+
+Сравнивает синхронную проверку bcrypt прямо в обработчике (как было раньше)
+с проверкой через пул PasswordHasher. Во время шторма параллельно опрашивается
+лёгкий эндпоинт /ping (не меньше --pings раз и до конца шторма),
+и для него считаются p50/p99.
+
+Запуск:
+    python -m benchmarks.bench_login_storm --logins 64 --pings 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+
+from app.auth import verify_password, verify_password_async
+from app.passwords import pwd_context
+
+
+PING_INTERVAL = 0.01
+
+def build_app(hashed: str) -> FastAPI:
+    bench_app = FastAPI()
+
+    @bench_app.post("/login-sync")
+    async def login_sync():
+        return {"ok": verify_password("secret", hashed)}
+
+    @bench_app.post("/login-async")
+    async def login_async():
+        verified, _ = await verify_password_async("secret", hashed)
+        return {"ok": verified}
+
+    @bench_app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return bench_app
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(mode: str, logins: int, pings: int) -> dict:
+    hashed = pwd_context.hash("secret")
+    transport = ASGITransport(app=build_app(hashed))
+    latencies: list[float] = []
+
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        storm_done = asyncio.Event()
+
+        async def ping_loop():
+            # Запросы идут по фиксированному расписанию, и задержка считается от запланированного
+            # момента отправки: так учитывается время, когда event loop был заблокирован
+            first = time.perf_counter()
+            i = 0
+            while not storm_done.is_set() or i < pings:
+                scheduled = first + i * PING_INTERVAL
+                await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+                await client.get("/ping")
+                latencies.append((time.perf_counter() - scheduled) * 1000)
+                i += 1
+
+        async def storm():
+            await asyncio.gather(*(client.post(f"/login-{mode}") for _ in range(logins)))
+            storm_done.set()
+
+        started = time.perf_counter()
+        await asyncio.gather(ping_loop(), storm())
+        elapsed = time.perf_counter() - started
+
+    return {
+        "mode": mode,
+        "elapsed_s": round(elapsed, 2),
+        "ping_p50_ms": round(statistics.median(latencies), 2),
+        "ping_p99_ms": round(percentile(latencies, 0.99), 2),
+        "ping_max_ms": round(max(latencies), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--pings", type=int, default=200)
+    args = parser.parse_args()
+
+    for mode in ("sync", "async"):
+        print(asyncio.run(run(mode, args.logins, args.pings)))
+
+
+if __name__ == "__main__":
+    main()
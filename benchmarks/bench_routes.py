@@ -0,0 +1,285 @@
+"""
+Бенчмарк маршрутов: задержка (p50/p95/p99), SQL-запросы на запрос и пиковая память
+для эндпоинтов app/routers под разными ролями.
+
+Заполняет базу (по умолчанию тестовую, TEST_DB_NAME) детерминированными синтетическими данными
+(benchmarks.seed, с опытными пользователями во многих командах) и вызывает приложение
+через httpx.AsyncClient/ASGITransport, без сети. Схема базы пересоздаётся - не запускайте на рабочей БД.
+Число SQL-запросов берётся из заголовка Server-Timing, пиковая память - из tracemalloc
+на отдельном запросе каждого сценария. Кэш страниц и лент перед каждым запросом очищается,
+чтобы мерить рендеринг, а не попадание в кэш; --warm оставляет кэши.
+Выгрузки (/…/export) меряет benchmarks.bench_export, удаление не меряется, чтобы не менять данные.
+
+Результат пишется в JSON (--output). С --baseline результаты сравниваются с сохранённым прогоном:
+рост p95 или пиковой памяти больше чем на --tolerance либо рост числа запросов
+считается регрессией, и процесс завершается с кодом 1.
+
+Запуск:
+    python -m benchmarks.bench_routes --tasks 100000 --output bench.json
+    python -m benchmarks.bench_routes --tasks 100000 --baseline bench.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field, fields
+from datetime import date, datetime, timedelta
+from typing import Callable
+
+from httpx import AsyncClient, ASGITransport, Response
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from app.auth import get_current_user, load_principal
+from app.calendar_feed import feed_cache, feed_token
+from app.config import TEST_DATABASE_URL
+from app.database import get_async_db, get_async_read_db
+from app.main import app
+from app.models import Base, User
+from app.page_cache import page_cache
+from app.passwords import pwd_context
+from benchmarks.bench_login_storm import percentile
+from benchmarks.seed import SeedSize, seed
+
+
+BENCH_PASSWORD = "bench-password"
+# Роли сценариев: ID пользователей из benchmarks.seed (2 - опытный пользователь во многих командах)
+ROLE_USER_IDS = {"admin": 1, "manager": 20, "user": 42, "power_user": 2}
+# Рост задержки меньше этого порога не считается регрессией: на быстрых маршрутах это шум
+MIN_REGRESSION_MS = 2.0
+MIN_REGRESSION_KB = 64
+
+
+@dataclass
+class Scenario:
+    """
+    Один замеряемый запрос.
+    Attributes:
+        name (str): Имя сценария в отчёте (модуль.обработчик[роль])
+        method (str): HTTP-метод
+        path (str): Путь запроса
+        role (str | None): Роль пользователя из ROLE_USER_IDS, None - без авторизации
+        request (Callable[[int], dict]): Параметры httpx-запроса (params, data) для i-го повторения
+    """
+    name: str
+    method: str
+    path: str
+    role: str | None = "admin"
+    request: Callable[[int], dict] = field(default=lambda i: {})
+
+
+def scenarios() -> list[Scenario]:
+    today = date.today()
+    deadline = (datetime.now() + timedelta(days=7)).isoformat()
+
+    def future_hour(i: int) -> str:
+        # Встречи создаются в разные часы, чтобы не конфликтовать друг с другом
+        return (datetime(2100, 1, 1, 9) + timedelta(hours=i)).isoformat()
+
+    return [
+        Scenario("main.index", "GET", "/", None),
+        Scenario("login.login_form", "GET", "/auth/login", None),
+        Scenario("login.login", "POST", "/auth/login", None,
+                 lambda i: {"data": {"username": "user42@bench.local", "password": BENCH_PASSWORD}}),
+        Scenario("users.login", "POST", "/users/token", None,
+                 lambda i: {"data": {"username": "user42@bench.local", "password": BENCH_PASSWORD}}),
+        *(Scenario(f"tasks.tasks_list[{role}]", "GET", "/tasks/", role) for role in ROLE_USER_IDS),
+        Scenario("tasks.tasks_list[admin,filtered]", "GET", "/tasks/", "admin",
+                 lambda i: {"params": {"task_status": "open", "team_id": 1}}),
+        Scenario("tasks.task_create_form", "GET", "/tasks/create", "admin"),
+        Scenario("tasks.task_create", "POST", "/tasks/create", "admin", lambda i: {"data": {
+            "title": f"Bench task {i}", "description": "", "task_status": "open", "deadline": deadline,
+            "user_ids": [2, 42], "first_comment": "Комментарий",
+        }}),
+        Scenario("tasks.task_edit_form", "GET", "/tasks/edit/1", "admin"),
+        Scenario("tasks.task_edit", "POST", "/tasks/edit/1", "admin", lambda i: {"data": {
+            "title": f"Task 1 ({i})", "description": "", "task_status": "open", "deadline": deadline,
+            "user_ids": [2, 42],
+        }}),
+        Scenario("tasks.add_comment_form", "GET", "/tasks/comment/1", "user"),
+        Scenario("tasks.add_comment", "POST", "/tasks/comment/1", "user",
+                 lambda i: {"data": {"content": f"Bench comment {i}"}}),
+        *(Scenario(f"teams.teams_list[{role}]", "GET", "/teams/", role) for role in ROLE_USER_IDS),
+        Scenario("teams.team_create_form", "GET", "/teams/create", "admin"),
+        Scenario("teams.team_create", "POST", "/teams/create", "admin",
+                 lambda i: {"data": {"title": f"Bench team {i}", "user_ids": [2, 42]}}),
+        Scenario("teams.team_edit_form", "GET", "/teams/edit/1", "admin"),
+        *(Scenario(f"meetings.meetings_list[{role}]", "GET", "/meetings/", role) for role in ROLE_USER_IDS),
+        Scenario("meetings.meeting_free_slots", "GET", "/meetings/free-slots", "manager",
+                 lambda i: {"params": {"start": today.isoformat(), "end": (today + timedelta(days=6)).isoformat(),
+                                       "user_ids": [2, 20, 42], "team_id": 1, "deadline_block": 60}}),
+        Scenario("meetings.meeting_create_form", "GET", "/meetings/create", "admin"),
+        Scenario("meetings.meeting_create", "POST", "/meetings/create", "admin", lambda i: {"data": {
+            "title": f"Bench meeting {i}", "scheduled_at": future_hour(i), "duration": 30, "user_ids": [2, 42],
+        }}),
+        Scenario("meetings.meeting_edit_form", "GET", "/meetings/edit/1", "admin"),
+        *(Scenario(f"evaluations.evaluations_list[{role}]", "GET", "/evaluations/", role)
+          for role in ROLE_USER_IDS),
+        Scenario("evaluations.evaluation_create_form", "GET", "/evaluations/create", "admin"),
+        Scenario("evaluations.evaluation_edit_form", "GET", "/evaluations/edit/1", "admin"),
+        Scenario("calendar.day_view", "GET", f"/calendar/day/{today}", None),
+        Scenario("calendar.week_view", "GET", f"/calendar/week/{today}", None),
+        Scenario("calendar.month_view", "GET", f"/calendar/month/{today.year}/{today.month}", None),
+        Scenario("calendar.range_view", "GET", "/calendar/range", None, lambda i: {"params": {
+            "start": today.isoformat(), "end": (today + timedelta(days=14)).isoformat(),
+        }}),
+        Scenario("calendar.feed_url", "GET", "/calendar/feed", "user"),
+        Scenario("calendar.user_feed", "GET", "/calendar/feed/2.ics", None,
+                 lambda i: {"params": {"token": feed_token(2)}}),
+    ]
+
+
+def sql_queries(response: Response) -> int:
+    timing = response.headers.get("server-timing", "")
+    if 'desc="' not in timing:
+        return 0
+    return int(timing.split('desc="', 1)[1].split(" ", 1)[0])
+
+
+async def measure(client: AsyncClient, scenario: Scenario, requests: int, warmup: int, warm: bool) -> dict:
+    latencies, queries, errors = [], [], 0
+
+    async def call(i: int) -> Response:
+        if not warm:
+            page_cache.clear()
+            feed_cache.clear()
+        return await client.request(scenario.method, scenario.path, **scenario.request(i))
+
+    for i in range(warmup):
+        await call(-1 - i)
+
+    for i in range(requests):
+        started = time.perf_counter()
+        response = await call(i)
+        latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(sql_queries(response))
+        if response.status_code >= 400:
+            errors += 1
+
+    # Память меряется отдельным запросом: tracemalloc заметно замедляет выполнение
+    tracemalloc.start()
+    try:
+        await call(requests)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "queries": round(statistics.median(queries)),
+        "peak_kb": round(peak / 1024),
+    }
+
+
+async def run(url: str, size: SeedSize, requests: int, warmup: int, warm: bool, only: str | None) -> dict:
+    engine = create_async_engine(url)
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await seed(conn, size)
+        await conn.execute(update(User).where(User.id.in_(ROLE_USER_IDS.values()))
+                           .values(hashed_password=pwd_context.hash(BENCH_PASSWORD)))
+    seed_seconds = round(time.perf_counter() - started, 1)
+
+    session_maker = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_maker() as session:
+        principals = {role: await load_principal(session, User.id == user_id)
+                      for role, user_id in ROLE_USER_IDS.items()}
+
+    async def override_get_db():
+        async with session_maker() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = override_get_db
+    app.dependency_overrides[get_async_read_db] = override_get_db
+
+    results = {}
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        for scenario in scenarios():
+            if only and only not in scenario.name:
+                continue
+            if scenario.role is None:
+                app.dependency_overrides.pop(get_current_user, None)
+            else:
+                app.dependency_overrides[get_current_user] = lambda principal=principals[scenario.role]: principal
+            results[scenario.name] = await measure(client, scenario, requests, warmup, warm)
+            print(scenario.name, results[scenario.name], file=sys.stderr)
+
+    app.dependency_overrides.clear()
+    await engine.dispose()
+    return {"size": size.__dict__, "seed_seconds": seed_seconds, "warm": warm, "scenarios": results}
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Сравнивает прогон с сохранённым и возвращает описание регрессий.
+    Args:
+        report (dict): Текущий прогон
+        baseline (dict): Сохранённый прогон
+        tolerance (float): Допустимый относительный рост p95 и пиковой памяти
+    Returns:
+        list[str]: Регрессии, пустой список - регрессий нет
+    """
+    regressions = []
+    for name, current in report["scenarios"].items():
+        previous = baseline["scenarios"].get(name)
+        if previous is None:
+            continue
+        if (current["p95_ms"] > previous["p95_ms"] * (1 + tolerance)
+                and current["p95_ms"] - previous["p95_ms"] >= MIN_REGRESSION_MS):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+        if current["queries"] > previous["queries"]:
+            regressions.append(f"{name}: SQL-запросов {previous['queries']} -> {current['queries']}")
+        if (current["peak_kb"] > previous["peak_kb"] * (1 + tolerance)
+                and current["peak_kb"] - previous["peak_kb"] >= MIN_REGRESSION_KB):
+            regressions.append(f"{name}: пиковая память {previous['peak_kb']} -> {current['peak_kb']} KB")
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{name}: ошибок {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=TEST_DATABASE_URL)
+    for size_field in fields(SeedSize):
+        parser.add_argument(f"--{size_field.name.replace('_', '-')}", type=int, default=size_field.default)
+    parser.add_argument("--requests", type=int, default=50, help="Замеряемых запросов на сценарий")
+    parser.add_argument("--warmup", type=int, default=3, help="Прогревочных запросов на сценарий")
+    parser.add_argument("--warm", action="store_true", help="Не очищать кэш страниц между запросами")
+    parser.add_argument("--only", help="Только сценарии, в имени которых есть эта подстрока")
+    parser.add_argument("--output", help="Файл для результатов в JSON")
+    parser.add_argument("--baseline", help="Сохранённый прогон для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    size = SeedSize(**{size_field.name: getattr(args, size_field.name) for size_field in fields(SeedSize)})
+    report = asyncio.run(run(args.url, size, args.requests, args.warmup, args.warm, args.only))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+    else:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        if baseline["size"] != report["size"] or baseline.get("warm") != report["warm"]:
+            print("Внимание: объём данных или режим кэша отличается от сохранённого прогона", file=sys.stderr)
+        regressions = compare(report, baseline, args.tolerance)
+        for regression in regressions:
+            print("РЕГРЕССИЯ", regression, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""
+Soak-тест: как приложение деградирует под растущим числом одновременных пользователей.
+
+Заполняет базу (по умолчанию тестовую, TEST_DB_NAME) через benchmarks.seed, задаёт всем пользователям
+пароль и запускает uvicorn с --workers воркерами на этой базе. Затем ступенями увеличивает число
+виртуальных пользователей; каждый входит через /auth/login и выполняет смешанную нагрузку
+(вход, список задач, создание задачи, комментарий, календарь) с паузами около --think-ms.
+Схема базы пересоздаётся - не запускайте на рабочей БД (--no-seed использует уже заполненную).
+
+Для каждой ступени записываются пропускная способность, доля ошибок, p50/p95 задержки,
+ожидание соединения из пула и задержка event loop воркеров (из /metrics каждого воркера),
+а также задержка event loop самого генератора нагрузки: если она растёт, упирается генератор, а не сервер.
+Колено кривой - последняя ступень перед той, где прирост пропускной способности на добавленного
+пользователя упал ниже KNEE_GAIN от начального, p95 выросла больше чем в KNEE_LATENCY раз
+или доля ошибок превысила MAX_ERROR_RATE.
+
+Запуск:
+    python -m benchmarks.bench_soak --workers 2 --max-users 400 --step-users 25 --step-seconds 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field, fields
+from datetime import date, datetime, timedelta
+
+import httpx
+from sqlalchemy import update
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.config import TEST_DATABASE_URL, METRICS_TOKEN
+from app.models import Base, User
+from app.monitoring import EventLoopLagMonitor
+from app.passwords import pwd_context
+from benchmarks.bench_login_storm import percentile
+from benchmarks.seed import SeedSize, seed
+
+
+BENCH_PASSWORD = "bench-password"
+# Доли действий виртуального пользователя; создавать задачи могут только менеджеры,
+# у обычных пользователей это действие заменяется списком задач
+WORKLOAD = {"login": 0.05, "tasks_list": 0.45, "task_create": 0.1, "comment": 0.15, "calendar": 0.25}
+KNEE_GAIN = 0.25
+KNEE_LATENCY = 3.0
+MAX_ERROR_RATE = 0.01
+SCRAPES_PER_WORKER = 4
+
+
+@dataclass
+class Step:
+    """
+    Результаты одной ступени нагрузки.
+    Attributes:
+        users (int): Число виртуальных пользователей
+        latencies (list[float]): Задержки завершённых запросов в миллисекундах
+        errors (int): Запросы с ошибкой (статус 4xx/5xx или сбой соединения)
+    """
+    users: int
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+
+
+class Recorder:
+    """
+    Собирает результаты запросов в текущую ступень; запрос относится к ступени, в которой завершился.
+    """
+
+    def __init__(self):
+        self.step = Step(users=0)
+
+    async def call(self, client: httpx.AsyncClient, method: str, url: str, **kwargs) -> httpx.Response | None:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            response = None
+        self.step.latencies.append((time.perf_counter() - started) * 1000)
+        if response is None or response.status_code >= 400:
+            self.step.errors += 1
+        return response
+
+
+async def virtual_user(base_url: str, number: int, size: SeedSize, recorder: Recorder, stop: asyncio.Event,
+                       think: float) -> None:
+    rng = random.Random(number)
+    user_id = 2 + number % (size.users - 1)
+    is_manager = user_id % 20 == 0
+    credentials = {"username": f"user{user_id}@bench.local", "password": BENCH_PASSWORD}
+    actions, weights = list(WORKLOAD), list(WORKLOAD.values())
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        await recorder.call(client, "POST", "/auth/login", data=credentials)
+        while not stop.is_set():
+            action = rng.choices(actions, weights)[0]
+            if action == "login":
+                await recorder.call(client, "POST", "/auth/login", data=credentials)
+            elif action == "task_create" and is_manager:
+                deadline = (datetime.now() + timedelta(days=rng.randint(1, 60))).isoformat()
+                await recorder.call(client, "POST", "/tasks/create", data={
+                    "title": f"Soak task {number}", "description": "", "task_status": "open",
+                    "deadline": deadline, "user_ids": [user_id], "first_comment": "",
+                })
+            elif action == "comment":
+                await recorder.call(client, "POST", f"/tasks/comment/{rng.randint(1, size.tasks)}",
+                                    data={"content": f"Soak comment {number}"})
+            elif action == "calendar":
+                day = date.today() + timedelta(days=rng.randint(-30, 30))
+                await recorder.call(client, "GET", f"/calendar/week/{day}")
+            else:
+                await recorder.call(client, "GET", "/tasks/")
+            # Паузы с экспоненциальным распределением: пользователи не ходят строем
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=rng.expovariate(1 / think) if think else 0)
+            except asyncio.TimeoutError:
+                pass
+
+
+def parse_metrics(body: str) -> dict[str, float]:
+    samples = {}
+    for line in body.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+async def scrape_workers(client: httpx.AsyncClient, workers: int) -> dict[int, dict[str, float]]:
+    """
+    Собирает /metrics всех воркеров: запросы распределяются между воркерами ядром,
+    поэтому /metrics запрашивается несколько раз и ответы различаются по process_pid.
+    """
+    headers = {"Authorization": f"Bearer {METRICS_TOKEN}"} if METRICS_TOKEN else {}
+    by_pid = {}
+    for _ in range(workers * SCRAPES_PER_WORKER):
+        response = await client.get("/metrics", headers=headers)
+        samples = parse_metrics(response.text)
+        by_pid[int(samples["process_pid"])] = samples
+    return by_pid
+
+
+def histogram_delta(before: dict[int, dict], after: dict[int, dict], name: str, labels: str = "") -> dict:
+    """
+    Считает по разнице снимков среднее и p95 (верхняя граница корзины) гистограммы за ступень,
+    суммируя воркеры. Значения переводятся из секунд в миллисекунды.
+    """
+    bucket_prefix = f"{name}_bucket{{{labels},le=" if labels else f"{name}_bucket{{le="
+    suffix = f"{{{labels}}}" if labels else ""
+    buckets: dict[float, float] = {}
+    total = count = 0.0
+    for pid, samples in after.items():
+        previous = before.get(pid, {})
+        for key, value in samples.items():
+            if key.startswith(bucket_prefix):
+                le = key[len(bucket_prefix):].strip('"}')
+                bound = float("inf") if le == "+Inf" else float(le)
+                buckets[bound] = buckets.get(bound, 0) + value - previous.get(key, 0)
+        total += samples.get(f"{name}_sum{suffix}", 0) - previous.get(f"{name}_sum{suffix}", 0)
+        count += samples.get(f"{name}_count{suffix}", 0) - previous.get(f"{name}_count{suffix}", 0)
+    if not count:
+        return {"mean_ms": 0.0, "p95_ms": 0.0}
+    p95 = next(bound for bound, cumulative in sorted(buckets.items()) if cumulative >= 0.95 * count)
+    return {"mean_ms": round(total / count * 1000, 2), "p95_ms": p95 * 1000 if p95 != float("inf") else None}
+
+
+def counter_delta(before: dict[int, dict], after: dict[int, dict], key: str) -> float:
+    return sum(samples.get(key, 0) - before.get(pid, {}).get(key, 0) for pid, samples in after.items())
+
+
+def find_knee(steps: list[dict]) -> dict | None:
+    """
+    Ищет колено кривой нагрузки.
+    Args:
+        steps (list[dict]): Результаты ступеней по возрастанию числа пользователей
+    Returns:
+        dict | None: Последняя ступень до деградации и её причина, None - деградации не было
+    """
+    base = steps[0]
+    per_user = base["throughput_rps"] / base["users"]
+    for previous, step in zip(steps, steps[1:]):
+        gain = (step["throughput_rps"] - previous["throughput_rps"]) / (step["users"] - previous["users"])
+        reasons = []
+        if gain < KNEE_GAIN * per_user:
+            reasons.append(f"прирост {gain:.2f} rps на пользователя против {per_user:.2f} на первой ступени")
+        if step["p95_ms"] > KNEE_LATENCY * base["p95_ms"]:
+            reasons.append(f"p95 {step['p95_ms']} ms против {base['p95_ms']} ms на первой ступени")
+        if step["error_rate"] > MAX_ERROR_RATE:
+            reasons.append(f"доля ошибок {step['error_rate']}")
+        if reasons:
+            return {"users": previous["users"], "throughput_rps": previous["throughput_rps"],
+                    "degraded_at": step["users"], "reasons": reasons}
+    return None
+
+
+def start_server(url: str, port: int, workers: int) -> subprocess.Popen:
+    db_url = make_url(url)
+    env = {
+        **os.environ,
+        "DB_USER": db_url.username or "", "DB_PASSWORD": db_url.password or "", "DB_HOST": db_url.host or "",
+        "DB_PORT": str(db_url.port or 5432), "DB_NAME": db_url.database,
+    }
+    # Реплика для чтения отключается: нагрузка идёт на ту же базу, что заполнена сидом
+    env.pop("READ_DB_HOST", None)
+    return subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning", "--no-access-log",
+    ], env=env)
+
+
+async def wait_for_server(client: httpx.AsyncClient, server: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn завершился с кодом {server.returncode}")
+        try:
+            if (await client.get("/auth/login")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError("uvicorn не запустился")
+
+
+async def prepare_database(url: str, size: SeedSize) -> None:
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await seed(conn, size)
+        await conn.execute(update(User).values(hashed_password=pwd_context.hash(BENCH_PASSWORD)))
+    await engine.dispose()
+
+
+async def run(args: argparse.Namespace, size: SeedSize) -> dict:
+    if not args.no_seed:
+        await prepare_database(args.url, size)
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = start_server(args.url, args.port, args.workers)
+    client_lag = EventLoopLagMonitor(100)
+    recorder, stop = Recorder(), asyncio.Event()
+    users: list[asyncio.Task] = []
+    steps = []
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=30) as monitor:
+            await wait_for_server(monitor, server)
+            await client_lag.start()
+            for target in range(args.start_users, args.max_users + 1, args.step_users):
+                while len(users) < target:
+                    users.append(asyncio.create_task(
+                        virtual_user(base_url, len(users), size, recorder, stop, args.think_ms / 1000)
+                    ))
+                before = await scrape_workers(monitor, args.workers)
+                lag_sum, lag_count = client_lag.lag_ms.sum, client_lag.lag_ms.count
+                recorder.step = step = Step(users=target)
+                started = time.perf_counter()
+                await asyncio.sleep(args.step_seconds)
+                elapsed = time.perf_counter() - started
+                recorder.step = Step(users=target)
+                after = await scrape_workers(monitor, args.workers)
+
+                completed = len(step.latencies)
+                lag_count = client_lag.lag_ms.count - lag_count
+                steps.append({
+                    "users": target,
+                    "requests": completed,
+                    "throughput_rps": round(completed / elapsed, 1),
+                    "error_rate": round(step.errors / completed, 4) if completed else 1.0,
+                    "p50_ms": round(statistics.median(step.latencies), 1) if completed else None,
+                    "p95_ms": round(percentile(step.latencies, 0.95), 1) if completed else None,
+                    "pool_wait": histogram_delta(before, after, "db_pool_wait_seconds", 'pool="primary"'),
+                    "pool_timeouts": counter_delta(before, after, 'db_pool_timeouts_total{pool="primary"}'),
+                    "server_loop_lag": histogram_delta(before, after, "event_loop_lag_seconds"),
+                    "client_loop_lag_mean_ms": round((client_lag.lag_ms.sum - lag_sum) / lag_count, 2)
+                    if lag_count else 0.0,
+                    "workers_seen": len(after),
+                })
+                print(json.dumps(steps[-1], ensure_ascii=False), file=sys.stderr)
+                if completed == 0:
+                    break
+    finally:
+        stop.set()
+        await asyncio.gather(*users, return_exceptions=True)
+        await client_lag.stop()
+        server.terminate()
+        server.wait()
+
+    return {
+        "size": size.__dict__,
+        "workers": args.workers,
+        "think_ms": args.think_ms,
+        "steps": steps,
+        "knee": find_knee([step for step in steps if step["requests"]]) if steps else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=TEST_DATABASE_URL)
+    for size_field in fields(SeedSize):
+        parser.add_argument(f"--{size_field.name.replace('_', '-')}", type=int, default=size_field.default)
+    parser.add_argument("--no-seed", action="store_true", help="Не пересоздавать и не заполнять базу")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--start-users", type=int, default=10)
+    parser.add_argument("--step-users", type=int, default=20)
+    parser.add_argument("--max-users", type=int, default=300)
+    parser.add_argument("--step-seconds", type=float, default=20)
+    parser.add_argument("--think-ms", type=float, default=200, help="Средняя пауза между действиями")
+    parser.add_argument("--output", help="Файл для результатов в JSON")
+    args = parser.parse_args()
+
+    size = SeedSize(**{size_field.name: getattr(args, size_field.name) for size_field in fields(SeedSize)})
+    report = asyncio.run(run(args, size))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
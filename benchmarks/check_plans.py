@@ -0,0 +1,264 @@
+"""
+Проверка планов горячих запросов: ловит регрессии индексов до продакшена.
+
+Вызывает горячие эндпоинты через ASGI (ветки ролей tasks_list и evaluations_list, календарь за период,
+проверка конфликтов встреч, свободные слоты, authenticate_user при входе, поиск задачи и пользователя
+при создании оценки), перехватывает выполненные SELECT вместе с параметрами и снимает для каждого
+EXPLAIN (FORMAT JSON) на заполненной базе (по умолчанию тестовой, TEST_DB_NAME; схема пересоздаётся,
+--no-seed использует уже заполненную). Запросы берутся из кода обработчиков, поэтому реестр
+не расходится с тем, что реально выполняется.
+
+Проверка не проходит, если в плане есть Seq Scan по таблице больше --large-rows строк
+или оценка стоимости превышает бюджет из --budgets. --update-budgets записывает текущие стоимости
+с запасом BUDGET_HEADROOM как новые бюджеты. Бюджеты хранятся по имени сценария и хэшу
+нормализованного SQL: новый или изменённый запрос получает новый ключ и попадает в список
+запросов без бюджета, а не проверяется по бюджету соседнего. Процесс завершается с кодом 1 при нарушениях.
+
+Запуск:
+    python -m benchmarks.check_plans --tasks 1000000 --update-budgets
+    python -m benchmarks.check_plans --no-seed
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sys
+from dataclasses import fields
+from datetime import date, datetime, timedelta
+
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import event, select, update
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
+
+from app.auth import get_current_user, load_principal
+from app.config import TEST_DATABASE_URL
+from app.database import get_async_db, get_async_read_db
+from app.main import app
+from app.models import Base, Task, User, users_tasks
+from app.page_cache import page_cache
+from app.passwords import pwd_context
+from benchmarks.bench_indexes import plan_nodes
+from benchmarks.bench_routes import Scenario, ROLE_USER_IDS, BENCH_PASSWORD
+from benchmarks.seed import SeedSize, seed
+
+
+DEFAULT_BUDGETS = os.path.join(os.path.dirname(__file__), "plan_budgets.json")
+LARGE_TABLE_ROWS = 10_000
+BUDGET_HEADROOM = 1.5
+
+
+def plan_scenarios(task_title: str, user_name: str) -> list[Scenario]:
+    """
+    Реестр горячих запросов: сценарии, SELECT которых проверяются.
+    Args:
+        task_title (str): Завершённая задача для создания оценки
+        user_name (str): Назначенный на неё пользователь
+    Returns:
+        list[Scenario]: Сценарии
+    """
+    today = date.today()
+    return [
+        *(Scenario(f"tasks.tasks_list[{role}]", "GET", "/tasks/", role) for role in ROLE_USER_IDS),
+        Scenario("tasks.tasks_list[manager,filtered]", "GET", "/tasks/", "manager", lambda i: {"params": {
+            "task_status": "open", "deadline_from": today.isoformat(), "team_id": 1,
+        }}),
+        *(Scenario(f"evaluations.evaluations_list[{role}]", "GET", "/evaluations/", role)
+          for role in ROLE_USER_IDS),
+        Scenario("calendar.range_view", "GET", "/calendar/range", None, lambda i: {"params": {
+            "start": today.isoformat(), "end": (today + timedelta(days=14)).isoformat(),
+        }}),
+        Scenario("calendar.month_view", "GET", f"/calendar/month/{today.year}/{today.month}", None),
+        Scenario("meetings.find_conflict", "POST", "/meetings/create", "admin", lambda i: {"data": {
+            "title": "Plan check", "scheduled_at": datetime(2100, 1, 1, 9).isoformat(), "duration": 30,
+            "user_ids": [2, 20, 42],
+        }}),
+        Scenario("meetings.meeting_free_slots", "GET", "/meetings/free-slots", "manager", lambda i: {"params": {
+            "start": today.isoformat(), "end": (today + timedelta(days=6)).isoformat(),
+            "team_id": 1, "deadline_block": 60,
+        }}),
+        Scenario("auth.authenticate_user", "POST", "/auth/login", None,
+                 lambda i: {"data": {"username": "user42@bench.local", "password": BENCH_PASSWORD}}),
+        Scenario("evaluations.evaluation_created", "POST", "/evaluations/create", "admin", lambda i: {"data": {
+            "score": 5, "task_title": task_title, "user_name": user_name,
+        }}),
+    ]
+
+
+def query_key(scenario: str, statement: str) -> str:
+    """
+    Ключ запроса в бюджетах: имя сценария и хэш SQL без пробельных различий и значений параметров.
+    Списки IN сворачиваются, чтобы число значений в них не меняло ключ.
+    Args:
+        scenario (str): Имя сценария
+        statement (str): SQL запроса
+    Returns:
+        str: Ключ вида "сценарий@хэш"
+    """
+    sql = " ".join(statement.split())
+    sql = re.sub(r"\$\d+", "?", sql)
+    sql = re.sub(r"\(\?(::\w+)?(, \?(::\w+)?)*\)", "(?)", sql)
+    return f"{scenario}@{hashlib.sha1(sql.encode()).hexdigest()[:10]}"
+
+
+def seq_scans(node: dict) -> list[str]:
+    scans = [node["Relation Name"]] if node["Node Type"] == "Seq Scan" else []
+    for child in node.get("Plans", []):
+        scans.extend(seq_scans(child))
+    return scans
+
+
+async def table_rows(engine: AsyncEngine) -> dict[str, float]:
+    async with engine.connect() as conn:
+        result = await conn.exec_driver_sql(
+            "SELECT relname, reltuples FROM pg_class WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace"
+        )
+        return {name: rows for name, rows in result}
+
+
+async def capture(engine: AsyncEngine, scenarios: list[Scenario]) -> dict[str, tuple[str, tuple]]:
+    """
+    Выполняет сценарии и собирает их SELECT.
+    Returns:
+        dict[str, tuple[str, tuple]]: Ключ запроса (см. query_key) -> SQL и параметры
+    """
+    captured: list[tuple[str, tuple]] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            captured.append((statement, parameters))
+
+    session_maker = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_maker() as session:
+        principals = {role: await load_principal(session, User.id == user_id)
+                      for role, user_id in ROLE_USER_IDS.items()}
+
+    async def override_get_db():
+        async with session_maker() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = override_get_db
+    app.dependency_overrides[get_async_read_db] = override_get_db
+
+    queries = {}
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://plans") as client:
+            for scenario in scenarios:
+                if scenario.role is None:
+                    app.dependency_overrides.pop(get_current_user, None)
+                else:
+                    app.dependency_overrides[get_current_user] = lambda principal=principals[scenario.role]: principal
+                page_cache.clear()
+                captured.clear()
+                response = await client.request(scenario.method, scenario.path, **scenario.request(0))
+                if response.status_code >= 400:
+                    raise RuntimeError(f"{scenario.name}: HTTP {response.status_code}")
+                for statement, parameters in captured:
+                    key = query_key(scenario.name, statement)
+                    # Один и тот же запрос в сценарии (например, с другим набором ID) проверяется каждый раз
+                    name, repeat = key, 1
+                    while name in queries:
+                        repeat += 1
+                        name = f"{key}#{repeat}"
+                    queries[name] = (statement, parameters)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+        app.dependency_overrides.clear()
+    return queries
+
+
+async def check(engine: AsyncEngine, queries: dict[str, tuple[str, tuple]], budgets: dict[str, float],
+                large_rows: int) -> tuple[dict, list[str]]:
+    """
+    Снимает планы и сравнивает их с ограничениями.
+    Returns:
+        tuple[dict, list[str]]: Отчёт по запросам и список нарушений
+    """
+    rows = await table_rows(engine)
+    report, violations = {}, []
+    async with engine.connect() as conn:
+        for name, (statement, parameters) in queries.items():
+            result = await conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters)
+            plan = result.scalar()[0]["Plan"]
+            cost = plan["Total Cost"]
+            large_scans = sorted({table for table in seq_scans(plan) if rows.get(table, 0) > large_rows})
+            report[name] = {
+                "total_cost": cost,
+                "budget": budgets.get(name),
+                "nodes": plan_nodes(plan),
+                "sql": " ".join(statement.split())[:300],
+            }
+            if large_scans:
+                violations.append(f"{name}: Seq Scan по {', '.join(large_scans)}")
+            if name in budgets and cost > budgets[name]:
+                violations.append(f"{name}: стоимость {cost} больше бюджета {budgets[name]}")
+    return report, violations
+
+
+async def run(args: argparse.Namespace, size: SeedSize) -> tuple[dict, list[str]]:
+    engine = create_async_engine(args.url)
+    async with engine.begin() as conn:
+        if not args.no_seed:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+            await seed(conn, size)
+        await conn.execute(update(User).where(User.id.in_(ROLE_USER_IDS.values()))
+                           .values(hashed_password=pwd_context.hash(BENCH_PASSWORD)))
+        result = await conn.execute(
+            select(Task.title, User.name)
+            .join(users_tasks, users_tasks.c.task_id == Task.id)
+            .join(User, User.id == users_tasks.c.user_id)
+            .where(Task.status == "done")
+            .order_by(Task.id)
+            .limit(1)
+        )
+        task_title, user_name = result.one()
+
+    budgets = {}
+    if os.path.exists(args.budgets):
+        with open(args.budgets, encoding="utf-8") as file:
+            budgets = json.load(file)
+    elif not args.update_budgets:
+        print(f"Файл бюджетов {args.budgets} не найден, проверяются только Seq Scan", file=sys.stderr)
+
+    try:
+        queries = await capture(engine, plan_scenarios(task_title, user_name))
+        report, violations = await check(engine, queries, {} if args.update_budgets else budgets, args.large_rows)
+    finally:
+        await engine.dispose()
+
+    if args.update_budgets:
+        with open(args.budgets, "w", encoding="utf-8") as file:
+            json.dump({name: round(entry["total_cost"] * BUDGET_HEADROOM, 2) for name, entry in report.items()},
+                      file, indent=2, ensure_ascii=False)
+    missing = sorted(name for name in report if budgets and name not in budgets)
+    if missing and not args.update_budgets:
+        print("Нет бюджета (новые запросы):", ", ".join(missing), file=sys.stderr)
+    return report, violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=TEST_DATABASE_URL)
+    for size_field in fields(SeedSize):
+        parser.add_argument(f"--{size_field.name.replace('_', '-')}", type=int, default=size_field.default)
+    parser.add_argument("--no-seed", action="store_true", help="Не пересоздавать и не заполнять базу")
+    parser.add_argument("--budgets", default=DEFAULT_BUDGETS, help="JSON с бюджетами стоимости по запросам")
+    parser.add_argument("--update-budgets", action="store_true", help="Записать текущие стоимости как бюджеты")
+    parser.add_argument("--large-rows", type=int, default=LARGE_TABLE_ROWS,
+                        help="Таблицы больше этого числа строк нельзя читать Seq Scan")
+    args = parser.parse_args()
+
+    size = SeedSize(**{size_field.name: getattr(args, size_field.name) for size_field in fields(SeedSize)})
+    report, violations = asyncio.run(run(args, size))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    for violation in violations:
+        print("НАРУШЕНИЕ", violation, file=sys.stderr)
+    if violations:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
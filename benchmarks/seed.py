@@ -0,0 +1,114 @@
+"""
+Быстрое заполнение базы синтетическими данными средствами PostgreSQL (generate_series).
+Данные детерминированы: распределения строятся от номера строки, а не от random().
+"""
+from dataclasses import dataclass
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+
+@dataclass
+class SeedSize:
+    users: int = 10_000
+    teams: int = 500
+    tasks: int = 1_000_000
+    comments_per_task: int = 1
+    meetings: int = 50_000
+    evaluations: int = 100_000
+    power_users: int = 100
+    power_user_teams: int = 25
+
+
+SEED_SQL = [
+    # Пользователи: каждый 20-й - менеджер, первый - администратор
+    """
+    INSERT INTO users (id, name, email, hashed_password, role)
+    SELECT g, 'User ' || g, 'user' || g || '@bench.local', 'x',
+           CASE WHEN g = 1 THEN 'admin' WHEN g % 20 = 0 THEN 'manager' ELSE 'user' END
+    FROM generate_series(1, :users) AS g
+    """,
+    """
+    INSERT INTO teams (id, title, manager_id)
+    SELECT g, 'Team ' || g, ((g - 1) % (:users / 20) + 1) * 20
+    FROM generate_series(1, :teams) AS g
+    """,
+    # Каждый пользователь состоит в 1-3 командах
+    """
+    INSERT INTO users_teams (user_id, team_id)
+    SELECT DISTINCT u, ((u::bigint * k * 7919) % :teams) + 1
+    FROM generate_series(1, :users) AS u, generate_series(1, 1 + u % 3) AS k
+    """,
+    # Опытные пользователи (ID 2..power_users+1) состоят в power_user_teams командах
+    """
+    INSERT INTO users_teams (user_id, team_id)
+    SELECT u, ((u::bigint * 7919 + k * 104729) % :teams) + 1
+    FROM generate_series(2, :power_users + 1) AS u, generate_series(1, :power_user_teams) AS k
+    ON CONFLICT DO NOTHING
+    """,
+    # Дедлайны равномерно распределены на два года вокруг текущей даты
+    """
+    INSERT INTO tasks (id, title, description, status, deadline)
+    SELECT g, 'Task ' || g, 'Description ' || g,
+           (ARRAY['open', 'in_progress', 'done'])[g % 3 + 1],
+           now() - interval '365 days' + (g % 730) * interval '1 day' + (g % 1440) * interval '1 minute'
+    FROM generate_series(1, :tasks) AS g
+    """,
+    # На задачу назначены 1-2 пользователя
+    """
+    INSERT INTO users_tasks (user_id, task_id)
+    SELECT DISTINCT ((t::bigint * k * 104729) % :users) + 1, t
+    FROM generate_series(1, :tasks) AS t, generate_series(1, 1 + t % 2) AS k
+    """,
+    # Каждая десятая задача дополнительно назначена одному из опытных пользователей
+    """
+    INSERT INTO users_tasks (user_id, task_id)
+    SELECT (t / 10) % :power_users + 2, t
+    FROM generate_series(10, :tasks, 10) AS t
+    WHERE :power_users > 0
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    INSERT INTO task_comments (content, created_at, task_id, user_id)
+    SELECT 'Comment ' || t || '/' || k, now(), t, ((t::bigint * 31 + k) % :users) + 1
+    FROM generate_series(1, :tasks) AS t, generate_series(1, :comments_per_task) AS k
+    """,
+    """
+    INSERT INTO meetings (id, title, scheduled_at, ends_at)
+    SELECT g, 'Meeting ' || g, at, at + interval '30 minutes'
+    FROM generate_series(1, :meetings) AS g,
+         LATERAL (SELECT date_trunc('hour', now()) - interval '180 days' + (g % 4320) * interval '1 hour' AS at) AS t
+    """,
+    # Участник, уже занятый в это время, пропускается (ограничение ex_users_meetings_no_overlap)
+    """
+    INSERT INTO users_meetings (user_id, meeting_id)
+    SELECT DISTINCT ((m::bigint * k * 7907) % :users) + 1, m
+    FROM generate_series(1, :meetings) AS m, generate_series(1, 2 + m % 5) AS k
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    INSERT INTO evaluations (score, created_at, task_id, user_id, evaluator_id)
+    SELECT (g % 5) + 1, now(), ut.task_id, ut.user_id, 1
+    FROM (SELECT task_id, user_id, row_number() OVER (ORDER BY task_id, user_id) AS g
+          FROM users_tasks ORDER BY task_id, user_id LIMIT :evaluations) AS ut
+    """,
+]
+
+SEQUENCES = ["users", "teams", "tasks", "task_comments", "meetings", "evaluations"]
+
+
+async def seed(conn: AsyncConnection, size: SeedSize) -> None:
+    """
+    Заполняет пустую схему синтетическими данными и обновляет статистику планировщика.
+    Args:
+        conn (AsyncConnection): Соединение с базой
+        size (SeedSize): Объёмы данных
+    """
+    params = size.__dict__
+    for statement in SEED_SQL:
+        await conn.execute(text(statement), params)
+    for table in SEQUENCES:
+        await conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT coalesce(max(id), 1) FROM {table}))"
+        ))
+    await conn.execute(text("ANALYZE"))
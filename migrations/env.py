@@ -33,6 +33,13 @@ target_metadata = Base.metadata
 config.set_main_option("sqlalchemy.url", app_config.DATABASE_URL)
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    """Skip columns that exist only in raw DDL (see models.DDL_ONLY_COLUMNS)."""
+    if type_ == "column" and reflected and compare_to is None:
+        return (object.table.name, name) not in models.DDL_ONLY_COLUMNS
+    return True
+
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
 
@@ -49,6 +56,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -58,7 +66,7 @@ def run_migrations_offline() -> None:
 
 
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object)
 
     with context.begin_transaction():
         context.run_migrations()
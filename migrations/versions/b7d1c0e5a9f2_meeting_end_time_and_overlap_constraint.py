@@ -0,0 +1,90 @@
+"""Meeting end time and overlap constraint
+
+Revision ID: b7d1c0e5a9f2
+Revises: fe66e91923f8
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d1c0e5a9f2'
+down_revision: Union[str, Sequence[str], None] = 'fe66e91923f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('meetings', sa.Column('ends_at', sa.DateTime(timezone=True), nullable=True))
+    # Старые встречи длились "до следующей": час, но не дольше начала ближайшей встречи общего участника.
+    # Встречи общего участника с одинаковым временем начала нужно развести вручную до миграции
+    op.execute("""
+        UPDATE meetings m SET ends_at = LEAST(
+            m.scheduled_at + interval '1 hour',
+            coalesce((
+                SELECT min(other.scheduled_at)
+                FROM users_meetings a
+                JOIN users_meetings b ON b.user_id = a.user_id
+                JOIN meetings other ON other.id = b.meeting_id
+                WHERE a.meeting_id = m.id AND other.scheduled_at > m.scheduled_at
+            ), 'infinity')
+        )
+    """)
+    op.alter_column('meetings', 'ends_at', nullable=False)
+    op.create_check_constraint('ck_meetings_ends_after_start', 'meetings', 'ends_at > scheduled_at')
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    op.add_column('users_meetings', sa.Column('period', postgresql.TSTZRANGE(), nullable=True))
+    op.execute("""
+        UPDATE users_meetings um SET period = tstzrange(m.scheduled_at, m.ends_at)
+        FROM meetings m WHERE m.id = um.meeting_id
+    """)
+    op.alter_column('users_meetings', 'period', nullable=False)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION users_meetings_set_period() RETURNS trigger AS $$
+        BEGIN
+            SELECT tstzrange(scheduled_at, ends_at) INTO NEW.period FROM meetings WHERE id = NEW.meeting_id;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER users_meetings_set_period BEFORE INSERT OR UPDATE OF meeting_id ON users_meetings
+        FOR EACH ROW EXECUTE FUNCTION users_meetings_set_period()
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION meetings_sync_period() RETURNS trigger AS $$
+        BEGIN
+            UPDATE users_meetings SET period = tstzrange(NEW.scheduled_at, NEW.ends_at) WHERE meeting_id = NEW.id;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER meetings_sync_period AFTER UPDATE OF scheduled_at, ends_at ON meetings
+        FOR EACH ROW EXECUTE FUNCTION meetings_sync_period()
+    """)
+    # GiST-индекс ограничения обслуживает и проверку при вставке, и поиск занятости участника по времени
+    op.execute("""
+        ALTER TABLE users_meetings ADD CONSTRAINT ex_users_meetings_no_overlap
+        EXCLUDE USING gist (user_id WITH =, period WITH &&)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE users_meetings DROP CONSTRAINT ex_users_meetings_no_overlap")
+    op.execute("DROP TRIGGER meetings_sync_period ON meetings")
+    op.execute("DROP TRIGGER users_meetings_set_period ON users_meetings")
+    op.execute("DROP FUNCTION meetings_sync_period()")
+    op.execute("DROP FUNCTION users_meetings_set_period()")
+    op.drop_column('users_meetings', 'period')
+    op.drop_constraint('ck_meetings_ends_after_start', 'meetings', type_='check')
+    op.drop_column('meetings', 'ends_at')
@@ -0,0 +1,40 @@
+"""Data versions
+
+Revision ID: d8f1a6c3e2b9
+Revises: c4e2f81a7d3b
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8f1a6c3e2b9'
+down_revision: Union[str, Sequence[str], None] = 'c4e2f81a7d3b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'data_versions',
+        sa.Column('registry', sa.String(length=16), nullable=False),
+        sa.Column('key', sa.String(length=64), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.Column('modified_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('registry', 'key'),
+    )
+    # Эпохи реестров: данные, изменённые до миграции, считаются изменёнными в момент миграции
+    op.execute("""
+        INSERT INTO data_versions (registry, key, version, modified_at)
+        VALUES ('feeds', '*', 0, now()), ('tables', '*', 0, now())
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('data_versions')
@@ -0,0 +1,53 @@
+"""Performance indexes
+
+Revision ID: fe66e91923f8
+Revises: 3a8e7472f5e9
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fe66e91923f8'
+down_revision: Union[str, Sequence[str], None] = '3a8e7472f5e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (имя индекса, таблица, колонки)
+INDEXES = [
+    ('ix_tasks_deadline', 'tasks', ['deadline']),
+    ('ix_tasks_title', 'tasks', ['title']),
+    ('ix_meetings_scheduled_at', 'meetings', ['scheduled_at']),
+    ('ix_teams_manager_id', 'teams', ['manager_id']),
+    ('ix_users_name', 'users', ['name']),
+    ('ix_evaluations_user_id', 'evaluations', ['user_id']),
+    ('ix_evaluations_task_id', 'evaluations', ['task_id']),
+    ('ix_evaluations_evaluator_id', 'evaluations', ['evaluator_id']),
+    ('ix_task_comments_task_id', 'task_comments', ['task_id']),
+    ('ix_task_comments_user_id', 'task_comments', ['user_id']),
+    # Первичные ключи связующих таблиц начинаются с user_id, обратная сторона нужна для join'ов
+    ('ix_users_tasks_task_id_user_id', 'users_tasks', ['task_id', 'user_id']),
+    ('ix_users_teams_team_id_user_id', 'users_teams', ['team_id', 'user_id']),
+    ('ix_users_meetings_meeting_id_user_id', 'users_meetings', ['meeting_id', 'user_id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY не может выполняться внутри транзакции,
+    # зато не блокирует запись в таблицы и позволяет применять миграцию на работающей базе
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
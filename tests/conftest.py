@@ -1,15 +1,18 @@
 import pytest_asyncio
+import pytest
 import asyncio
 import sys
 import uuid
 from httpx import AsyncClient, ASGITransport
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.pool import NullPool
 
-from app.database import get_async_db
+from app.database import get_async_db, get_async_read_db
 from app.models import Base, User
 from app.main import app
 from app.config import TEST_DATABASE_URL
+from app.versions import table_versions
 
 
 if sys.platform.startswith("win"):
@@ -32,6 +35,23 @@ async def prepare_database():
         await conn.run_sync(Base.metadata.drop_all)
 
 
+@pytest.fixture
+def query_counter():
+    """
+    Фикстура считает SQL-запросы, выполненные к тестовой БД за время теста.
+    Returns:
+        list[str]: Список выполненных SQL-выражений
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine_test.sync_engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(engine_test.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
 @pytest_asyncio.fixture
 async def session() -> AsyncSession:
     """
@@ -45,14 +65,23 @@ async def session() -> AsyncSession:
 async def client(session: AsyncSession):
     """
     Асинхронный HTTP клиент для тестирования FastAPI.
-    Подменяет зависимость get_async_db на тестовую сессию.
+    Подменяет зависимости get_async_db и get_async_read_db на тестовую сессию.
     После завершения теста сбрасывает переопределения зависимостей.
     """
     async def override_get_db():
+        # Обработчик может получить сессию дважды: для чтения и для записи
+        if session.in_transaction():
+            yield session
+            return
         async with session.begin():
             yield session
 
     app.dependency_overrides[get_async_db] = override_get_db
+    app.dependency_overrides[get_async_read_db] = override_get_db
+    # Тесты пишут в базу и в обход роутеров - версии страниц и кэш начинаются заново
+    async with async_session_test() as versions_session:
+        await table_versions.bump_all(versions_session)
+        await versions_session.commit()
 
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
         yield ac
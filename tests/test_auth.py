@@ -0,0 +1,186 @@
+import asyncio
+import json
+import uuid
+import pytest
+from httpx import AsyncClient
+
+from app.auth import (create_access_token, get_current_user, invalidate_principal, principal_cache, Principal,
+                      hash_password_async, verify_password_async, token_claims, token_is_admin)
+from app.config import BCRYPT_ROUNDS
+from app.cache import TTLCache
+from app.loaders import load_options
+from app.models import Team, User
+from app.passwords import pwd_context
+from app.invalidation import InvalidationBus, invalidation_bus
+
+
+@pytest.mark.asyncio
+async def test_principal_from_claims(session, normal_user, query_counter):
+    """
+    Тест сборки Principal из claims токена.
+    Проверяет, что при совпадении версии claims команды берутся из токена (один запрос к базе),
+    а пользователь кэшируется по ID.
+    """
+    principal_cache.clear()
+    token = create_access_token({"sub": normal_user.email, "id": normal_user.id, "role": "user",
+                                 "teams": [7], "ver": 0})
+
+    principal = await get_current_user(token=token, db=session)
+    assert principal == Principal(id=normal_user.id, email=normal_user.email, role="user", team_ids=frozenset({7}))
+    assert principal_cache.get(normal_user.id) is principal
+    assert len(query_counter) == 1
+
+
+@pytest.mark.asyncio
+async def test_principal_reloaded_after_invalidation(session, normal_user):
+    """
+    Тест инвалидации Principal.
+    Проверяет, что после инвалидации claims старого токена игнорируются
+    и данные пользователя загружаются из базы.
+    """
+    principal_cache.clear()
+    token = create_access_token({"sub": normal_user.email, "id": normal_user.id, "role": "admin", "teams": [7]})
+
+    invalidate_principal(normal_user.id)
+    principal = await get_current_user(token=token, db=session)
+    assert principal.role == "user"
+    assert principal.team_ids == frozenset()
+
+
+@pytest.mark.asyncio
+async def test_claims_revoked_after_demotion(session):
+    """
+    Тест отзыва claims после понижения роли и смены команд.
+    Проверяет, что старый токен не считается токеном администратора даже после потери
+    in-process кэша (перезапуск воркера): версия claims хранится в базе.
+    """
+    admin = User(name="Demoted Admin", email=f"demoted_{uuid.uuid4().hex}@example.com",
+                 hashed_password="hashed", role="admin")
+    team = Team(title="Demoted Team", users=[admin])
+    async with session.begin():
+        session.add(team)
+    async with session.begin():
+        admin = await session.get(User, admin.id, options=load_options("user_teams"), populate_existing=True)
+        token = create_access_token(token_claims(admin))
+
+    principal_cache.clear()
+    async with session.begin():
+        assert await token_is_admin(token, session)
+        admin.role = "user"
+    principal_cache.clear()
+    async with session.begin():
+        assert not await token_is_admin(token, session)
+        principal = await get_current_user(token=token, db=session)
+        assert principal.role == "user"
+
+        user = await session.get(User, admin.id, options=load_options("user_teams"), populate_existing=True)
+        token = create_access_token(token_claims(user))
+        team = await session.get(Team, team.id, options=load_options("team_row"), populate_existing=True)
+        team.users = []
+    principal_cache.clear()
+    async with session.begin():
+        principal = await get_current_user(token=token, db=session)
+        assert principal.team_ids == frozenset()
+
+
+@pytest.mark.asyncio
+async def test_invalid_token(client: AsyncClient):
+    """
+    Тест запроса с некорректным токеном.
+    Проверяет, что возвращается статус 401.
+    """
+    client.cookies.set("access_token", "broken")
+    response = await client.get("/tasks/")
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_password_hash_async():
+    """
+    Тест хэширования и проверки пароля в пуле воркеров.
+    Проверяет, что верный пароль проходит проверку, а неверный - нет.
+    """
+    hashed = await hash_password_async("secret")
+    assert await verify_password_async("secret", hashed) == (True, None)
+    assert await verify_password_async("wrong", hashed) == (False, None)
+
+
+@pytest.mark.asyncio
+async def test_password_rehash_on_cost_change():
+    """
+    Тест прозрачного перехэширования пароля.
+    Проверяет, что для хэша с устаревшей стоимостью bcrypt возвращается новый хэш.
+    """
+    # Минимальная стоимость bcrypt - 4, поэтому при BCRYPT_ROUNDS=4 "устаревшая" стоимость выше текущей
+    old_rounds = BCRYPT_ROUNDS - 1 if BCRYPT_ROUNDS > 4 else BCRYPT_ROUNDS + 1
+    old_hash = pwd_context.handler("bcrypt").using(rounds=old_rounds).hash("secret")
+
+    verified, new_hash = await verify_password_async("secret", old_hash)
+    assert verified
+    assert new_hash and new_hash != old_hash
+    assert pwd_context.verify("secret", new_hash)
+
+
+@pytest.mark.asyncio
+async def test_remote_principal_invalidation(session, normal_user):
+    """
+    Тест применения изменений другого воркера из шины инвалидации.
+    Проверяет, что закэшированный Principal сбрасывается, а свои сообщения игнорируются.
+    """
+    principal_cache.set(normal_user.id, Principal(id=normal_user.id, email=normal_user.email, role="admin"))
+    token = create_access_token({"sub": normal_user.email, "id": normal_user.id, "role": "admin", "teams": [7]})
+
+    invalidation_bus.apply({"origin": invalidation_bus.origin, "changes": {"principals": [normal_user.id]}})
+    principal = await get_current_user(token=token, db=session)
+    assert principal.role == "admin"
+
+    invalidation_bus.apply({"origin": "other-worker", "changes": {"principals": [normal_user.id]}})
+    assert principal_cache.get(normal_user.id) is None
+    principal = await get_current_user(token=token, db=session)
+    assert principal.role == "user"
+
+
+@pytest.mark.asyncio
+async def test_invalidation_bus_coalesces_notifications():
+    """
+    Тест пакетной отправки изменений.
+    Проверяет, что публикации за окно накопления уходят одним NOTIFY с объединёнными ключами,
+    а слишком длинный список ключей заменяется сбросом всего вида изменений.
+    """
+    class Connection:
+        def __init__(self):
+            self.payloads = []
+
+        async def execute(self, query, channel, payload):
+            self.payloads.append(json.loads(payload))
+
+    bus = InvalidationBus("test", flush_ms=1)
+    bus._supervisor = asyncio.current_task()
+    bus._connection = connection = Connection()
+
+    bus.publish("tables", ["tasks", "users_tasks"])
+    bus.publish("tables", ["tasks"])
+    bus.publish("feeds", [1, 2])
+    bus.publish("feeds", [2, 3])
+    await bus._flusher
+    assert connection.payloads == [{"origin": bus.origin, "changes": {"tables": ["tasks", "users_tasks"], "feeds": [1, 2, 3]}}]
+
+    bus.publish("feeds", range(5000))
+    await bus._flusher
+    assert connection.payloads[-1]["changes"] == {"feeds": None}
+
+
+def test_cache_contains_keeps_stats():
+    """
+    Тест проверки наличия ключа в TTLCache.
+    Проверяет, что оператор in учитывает срок жизни записи, но не меняет счётчики попаданий и промахов.
+    """
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("alive", 1)
+    expired = TTLCache(maxsize=2, ttl=-1)
+    expired.set("expired", 2)
+
+    assert "alive" in cache
+    assert "missing" not in cache
+    assert "expired" not in expired
+    assert (cache.hits, cache.misses, expired.hits, expired.misses) == (0, 0, 0, 0)
@@ -0,0 +1,95 @@
+import uuid
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.models import Base
+from benchmarks.seed import SeedSize, seed
+
+
+TINY_SEED = SeedSize(users=40, teams=3, tasks=50, comments_per_task=2, meetings=10, evaluations=20,
+                     power_users=3, power_user_teams=2)
+
+# Содержимое таблиц без ID из последовательностей; время - относительно now() транзакции заполнения
+SEED_SNAPSHOT = {
+    "users": "SELECT id, name, email, role FROM users ORDER BY id",
+    "teams": "SELECT id, title, manager_id FROM teams ORDER BY id",
+    "users_teams": "SELECT user_id, team_id FROM users_teams ORDER BY user_id, team_id",
+    "tasks": "SELECT id, title, status, deadline - now() FROM tasks ORDER BY id",
+    "users_tasks": "SELECT user_id, task_id FROM users_tasks ORDER BY user_id, task_id",
+    "task_comments": "SELECT task_id, user_id, content FROM task_comments ORDER BY task_id, content",
+    "meetings": "SELECT id, title, scheduled_at - date_trunc('hour', now()), ends_at - scheduled_at "
+                "FROM meetings ORDER BY id",
+    "users_meetings": "SELECT user_id, meeting_id FROM users_meetings ORDER BY user_id, meeting_id",
+    "evaluations": "SELECT task_id, user_id, score, evaluator_id FROM evaluations ORDER BY task_id, user_id",
+}
+
+
+def expected_counts(size: SeedSize) -> dict[str, int]:
+    """
+    Число строк, которое должен дать seed: те же формулы, что в SEED_SQL.
+    Встречи небольшого набора идут в разные часы, поэтому пересечения участников не отбрасывают строк.
+    Args:
+        size (SeedSize): Объёмы данных
+    Returns:
+        dict[str, int]: Число строк по таблицам
+    """
+    users_teams = {(u, (u * k * 7919) % size.teams + 1)
+                   for u in range(1, size.users + 1) for k in range(1, 2 + u % 3)}
+    users_teams |= {(u, (u * 7919 + k * 104729) % size.teams + 1)
+                    for u in range(2, size.power_users + 2) for k in range(1, size.power_user_teams + 1)}
+    users_tasks = {((t * k * 104729) % size.users + 1, t)
+                   for t in range(1, size.tasks + 1) for k in range(1, 2 + t % 2)}
+    users_tasks |= {((t // 10) % size.power_users + 2, t) for t in range(10, size.tasks + 1, 10)}
+    users_meetings = {((m * k * 7907) % size.users + 1, m)
+                      for m in range(1, size.meetings + 1) for k in range(1, 3 + m % 5)}
+    return {
+        "users": size.users,
+        "teams": size.teams,
+        "users_teams": len(users_teams),
+        "tasks": size.tasks,
+        "users_tasks": len(users_tasks),
+        "task_comments": size.tasks * size.comments_per_task,
+        "meetings": size.meetings,
+        "users_meetings": len(users_meetings),
+        "evaluations": min(size.evaluations, len(users_tasks)),
+    }
+
+
+async def seed_snapshot(engine: AsyncEngine, size: SeedSize) -> dict[str, list]:
+    """
+    Заполняет пустую схему в отдельной транзакции и возвращает содержимое таблиц.
+    Тестовая база уже содержит данные тестов, поэтому схема создаётся во временной схеме PostgreSQL
+    (первой в search_path) и удаляется откатом транзакции.
+    Args:
+        engine (AsyncEngine): Движок тестовой базы
+        size (SeedSize): Объёмы данных
+    Returns:
+        dict[str, list]: Строки таблиц по SEED_SNAPSHOT
+    """
+    schema = f"seed_{uuid.uuid4().hex[:8]}"
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        try:
+            await conn.execute(text(f"CREATE SCHEMA {schema}"))
+            await conn.execute(text(f"SET LOCAL search_path TO {schema}, public"))
+            # Таблицы public видны через search_path, поэтому проверка существования их бы пропустила
+            await conn.run_sync(Base.metadata.create_all, checkfirst=False)
+            await seed(conn, size)
+            return {table: (await conn.execute(text(query))).all() for table, query in SEED_SNAPSHOT.items()}
+        finally:
+            await transaction.rollback()
+
+
+@pytest.mark.asyncio
+async def test_seed_row_counts_and_determinism(session):
+    """
+    Тест заполнения базы для бенчмарков.
+    Проверяет на маленьком наборе, что seed создаёт ожидаемое число строк,
+    а два заполнения дают одинаковые данные.
+    """
+    first = await seed_snapshot(session.bind, TINY_SEED)
+    assert {table: len(rows) for table, rows in first.items()} == expected_counts(TINY_SEED)
+
+    second = await seed_snapshot(session.bind, TINY_SEED)
+    assert second == first
@@ -1,9 +1,10 @@
 import pytest
 from httpx import AsyncClient
-from datetime import datetime
+from datetime import timedelta
 
 from app.main import app
 from app.auth import get_current_user
+from app.config import moscow_now
 
 
 @pytest.mark.asyncio
@@ -15,8 +16,9 @@ async def test_day_view(client: AsyncClient, admin_user, normal_user):
     """
     app.dependency_overrides[get_current_user] = lambda: admin_user
 
-    today = datetime.now().date()
-    deadline = datetime.now().isoformat()
+    now = moscow_now()
+    today = now.date()
+    deadline = now.isoformat()
     await client.post("/tasks/create", data={
         "title": "Task Today",
         "description": "",
@@ -49,7 +51,7 @@ async def test_month_view(client: AsyncClient, admin_user, normal_user):
     """
     app.dependency_overrides[get_current_user] = lambda: admin_user
 
-    today = datetime.now()
+    today = moscow_now()
     deadline = today.isoformat()
     await client.post("/tasks/create", data={
         "title": "Task Month",
@@ -72,3 +74,102 @@ async def test_month_view(client: AsyncClient, admin_user, normal_user):
     assert "Meeting Month" in response.text
 
     app.dependency_overrides.clear()
+
+
+
+@pytest.mark.asyncio
+async def test_week_and_range_view(client: AsyncClient, admin_user, normal_user):
+    """
+    Тест для отображения календаря за неделю и за произвольный период.
+    Проверяет, что встреча попадает в неделю и период, которые её содержат,
+    и не попадает в период, который её не содержит.
+    """
+    app.dependency_overrides[get_current_user] = lambda: admin_user
+
+    scheduled_at = moscow_now() + timedelta(days=10)
+    await client.post("/meetings/create", data={
+        "title": "Meeting Range",
+        "scheduled_at": scheduled_at.isoformat(),
+        "user_ids": [normal_user.id]
+    })
+
+    day = scheduled_at.date()
+    response = await client.get(f"/calendar/week/{day}")
+    assert response.status_code == 200
+    assert "Meeting Range" in response.text
+
+    response = await client.get("/calendar/range", params={"start": day, "end": day})
+    assert "Meeting Range" in response.text
+
+    response = await client.get("/calendar/range", params={"start": day + timedelta(days=1), "end": day + timedelta(days=3)})
+    assert response.status_code == 200
+    assert "Meeting Range" not in response.text
+
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_day_boundary_in_display_timezone(client: AsyncClient, admin_user):
+    """
+    Тест границы дня в часовом поясе отображения.
+    Проверяет, что задача на 23:30 по Москве (20:30 UTC) относится к своему московскому дню,
+    а задача на 00:30 следующего дня по Москве (21:30 UTC предыдущих суток) - к следующему.
+    """
+    app.dependency_overrides[get_current_user] = lambda: admin_user
+
+    for title, deadline in (("Late Task", "2030-01-15T23:30:00+03:00"), ("Early Task", "2030-01-16T00:30:00+03:00")):
+        await client.post("/tasks/create", data={
+            "title": title,
+            "description": "",
+            "task_status": "open",
+            "deadline": deadline,
+            "user_ids": [admin_user.id],
+            "first_comment": ""
+        })
+
+    response = await client.get("/calendar/day/2030-01-15")
+    assert "Late Task" in response.text
+    assert "Early Task" not in response.text
+
+    response = await client.get("/calendar/day/2030-01-16")
+    assert "Early Task" in response.text
+    assert "Late Task" not in response.text
+
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_user_feed(client: AsyncClient, admin_user, normal_user):
+    """
+    Тест календарной ленты .ics.
+    Проверяет, что лента содержит задачи пользователя, повторный запрос с ETag
+    получает 304, а ссылка с неверной подписью - 404.
+    """
+    app.dependency_overrides[get_current_user] = lambda: normal_user
+    response = await client.get("/calendar/feed")
+    assert response.status_code == 200
+    url = response.json()["url"]
+
+    app.dependency_overrides[get_current_user] = lambda: admin_user
+    await client.post("/tasks/create", data={
+        "title": "Task Feed",
+        "description": "",
+        "task_status": "open",
+        "deadline": moscow_now().isoformat(),
+        "user_ids": [normal_user.id],
+        "first_comment": ""
+    })
+    del app.dependency_overrides[get_current_user]
+
+    response = await client.get(url)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/calendar")
+    assert "BEGIN:VCALENDAR" in response.text
+    assert "SUMMARY:Дедлайн: Task Feed" in response.text
+    etag = response.headers["etag"]
+
+    response = await client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    response = await client.get(url.replace("token=", "token=x"))
+    assert response.status_code == 404
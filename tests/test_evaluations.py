@@ -1,4 +1,5 @@
 import pytest
+from datetime import datetime, timedelta
 from httpx import AsyncClient
 
 from app.main import app
@@ -50,4 +51,43 @@ async def test_evaluation_create_form_forbidden(client, normal_user):
     assert response.status_code == 403
     assert "User не может ставить оценки" in response.text
 
-    app.dependency_overrides.clear()
\ No newline at end of file
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_evaluation_create_post(client, admin_user):
+    """
+    Тест создания оценки администратором.
+    Проверяет, что оценка за завершённую задачу сохраняется и на странице
+    подтверждения видны задача, оцениваемый и оценивающий.
+    """
+    app.dependency_overrides[get_current_user] = lambda: admin_user
+
+    response = await client.post(
+        "/users/register",
+        json={"name": "Evaluated User", "email": "evaluated@example.com", "password": "123456"}
+    )
+    evaluated_id = response.json()["id"]
+
+    deadline = (datetime.now() + timedelta(days=1)).isoformat()
+    await client.post(
+        "/tasks/create",
+        data={
+            "title": "EvaluatedTask",
+            "description": "",
+            "task_status": "done",
+            "deadline": deadline,
+            "user_ids": [evaluated_id],
+            "first_comment": ""
+        }
+    )
+
+    response = await client.post(
+        "/evaluations/create",
+        data={"score": 5, "task_title": "EvaluatedTask", "user_name": "Evaluated User"}
+    )
+    assert response.status_code == 200
+    assert "EvaluatedTask" in response.text
+    assert admin_user.name in response.text
+
+    app.dependency_overrides.clear()
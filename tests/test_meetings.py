@@ -1,8 +1,15 @@
 import pytest
 from httpx import AsyncClient
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
+from sqladmin._queries import Query
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from starlette.requests import Request
 from app.main import app
+from app.admin import MeetingAdmin
 from app.auth import get_current_user
+from app.models import Meeting, User
+from app.versions import feed_versions
+from app.scheduling import free_slots
 
 
 @pytest.mark.asyncio
@@ -131,3 +138,135 @@ async def test_meeting_delete(client, admin_user):
     assert response.status_code == 200
 
     app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_meetings_list_stream(client: AsyncClient):
+    """
+    Тест потокового вывода списка встреч.
+    Проверяет, что GET-запрос на /meetings/?stream=1 возвращает полную HTML-страницу.
+    """
+    response = await client.get("/meetings/", params={"stream": 1})
+    assert response.status_code == 200
+    assert "<html" in response.text
+    assert response.text.rstrip().endswith("</html>")
+
+
+@pytest.mark.asyncio
+async def test_meetings_export(client: AsyncClient):
+    """
+    Тест выгрузки встреч в NDJSON.
+    Проверяет, что каждая строка ответа - отдельный JSON-объект.
+    """
+    response = await client.get("/meetings/export", params={"format": "ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert all(line.startswith("{") for line in response.text.splitlines())
+
+
+@pytest.mark.asyncio
+async def test_meeting_overlap_conflict(client, admin_user):
+    """
+    Тест проверки пересечения встреч с учётом длительности.
+    Проверяет, что встреча, начинающаяся во время другой встречи участника, отклоняется,
+    а встреча сразу после её окончания создаётся.
+    """
+    app.dependency_overrides[get_current_user] = lambda: admin_user
+
+    start = datetime(2095, 3, 1, 10, 0)
+    response = await client.post(
+        "/meetings/create",
+        data={"title": "Long Meeting", "scheduled_at": start.isoformat(), "duration": 90,
+              "user_ids": [admin_user.id]}
+    )
+    assert response.status_code == 200
+
+    response = await client.post(
+        "/meetings/create",
+        data={"title": "Overlapping", "scheduled_at": (start + timedelta(minutes=60)).isoformat(),
+              "duration": 30, "user_ids": [admin_user.id]}
+    )
+    assert response.status_code == 400
+    assert "Long Meeting" in response.text
+
+    response = await client.post(
+        "/meetings/create",
+        data={"title": "Back To Back", "scheduled_at": (start + timedelta(minutes=90)).isoformat(),
+              "duration": 30, "user_ids": [admin_user.id]}
+    )
+    assert response.status_code == 200
+
+    app.dependency_overrides.clear()
+
+
+def test_free_slots_sweep():
+    """
+    Тест поиска свободных слотов по занятым интервалам.
+    Проверяет объединение пересекающихся интервалов и отбрасывание слишком коротких промежутков.
+    """
+    day = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    windows = [(day.replace(hour=9), day.replace(hour=18))]
+    busy = [
+        (day.replace(hour=10), day.replace(hour=11)),
+        (day.replace(hour=10, minute=30), day.replace(hour=12)),
+        (day.replace(hour=12, minute=20), day.replace(hour=13)),
+    ]
+
+    slots = free_slots(busy, windows, timedelta(minutes=30))
+    assert slots == [
+        (day.replace(hour=9), day.replace(hour=10)),
+        (day.replace(hour=13), day.replace(hour=18)),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_meeting_free_slots(client, admin_user):
+    """
+    Тест эндпоинта свободных слотов.
+    Проверяет, что время существующей встречи участника не попадает в свободные слоты.
+    """
+    app.dependency_overrides[get_current_user] = lambda: admin_user
+
+    day = date(2094, 5, 10)
+    await client.post(
+        "/meetings/create",
+        data={"title": "Busy Meeting", "scheduled_at": f"{day}T07:00:00+00:00", "duration": 120,
+              "user_ids": [admin_user.id]}
+    )
+    response = await client.get(
+        "/meetings/free-slots",
+        params={"start": str(day), "end": str(day), "user_ids": [admin_user.id], "duration": 60}
+    )
+    assert response.status_code == 200
+    slots = [(slot["start"][11:16], slot["end"][11:16]) for slot in response.json()["slots"]]
+    assert slots == [("09:00", "10:00"), ("12:00", "18:00")]
+
+    response = await client.get("/meetings/free-slots", params={"start": str(day), "end": str(day)})
+    assert response.status_code == 400
+
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_meeting_admin_delete(session, normal_user):
+    """
+    Тест удаления встречи через админку.
+    Проверяет, что встреча удаляется, а календарные ленты участников обновляются.
+    """
+    scheduled_at = datetime(2099, 10, 1, 9, 0, tzinfo=timezone.utc)
+    meeting = Meeting(title="Admin delete meeting", scheduled_at=scheduled_at,
+                      ends_at=scheduled_at + timedelta(minutes=30))
+    async with session.begin():
+        meeting.users = [await session.get(User, normal_user.id)]
+        session.add(meeting)
+    async with session.begin():
+        version = await feed_versions.get(session, normal_user.id)
+
+    view = MeetingAdmin()
+    view.session_maker = async_sessionmaker(bind=session.bind, class_=AsyncSession)
+    view.is_async = True
+    await Query(view).delete(str(meeting.id), Request({"type": "http", "headers": []}))
+
+    async with session.begin():
+        assert await session.get(Meeting, meeting.id, populate_existing=True) is None
+        assert await feed_versions.get(session, normal_user.id) != version
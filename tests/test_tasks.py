@@ -1,9 +1,26 @@
+import io
+import logging
+import json
+import uuid
 import pytest
 from httpx import AsyncClient
-from datetime import datetime, timedelta
-
+from datetime import datetime, timedelta, timezone
+from fastapi import Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqladmin._queries import Query
+
+from app import database, querylog
+from app.admin import TaskAdmin
+from app.config import TEST_DATABASE_URL
 from app.main import app
-from app.auth import get_current_user
+from app.auth import get_current_user, Principal
+from app.models import Task, Team, User
+from app.importer import iter_records, validate_batch
+from app.page_cache import page_cache
+from app.invalidation import invalidation_bus
+from app.versions import VersionRegistry, feed_versions, is_not_modified, validator_headers
+from app.scope import Scope
 
 
 @pytest.mark.asyncio
@@ -167,4 +184,479 @@ async def test_task_delete(client, admin_user):
     response = await client.get("/tasks/delete/1")
     assert response.status_code == 200
 
-    app.dependency_overrides.clear()
\ No newline at end of file
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_tasks_list_query_count(client, admin_user, query_counter):
+    """
+    Тест количества запросов на странице списка задач.
+    Проверяет, что число SQL-запросов не зависит от количества задач и комментариев.
+    """
+    app.dependency_overrides[get_current_user] = lambda: admin_user
+
+    deadline = (datetime.now() + timedelta(days=1)).isoformat()
+    for i in range(5):
+        await client.post(
+            "/tasks/create",
+            data={
+                "title": f"CountTask{i}",
+                "description": "",
+                "task_status": "open",
+                "deadline": deadline,
+                "user_ids": [admin_user.id],
+                "first_comment": "Комментарий"
+            }
+        )
+
+    query_counter.clear()
+    response = await client.get("/tasks/")
+    assert response.status_code == 200
+    assert "CountTask4" in response.text
+    # После записи версии таблиц перечитываются одним запросом, остальное - запросы страницы
+    assert sum("data_versions" in statement for statement in query_counter) == 1
+    assert len(query_counter) <= 4
+
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_tasks_list_pagination(client, admin_user):
+    """
+    Тест постраничного вывода и фильтрации списка задач.
+    Проверяет, что страницы не пересекаются, а курсор ведёт на следующую страницу.
+    """
+    app.dependency_overrides[get_current_user] = lambda: admin_user
+
+    base = datetime(2099, 1, 1, 12, 0)
+    for i in range(3):
+        await client.post(
+            "/tasks/create",
+            data={
+                "title": f"PagedTask{i}",
+                "description": "",
+                "task_status": "open",
+                "deadline": (base + timedelta(days=i)).isoformat(),
+                "user_ids": [admin_user.id],
+                "first_comment": ""
+            }
+        )
+
+    params = {"deadline_from": base.isoformat(), "limit": 2}
+    response = await client.get("/tasks/", params=params)
+    assert response.status_code == 200
+    assert "PagedTask0" in response.text and "PagedTask1" in response.text
+    assert "PagedTask2" not in response.text
+    assert "cursor=" in response.text
+
+    cursor = response.text.split("cursor=")[1].split('"')[0].split("&")[0]
+    response = await client.get("/tasks/", params={**params, "cursor": cursor})
+    assert response.status_code == 200
+    assert "PagedTask2" in response.text
+    assert "PagedTask0" not in response.text
+
+    response = await client.get("/tasks/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_tasks_list_stream(client, admin_user):
+    """
+    Тест потокового вывода списка задач.
+    Проверяет, что при stream=1 возвращается весь отфильтрованный список без постраничной навигации.
+    """
+    app.dependency_overrides[get_current_user] = lambda: admin_user
+
+    base = datetime(2098, 1, 1, 12, 0)
+    for i in range(3):
+        await client.post(
+            "/tasks/create",
+            data={
+                "title": f"StreamedTask{i}",
+                "description": "",
+                "task_status": "open",
+                "deadline": (base + timedelta(days=i)).isoformat(),
+                "user_ids": [admin_user.id],
+                "first_comment": "Комментарий к потоку"
+            }
+        )
+
+    params = {"deadline_from": base.isoformat(), "deadline_to": (base + timedelta(days=3)).isoformat(),
+              "limit": 1, "stream": 1}
+    response = await client.get("/tasks/", params=params)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/html")
+    assert all(f"StreamedTask{i}" in response.text for i in range(3))
+    assert "Комментарий к потоку" in response.text
+    assert "Следующая страница" not in response.text
+    assert response.text.rstrip().endswith("</html>")
+
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_tasks_list_manager_scope(client, session, admin_user):
+    """
+    Тест области видимости менеджера в списке задач.
+    Проверяет, что менеджер видит только задачи участников своих команд
+    и что изменение состава команды сразу сбрасывает закэшированную область видимости.
+    """
+    manager = User(name="Scope Manager", email=f"manager_{uuid.uuid4().hex}@example.com",
+                   hashed_password="hashed", role="manager")
+    member = User(name="Scope Member", email=f"member_{uuid.uuid4().hex}@example.com",
+                  hashed_password="hashed", role="user")
+    async with session.begin():
+        session.add_all([manager, member])
+
+    app.dependency_overrides[get_current_user] = lambda: admin_user
+    response = await client.post("/teams/create", data={"title": "Scope Team", "user_ids": [member.id]},
+                                 params={"manager_id": manager.id})
+    assert response.status_code == 200
+    async with session.begin():
+        team_id = (await session.execute(select(Team.id).where(Team.title == "Scope Team"))).scalar_one()
+
+    deadline = datetime(2097, 1, 1, 12, 0)
+    for title, user_id in (("ScopedTask", member.id), ("HiddenTask", admin_user.id)):
+        await client.post(
+            "/tasks/create",
+            data={
+                "title": title,
+                "description": "",
+                "task_status": "open",
+                "deadline": deadline.isoformat(),
+                "user_ids": [user_id],
+                "first_comment": ""
+            }
+        )
+
+    app.dependency_overrides[get_current_user] = lambda: Principal(id=manager.id, email=manager.email, role="manager")
+    params = {"deadline_from": deadline.isoformat()}
+    response = await client.get("/tasks/", params=params)
+    assert "ScopedTask" in response.text
+    assert "HiddenTask" not in response.text
+
+    await client.post(f"/teams/edit/{team_id}", data={"title": "Scope Team", "user_ids": []},
+                      params={"manager_id": manager.id})
+    response = await client.get("/tasks/", params=params)
+    assert "ScopedTask" not in response.text
+
+    app.dependency_overrides.clear()
+
+
+def test_task_import_validation():
+    """
+    Тест разбора и валидации строк массового импорта.
+    Проверяет, что корректные строки готовятся к COPY, а ошибки привязываются к номерам строк.
+    """
+    source = io.StringIO(
+        "title,status,deadline,assignee_ids,comment\n"
+        "Imported,open,2030-01-01T10:00:00,1;2,Привет\n"
+        ",open,,,\n"
+        "Bad status,closed,,,\n"
+        "Foreign,done,,3,\n"
+    )
+    records = list(iter_records(source, "csv"))
+    rows, errors = validate_batch(records, Scope(member_ids=frozenset({1, 2})))
+
+    assert [row[:2] for row in rows] == [(2, "Imported")]
+    assert rows[0][5] == [1, 2]
+    assert [error.line for error in errors] == [3, 4, 5]
+
+    records = list(iter_records(io.StringIO('{"title": "Json task"}\nnot json\n'), "ndjson"))
+    rows, errors = validate_batch(records, Scope(member_ids=None))
+    assert [row[1] for row in rows] == ["Json task"]
+    assert errors[0].line == 2
+
+
+@pytest.mark.asyncio
+async def test_task_import_forbidden(client, normal_user):
+    """
+    Тест запрета массового импорта для обычного пользователя.
+    """
+    app.dependency_overrides[get_current_user] = lambda: normal_user
+
+    response = await client.post("/tasks/import", files={"file": ("tasks.csv", b"title\nTask\n")})
+    assert response.status_code == 403
+
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_tasks_export(client, admin_user):
+    """
+    Тест потоковой выгрузки задач.
+    Проверяет выгрузку в CSV и NDJSON с фильтром по дедлайну.
+    """
+    app.dependency_overrides[get_current_user] = lambda: admin_user
+
+    deadline = datetime(2096, 1, 1, 12, 0)
+    await client.post(
+        "/tasks/create",
+        data={
+            "title": "ExportedTask",
+            "description": "",
+            "task_status": "open",
+            "deadline": deadline.isoformat(),
+            "user_ids": [admin_user.id],
+            "first_comment": ""
+        }
+    )
+    params = {"deadline_from": deadline.isoformat(), "deadline_to": (deadline + timedelta(days=1)).isoformat()}
+
+    response = await client.get("/tasks/export", params=params)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    lines = response.text.strip().splitlines()
+    assert lines[0] == "id,title,description,status,deadline,assignee_ids"
+    assert len(lines) == 2 and "ExportedTask" in lines[1]
+
+    response = await client.get("/tasks/export", params={**params, "format": "ndjson"})
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows[0]["title"] == "ExportedTask"
+    assert rows[0]["assignee_ids"] == str(admin_user.id)
+
+    response = await client.get("/tasks/export", params={"format": "xml"})
+    assert response.status_code == 422
+
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_tasks_list_conditional_get(client, admin_user, normal_user):
+    """
+    Тест условного GET списка задач.
+    Проверяет, что повторный запрос с ETag получает 304, ETag различается для разных
+    пользователей, а после изменения задач страница отдаётся заново.
+    """
+    app.dependency_overrides[get_current_user] = lambda: admin_user
+    response = await client.get("/tasks/")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    response = await client.get("/tasks/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+    app.dependency_overrides[get_current_user] = lambda: normal_user
+    response = await client.get("/tasks/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+    app.dependency_overrides[get_current_user] = lambda: admin_user
+    await client.post("/tasks/create", data={
+        "title": "Conditional task",
+        "description": "",
+        "task_status": "open",
+        "deadline": datetime(2099, 6, 1, 12, 0).isoformat(),
+        "user_ids": [admin_user.id],
+        "first_comment": ""
+    })
+    response = await client.get("/tasks/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert "Conditional task" in response.text
+
+    app.dependency_overrides.clear()
+
+
+def test_last_modified_second_precision():
+    """
+    Тест точности Last-Modified.
+    Проверяет, что для данных, изменённых в текущую секунду, Last-Modified не отдаётся
+    (второе изменение в ту же секунду его бы не поменяло), а If-Modified-Since
+    сравнивается с точностью до секунды.
+    """
+    now = datetime.now(timezone.utc)
+    assert "Last-Modified" not in validator_headers('"v1"', now)
+
+    modified_at = now - timedelta(seconds=5, microseconds=now.microsecond)
+    headers = validator_headers('"v1"', modified_at.replace(microsecond=300000))
+    since = [(b"if-modified-since", headers["Last-Modified"].encode())]
+    request = Request({"type": "http", "headers": since})
+    assert is_not_modified(request, '"v1"', modified_at.replace(microsecond=300000))
+    assert not is_not_modified(request, '"v2"', modified_at + timedelta(seconds=1))
+
+
+@pytest.mark.asyncio
+async def test_versions_shared_between_workers(session, monkeypatch):
+    """
+    Тест версий данных, общих для воркеров.
+    Два реестра с разными кэшами в памяти изображают два воркера: они отдают один токен версии,
+    после изменения на одном второй получает тот же новый токен по сообщению шины,
+    а перезапущенный воркер - без сообщений.
+    """
+    monkeypatch.setattr(invalidation_bus, "_handlers", dict(invalidation_bus._handlers))
+    worker_a = VersionRegistry("tables")
+    worker_b = VersionRegistry("tables")
+    key = f"shared_{uuid.uuid4().hex[:8]}"
+
+    async with session.begin():
+        before = await worker_a.get(session, key)
+        assert await worker_b.get(session, key) == before
+
+    async with session.begin():
+        await worker_a.bump(session, key)
+    async with session.begin():
+        after = await worker_a.get(session, key)
+        assert after[0] != before[0]
+        # Воркер B не знает об изменении, пока не получил сообщение шины
+        assert await worker_b.get(session, key) == before
+
+    invalidation_bus.apply({"origin": "worker-a", "changes": {"tables": [key]}})
+    async with session.begin():
+        assert await worker_b.get(session, key) == after
+        assert await VersionRegistry("tables").get(session, key) == after
+
+    async with session.begin():
+        await worker_b.bump_all(session)
+    invalidation_bus.apply({"origin": "worker-b", "changes": {"tables": None}})
+    worker_a.invalidate(None)
+    async with session.begin():
+        assert await worker_a.get(session, key) == await worker_b.get(session, key) != after
+
+
+@pytest.mark.asyncio
+async def test_tasks_list_conditional_get_after_comment(client, session, admin_user):
+    """
+    Тест условного GET списка задач после комментария.
+    Проверяет, что список показывает комментарии, поэтому новый комментарий меняет ETag.
+    """
+    app.dependency_overrides[get_current_user] = lambda: admin_user
+    await client.post("/tasks/create", data={
+        "title": "Commented task",
+        "description": "",
+        "task_status": "open",
+        "deadline": datetime(2099, 8, 1, 12, 0).isoformat(),
+        "user_ids": [admin_user.id],
+        "first_comment": ""
+    })
+    async with session.begin():
+        task_id = (await session.execute(select(Task.id).where(Task.title == "Commented task"))).scalar_one()
+
+    response = await client.get("/tasks/")
+    etag = response.headers["etag"]
+
+    await client.post(f"/tasks/comment/{task_id}", data={"content": "Revalidated comment"})
+    response = await client.get("/tasks/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert "Revalidated comment" in response.text
+
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_tasks_list_page_cache_after_comment(client, session, admin_user):
+    """
+    Тест кэша страницы списка задач после комментария.
+    Проверяет, что закэшированный список сбрасывается новым комментарием и показывает его.
+    """
+    app.dependency_overrides[get_current_user] = lambda: admin_user
+    await client.post("/tasks/create", data={
+        "title": "Cached commented task",
+        "description": "",
+        "task_status": "open",
+        "deadline": datetime(2099, 9, 1, 12, 0).isoformat(),
+        "user_ids": [admin_user.id],
+        "first_comment": ""
+    })
+    async with session.begin():
+        task_id = (await session.execute(select(Task.id).where(Task.title == "Cached commented task"))).scalar_one()
+
+    await client.get("/tasks/")
+    hits = page_cache.hits
+    await client.get("/tasks/")
+    assert page_cache.hits == hits + 1
+
+    await client.post(f"/tasks/comment/{task_id}", data={"content": "Fresh cached comment"})
+    response = await client.get("/tasks/")
+    assert page_cache.hits == hits + 1
+    assert "Fresh cached comment" in response.text
+
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_read_your_writes_routing(client, admin_user, monkeypatch):
+    """
+    Тест маршрутизации чтения на реплику.
+    Проверяет, что после записи пользователь получает cookie и читает из основной базы,
+    а без неё - из реплики.
+    """
+    replica = database.make_engine(TEST_DATABASE_URL)
+    monkeypatch.setattr(database, "read_engine", replica)
+    monkeypatch.setattr(database, "async_read_session", async_sessionmaker(bind=replica, class_=AsyncSession))
+
+    app.dependency_overrides[get_current_user] = lambda: admin_user
+    response = await client.post("/tasks/create", data={
+        "title": "Replica task",
+        "description": "",
+        "task_status": "open",
+        "deadline": datetime(2099, 7, 1, 12, 0).isoformat(),
+        "user_ids": [admin_user.id],
+        "first_comment": ""
+    })
+    assert response.status_code == 200
+    primary_until = response.cookies[database.PRIMARY_COOKIE]
+    app.dependency_overrides.clear()
+
+    async def read_session(cookie: str | None):
+        headers = [(b"cookie", f"{database.PRIMARY_COOKIE}={cookie}".encode())] if cookie else []
+        sessions = database.get_async_read_db(Request({"type": "http", "headers": headers}))
+        session = await anext(sessions)
+        await sessions.aclose()
+        return session.bind
+
+    assert await read_session(primary_until) is database.engine
+    assert await read_session(None) is replica
+    await replica.dispose()
+
+
+@pytest.mark.asyncio
+async def test_tasks_list_server_timing(client, admin_user, monkeypatch, caplog):
+    """
+    Тест учёта SQL-запросов запроса.
+    Проверяет заголовок Server-Timing и запись медленного запроса в лог с шаблоном маршрута
+    и типами параметров без значений.
+    """
+    monkeypatch.setattr(querylog, "SLOW_QUERY_MS", 0)
+    app.dependency_overrides[get_current_user] = lambda: admin_user
+
+    with caplog.at_level(logging.WARNING, logger="app.sql"):
+        response = await client.get("/tasks/", params={"task_status": "secret-value"})
+    assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    assert timing.startswith("db;dur=")
+    queries = int(timing.split('desc="')[1].split(" ")[0])
+    assert queries >= 1
+
+    records = [record.getMessage() for record in caplog.records if record.name == "app.sql"]
+    assert len(records) == queries
+    assert all("route=/tasks/" in message for message in records)
+    assert not any("secret-value" in message for message in records)
+
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_task_admin_delete(session, normal_user):
+    """
+    Тест удаления задачи через админку.
+    Проверяет, что задача удаляется, а календарные ленты назначенных пользователей обновляются.
+    """
+    task = Task(title="Admin delete task", status="open", deadline=datetime(2099, 10, 1, 12, 0))
+    async with session.begin():
+        task.users = [await session.get(User, normal_user.id)]
+        session.add(task)
+    async with session.begin():
+        version = await feed_versions.get(session, normal_user.id)
+
+    view = TaskAdmin()
+    view.session_maker = async_sessionmaker(bind=session.bind, class_=AsyncSession)
+    view.is_async = True
+    await Query(view).delete(str(task.id), Request({"type": "http", "headers": []}))
+
+    async with session.begin():
+        assert await session.get(Task, task.id, populate_existing=True) is None
+        assert await feed_versions.get(session, normal_user.id) != version
@@ -1,7 +1,14 @@
+import uuid
 import pytest
 from httpx import AsyncClient
+from sqladmin._queries import Query
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from starlette.requests import Request
 from app.main import app
-from app.auth import get_current_user
+from app.admin import TeamAdmin
+from app.auth import get_current_user, principal_cache, Principal
+from app.models import Team, User
+from app.page_cache import page_cache
 
 
 @pytest.mark.asyncio
@@ -107,4 +114,50 @@ async def test_team_delete(client, admin_user):
     assert response.status_code == 303
     assert response.headers["location"] == "/teams"
 
-    app.dependency_overrides.clear()
\ No newline at end of file
+    app.dependency_overrides.clear()
+
+@pytest.mark.asyncio
+async def test_teams_list_page_cache(client: AsyncClient, normal_user):
+    """
+    Тест кэша отрендеренных страниц.
+    Проверяет, что повторный запрос списка команд отдаётся из кэша,
+    а создание команды сбрасывает закэшированную страницу.
+    """
+    response = await client.get("/teams/")
+    assert response.status_code == 200
+    hits = page_cache.hits
+
+    cached = await client.get("/teams/")
+    assert cached.status_code == 200
+    assert cached.text == response.text
+    assert cached.headers["content-type"] == response.headers["content-type"]
+    assert page_cache.hits == hits + 1
+
+    await client.post("/teams/create", data={"title": "Cached team", "user_ids": [normal_user.id]})
+    response = await client.get("/teams/")
+    assert page_cache.hits == hits + 1
+    assert "Cached team" in response.text
+
+
+@pytest.mark.asyncio
+async def test_team_admin_delete(session):
+    """
+    Тест удаления команды через админку.
+    Проверяет, что команда удаляется, а закэшированные данные её участников сбрасываются.
+    """
+    member = User(name="Admin Delete Member", email=f"member_{uuid.uuid4().hex}@example.com",
+                  hashed_password="hashed", role="user")
+    team = Team(title="Admin Delete Team", users=[member])
+    async with session.begin():
+        session.add(team)
+    principal_cache.set(member.id, Principal(id=member.id, email=member.email, role="user",
+                                             team_ids=frozenset({team.id})))
+
+    view = TeamAdmin()
+    view.session_maker = async_sessionmaker(bind=session.bind, class_=AsyncSession)
+    view.is_async = True
+    await Query(view).delete(str(team.id), Request({"type": "http", "headers": []}))
+
+    async with session.begin():
+        assert await session.get(Team, team.id, populate_existing=True) is None
+    assert principal_cache.get(member.id) is None
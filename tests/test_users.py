@@ -1,5 +1,13 @@
+import asyncio
+import time
+import tracemalloc
 import pytest
 from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app import main, profiling
+from app.monitoring import EventLoopLagMonitor
+from app.main import app
+from app.auth import create_access_token, get_current_user
 
 
 @pytest.mark.asyncio
@@ -36,3 +44,143 @@ async def test_token_fail(client: AsyncClient):
     )
     assert response.status_code == 401
     assert "Incorrect email or password" in response.text
+
+
+@pytest.mark.asyncio
+async def test_pool_stats(client: AsyncClient, admin_user, normal_user):
+    """
+    Тест статистики пула соединений.
+    Проверяет, что администратор видит состояние пула и гистограмму ожидания, а пользователь - нет.
+    """
+    app.dependency_overrides[get_current_user] = lambda: normal_user
+    response = await client.get("/pool/stats")
+    assert response.status_code == 403
+
+    app.dependency_overrides[get_current_user] = lambda: admin_user
+    response = await client.get("/pool/stats")
+    assert response.status_code == 200
+    stats = response.json()["primary"]
+    assert {"size", "checked_out", "overflow", "timeouts"} <= stats.keys()
+    assert stats["wait_ms"]["buckets"]["+Inf"] == stats["wait_ms"]["count"]
+
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_metrics(client: AsyncClient, admin_user, monkeypatch):
+    """
+    Тест эндпоинта метрик Prometheus.
+    Проверяет проверку токена и наличие метрик маршрута, SQL-запросов, пула, bcrypt и шаблонов.
+    """
+    monkeypatch.setattr(main, "METRICS_TOKEN", "scrape-token")
+    app.dependency_overrides[get_current_user] = lambda: admin_user
+    response = await client.get("/tasks/")
+    assert response.status_code == 200
+
+    response = await client.get("/metrics")
+    assert response.status_code == 401
+
+    response = await client.get("/metrics", headers={"Authorization": "Bearer scrape-token"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    samples = dict(line.rsplit(" ", 1) for line in response.text.splitlines() if not line.startswith("#"))
+    labels = '{method="GET",route="/tasks/"}'
+    assert int(samples[f"http_request_duration_seconds_count{labels}"]) >= 1
+    assert int(samples['http_request_duration_seconds_bucket{method="GET",route="/tasks/",le="+Inf"}']) >= 1
+    assert int(samples[f"db_queries_total{labels}"]) >= 1
+    assert int(samples["http_requests_in_flight"]) == 1
+    assert samples["password_hash_queue_depth"] == "0"
+    assert 'db_pool_size{pool="primary"}' in samples
+    assert int(samples['template_render_duration_seconds_count{template="tasks/tasks_list.html"}']) >= 1
+    assert "event_loop_lag_seconds_count" in samples
+    assert int(samples["process_pid"]) > 0
+
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_request_profiling(client: AsyncClient, session, admin_user, normal_user, monkeypatch):
+    """
+    Тест профилирования отдельного запроса.
+    Проверяет, что профиль снимается только по флагу из cookie администратора
+    и отдаётся администратору по X-Profile-Id.
+    """
+    monkeypatch.setattr(profiling, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(profiling, "async_session", async_sessionmaker(bind=session.bind, class_=AsyncSession))
+    app.dependency_overrides[get_current_user] = lambda: admin_user
+
+    user_token = create_access_token({"sub": normal_user.email, "id": normal_user.id, "role": "user", "teams": []})
+    client.cookies.set("access_token", user_token)
+    response = await client.get("/teams/", headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+
+    admin_token = create_access_token({"sub": admin_user.email, "id": admin_user.id, "role": "admin", "teams": []})
+    client.cookies.set("access_token", admin_token)
+    response = await client.get("/teams/", params={"_profile": "1"})
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+
+    response = await client.get(f"/profiles/{profile_id}")
+    assert response.status_code == 200
+    assert response.text.startswith("GET /teams/ -> 200")
+    assert "cumulative" in response.text
+
+    app.dependency_overrides[get_current_user] = lambda: normal_user
+    response = await client.get(f"/profiles/{profile_id}")
+    assert response.status_code == 403
+
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_event_loop_block_detector():
+    """
+    Тест детектора блокировок event loop.
+    Проверяет, что блокировка дольше порога учитывается один раз и сохраняется со стеком блокирующего кода.
+    """
+    monitor = EventLoopLagMonitor(interval_ms=10, block_threshold_ms=50)
+    await monitor.start()
+    await asyncio.sleep(0.05)
+    time.sleep(0.3)
+    await asyncio.sleep(0.05)
+    await monitor.stop()
+
+    assert monitor.blocks == 1
+    blocked = monitor.blocked_stacks[0]
+    assert blocked["blocked_ms"] >= 50
+    assert "time.sleep(0.3)" in blocked["stack"]
+    assert monitor.lag_ms.snapshot()["buckets"]["+Inf"] == monitor.lag_ms.count
+
+
+@pytest.mark.asyncio
+async def test_memory_accounting(client: AsyncClient, admin_user, normal_user):
+    """
+    Тест учёта памяти через tracemalloc.
+    Проверяет пик памяти в Server-Timing и /metrics и сравнение снимков, доступное только администратору.
+    """
+    app.dependency_overrides[get_current_user] = lambda: admin_user
+    response = await client.get("/memory/diff", params={"seconds": 0})
+    assert response.status_code == 409
+
+    tracemalloc.start()
+    try:
+        response = await client.get("/teams/")
+        assert response.status_code == 200
+        assert 'mem;desc="peak' in response.headers["server-timing"]
+
+        response = await client.get("/memory/diff", params={"seconds": 0, "limit": 5})
+        assert response.status_code == 200
+        assert len(response.json()["top"]) <= 5
+
+        app.dependency_overrides[get_current_user] = lambda: normal_user
+        response = await client.get("/memory/diff", params={"seconds": 0})
+        assert response.status_code == 403
+    finally:
+        tracemalloc.stop()
+
+    response = await client.get("/metrics")
+    samples = dict(line.rsplit(" ", 1) for line in response.text.splitlines() if not line.startswith("#"))
+    assert int(samples['http_request_memory_peak_bytes_count{method="GET",route="/teams/"}']) >= 1
+
+    app.dependency_overrides.clear()